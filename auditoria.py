@@ -0,0 +1,283 @@
+"""
+Auditoria - Registro assíncrono das decisões do firewall
+As requisições só enfileiram o registro de cada decisão; uma thread de
+fundo junta os registros em lotes e os grava em arquivos NDJSON
+comprimidos (gzip), com rotação por tamanho. Com a fila cheia, a política
+de contrapressão decide entre descartar, bloquear ou amostrar.
+"""
+
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+# Políticas de contrapressão (fila cheia)
+DESCARTAR = 'DESCARTAR'   # descarta o registro novo
+BLOQUEAR = 'BLOQUEAR'     # espera espaço na fila (até ESPERA_MAXIMA)
+AMOSTRAR = 'AMOSTRAR'     # com a fila acima da metade, guarda 1 a cada N
+POLITICAS = (DESCARTAR, BLOQUEAR, AMOSTRAR)
+
+# Valores padrão
+CAPACIDADE_PADRAO = 10000
+TAMANHO_LOTE = 500
+INTERVALO_ESCRITA = 1.0
+MAX_BYTES_ARQUIVO = 64 * 1024 * 1024
+MAX_ARQUIVOS = 10
+PASSO_AMOSTRAGEM = 10
+ESPERA_MAXIMA = 1.0
+
+# Prefixo e extensão dos arquivos gravados
+PREFIXO_ARQUIVO = 'auditoria-'
+EXTENSAO_ARQUIVO = '.ndjson.gz'
+
+
+class RegistroAuditoria:
+    """
+    Fila limitada de registros com uma thread escritora em lotes.
+
+    Cada lote vira um membro gzip independente anexado ao arquivo atual:
+    arquivos gzip concatenados são válidos, então o arquivo pode ser lido
+    (zcat, gzip.open) a qualquer momento, mesmo com o servidor rodando ou
+    após uma queda. Quando o arquivo passa de max_bytes, um novo é aberto;
+    só os max_arquivos mais recentes são mantidos.
+    """
+
+    def __init__(self, diretorio, politica=DESCARTAR, capacidade=CAPACIDADE_PADRAO,
+                 tamanho_lote=TAMANHO_LOTE, intervalo=INTERVALO_ESCRITA,
+                 max_bytes=MAX_BYTES_ARQUIVO, max_arquivos=MAX_ARQUIVOS,
+                 passo_amostragem=PASSO_AMOSTRAGEM):
+        """
+        Args:
+            diretorio (str): Onde gravar os arquivos (criado se não existir)
+            politica (str): DESCARTAR, BLOQUEAR ou AMOSTRAR
+            capacidade (int): Tamanho máximo da fila
+            tamanho_lote (int): Máximo de registros por escrita
+            intervalo (float): Espera máxima (s) antes de gravar um lote incompleto
+            max_bytes (int): Tamanho (comprimido) que dispara a rotação
+            max_arquivos (int): Arquivos mantidos (0 = todos)
+            passo_amostragem (int): Na política AMOSTRAR, guarda 1 a cada N
+
+        Lança:
+            ValueError: Se a política ou algum limite for inválido
+        """
+        politica = str(politica).upper()
+        if politica not in POLITICAS:
+            raise ValueError(f"Política deve ser {', '.join(POLITICAS)}")
+        if capacidade < 1 or tamanho_lote < 1 or passo_amostragem < 1:
+            raise ValueError("Capacidade, lote e passo de amostragem devem ser positivos")
+
+        self.diretorio = diretorio
+        self.politica = politica
+        self.capacidade = capacidade
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.max_bytes = max_bytes
+        self.max_arquivos = max_arquivos
+        self.passo_amostragem = passo_amostragem
+
+        self._fila = queue.Queue(capacidade)
+        self._limite_amostragem = capacidade // 2
+        self._contador_amostragem = 0
+        self._parar = threading.Event()
+        self._thread = None
+        self._arquivo = None
+        self._sequencia = 0
+        self._trava = threading.Lock()
+
+        self.descartados = 0
+        self.nao_amostrados = 0
+        self.escritos = 0
+        self.lotes = 0
+        self.arquivos = 0
+        self.erros = 0
+        self.ultimo_erro = None
+
+    # ------------------------------------------------------------------
+    # Caminho das requisições
+    # ------------------------------------------------------------------
+
+    def registrar(self, registro):
+        """
+        Enfileira um registro (dict serializável em JSON). Não faz E/S.
+
+        Retorna:
+            bool: True se o registro foi aceito
+        """
+        if self.politica == AMOSTRAR and self._fila.qsize() >= self._limite_amostragem:
+            with self._trava:
+                self._contador_amostragem += 1
+                if self._contador_amostragem % self.passo_amostragem:
+                    self.nao_amostrados += 1
+                    return False
+
+        try:
+            if self.politica == BLOQUEAR:
+                self._fila.put(registro, timeout=ESPERA_MAXIMA)
+            else:
+                self._fila.put_nowait(registro)
+        except queue.Full:
+            with self._trava:
+                self.descartados += 1
+            return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Thread escritora
+    # ------------------------------------------------------------------
+
+    def iniciar(self):
+        """
+        Inicia a thread escritora (uma única vez).
+        """
+        if self._thread is None:
+            os.makedirs(self.diretorio, exist_ok=True)
+            self._thread = threading.Thread(target=self._executar, name='auditoria',
+                                            daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def fechar(self, timeout=5.0):
+        """
+        Grava o que está na fila e encerra a thread escritora.
+
+        Se a thread não terminar dentro do timeout (ex.: disco lento), o
+        arquivo continua com ela, que termina o último lote e o fecha ao
+        sair; fechá-lo aqui corromperia o membro gzip sendo gravado.
+
+        Retorna:
+            bool: True se a fila foi esvaziada e o arquivo fechado
+        """
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                with self._trava:
+                    self.ultimo_erro = f"Gravação pendente após {timeout} s ao fechar"
+                print(f"Auditoria: a thread escritora não terminou em {timeout} s; "
+                      f"{self._fila.qsize()} registros ainda na fila")
+                return False
+        elif not self._fila.empty():
+            os.makedirs(self.diretorio, exist_ok=True)
+            self._esvaziar()
+        self._fechar_arquivo()
+        return True
+
+    def _executar(self):
+        """
+        Laço da thread: espera o primeiro registro de um lote, junta os que
+        já estão na fila e grava o lote.
+        """
+        while not self._parar.is_set():
+            try:
+                primeiro = self._fila.get(timeout=self.intervalo)
+            except queue.Empty:
+                continue
+            self._gravar([primeiro] + self._retirar(self.tamanho_lote - 1))
+        self._esvaziar()
+        self._fechar_arquivo()
+
+    def _retirar(self, maximo):
+        """
+        Retira até `maximo` registros da fila sem esperar.
+        """
+        lote = []
+        try:
+            while len(lote) < maximo:
+                lote.append(self._fila.get_nowait())
+        except queue.Empty:
+            pass
+        return lote
+
+    def _esvaziar(self):
+        """
+        Grava todos os registros restantes na fila.
+        """
+        while True:
+            lote = self._retirar(self.tamanho_lote)
+            if not lote:
+                return
+            self._gravar(lote)
+
+    def _gravar(self, lote):
+        """
+        Serializa o lote, comprime-o como um membro gzip e o anexa ao
+        arquivo atual, rotacionando se necessário.
+        """
+        try:
+            dados = ''.join(json.dumps(registro, default=str) + '\n' for registro in lote)
+            membro = gzip.compress(dados.encode('utf-8'), compresslevel=6)
+            arquivo = self._arquivo_atual()
+            arquivo.write(membro)
+            arquivo.flush()
+            if arquivo.tell() >= self.max_bytes:
+                self._fechar_arquivo()
+        except (OSError, TypeError, ValueError) as e:
+            with self._trava:
+                self.erros += 1
+                self.descartados += len(lote)
+                self.ultimo_erro = str(e)
+            return
+        with self._trava:
+            self.escritos += len(lote)
+            self.lotes += 1
+
+    def _arquivo_atual(self):
+        """
+        Retorna o arquivo aberto para escrita, abrindo um novo se preciso.
+        """
+        if self._arquivo is None:
+            self._sequencia += 1
+            nome = (f"{PREFIXO_ARQUIVO}{time.strftime('%Y%m%d-%H%M%S')}"
+                    f"-{os.getpid()}-{self._sequencia:04d}{EXTENSAO_ARQUIVO}")
+            self._arquivo = open(os.path.join(self.diretorio, nome), 'ab')
+            self.arquivos += 1
+            self._remover_antigos()
+        return self._arquivo
+
+    def _fechar_arquivo(self):
+        """
+        Fecha o arquivo atual (o próximo lote abre um novo).
+        """
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def _remover_antigos(self):
+        """
+        Mantém só os max_arquivos arquivos de auditoria mais recentes.
+        """
+        if not self.max_arquivos:
+            return
+        caminhos = [os.path.join(self.diretorio, nome) for nome in os.listdir(self.diretorio)
+                    if nome.startswith(PREFIXO_ARQUIVO) and nome.endswith(EXTENSAO_ARQUIVO)]
+        caminhos.sort(key=lambda caminho: (os.path.getmtime(caminho), caminho))
+        for caminho in caminhos[:-self.max_arquivos]:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+
+    def estatisticas(self):
+        """
+        Retorna a profundidade da fila e os contadores de registros.
+        """
+        with self._trava:
+            return {
+                'politica': self.politica,
+                'profundidade': self._fila.qsize(),
+                'capacidade': self.capacidade,
+                'escritos': self.escritos,
+                'descartados': self.descartados,
+                'nao_amostrados': self.nao_amostrados,
+                'lotes': self.lotes,
+                'arquivos': self.arquivos,
+                'erros': self.erros,
+                'ultimo_erro': self.ultimo_erro,
+                'ativo': self._thread is not None and self._thread.is_alive()
+            }
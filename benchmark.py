@@ -0,0 +1,384 @@
+"""
+Benchmark - Desempenho dos classificadores de pacotes
+Compara a busca linear de referência com o IndiceRegras (busca em espaço
+de tuplas) e com a PoliticaCompilada (mmap), em conjuntos de regras
+sintéticos de tamanhos crescentes (IPv4 e, com --ipv6, os mesmos conjuntos
+em IPv6), e mede a memória ocupada por cada representação das regras e o
+tempo de inicialização da linha de comando.
+
+Uso:
+    python benchmark.py
+    python benchmark.py --regras 1000,10000,100000 --json
+    python benchmark.py --ipv6 --inicializacao 0
+    python benchmark.py --regras "" --inicializacao 50
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from motor_regras import (
+    ACAO_PADRAO,
+    IndiceRegras,
+    TabelaRegras,
+    normalizar_pacote,
+    normalizar_regras,
+    regra_casa
+)
+from politica_compilada import PoliticaCompilada, compilar_regras
+
+# Tempo máximo (segundos) gasto medindo cada classificador
+TEMPO_MEDICAO = 0.5
+
+# CLI medida no benchmark de inicialização
+ARQUIVO_FIREWALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'firewall.py')
+
+
+# ============================================================================
+# DADOS SINTÉTICOS
+# ============================================================================
+
+def _ip_aleatorio(aleatorio):
+    """
+    Sorteia um IPv4 dentro de 10.0.0.0/8.
+    """
+    return f"10.{aleatorio.randint(0, 255)}.{aleatorio.randint(0, 255)}.{aleatorio.randint(1, 254)}"
+
+
+def _para_ipv6(texto):
+    """
+    Converte um IP/CIDR IPv4 sintético em um IPv6 de mesma estrutura: cada
+    octeto vira um grupo de 2001:db8:a:b:c::d e um prefixo /8n vira /32+16n
+    (/32 vira /128), então as regras casam os mesmos pacotes.
+    """
+    endereco, _, prefixo = texto.partition('/')
+    a, b, c, d = (int(octeto) for octeto in endereco.split('.'))
+    convertido = f"2001:db8:{a:x}:{b:x}:{c:x}::{d:x}"
+    if not prefixo or prefixo == '32':
+        return convertido
+    return f"{convertido}/{32 + 16 * (int(prefixo) // 8)}"
+
+
+def converter_ipv6(regras, pacotes):
+    """
+    Converte regras e pacotes sintéticos para IPv6 (ver _para_ipv6).
+
+    Retorna:
+        tuple: (regras, pacotes)
+    """
+    regras = [dict(regra, ip=_para_ipv6(regra['ip']),
+                   **({'origem': _para_ipv6(regra['origem'])} if 'origem' in regra else {}))
+              for regra in regras]
+    pacotes = [(_para_ipv6(ip), porta, _para_ipv6(origem), protocolo, direcao)
+               for ip, porta, origem, protocolo, direcao in pacotes]
+    return regras, pacotes
+
+
+def gerar_regras(total, semente=0):
+    """
+    Gera regras sintéticas com a mistura típica de uma política real:
+    maioria de hosts/portas exatos, algumas redes, faixas de portas e
+    regras com origem/protocolo.
+
+    Args:
+        total (int): Quantidade de regras
+        semente (int): Semente do gerador
+
+    Retorna:
+        list: Regras no formato do regras.json
+    """
+    aleatorio = random.Random(semente)
+    regras = []
+    for _ in range(total):
+        sorteio = aleatorio.random()
+        regra = {'ip': _ip_aleatorio(aleatorio), 'porta': aleatorio.randint(1, 1024)}
+        if sorteio < 0.2:
+            regra['ip'] = regra['ip'].rsplit('.', 1)[0] + '.0/24'
+        elif sorteio < 0.3:
+            regra['porta_fim'] = regra['porta'] + aleatorio.randint(1, 100)
+        elif sorteio < 0.4:
+            regra['origem'] = f"192.168.{aleatorio.randint(0, 255)}.0/24"
+            regra['protocolo'] = aleatorio.choice(['TCP', 'UDP'])
+        regra['acao'] = aleatorio.choice(['PERMITIDO', 'BLOQUEADO'])
+        regras.append(regra)
+    return regras
+
+
+def gerar_pacotes(total, regras, semente=1):
+    """
+    Gera pacotes sintéticos: metade mira IP:porta de regras existentes,
+    metade é tráfego aleatório (cai na política padrão quase sempre).
+
+    Retorna:
+        list: Tuplas (ip, porta, origem, protocolo, direcao)
+    """
+    aleatorio = random.Random(semente)
+    alvos = [(r['ip'], r['porta']) for r in regras if '/' not in r['ip']]
+    pacotes = []
+    for _ in range(total):
+        if alvos and aleatorio.random() < 0.5:
+            ip, porta = aleatorio.choice(alvos)
+        else:
+            ip, porta = _ip_aleatorio(aleatorio), aleatorio.randint(1, 1024)
+        origem = f"192.168.{aleatorio.randint(0, 255)}.{aleatorio.randint(1, 254)}"
+        pacotes.append((ip, porta, origem, aleatorio.choice(['TCP', 'UDP']), 'ENTRADA'))
+    return pacotes
+
+
+# ============================================================================
+# MEDIÇÃO
+# ============================================================================
+
+class BuscaLinear:
+    """
+    Classificador ingênuo: percorre as regras já normalizadas em ordem.
+    Serve de linha de base (as regras são normalizadas uma única vez).
+    """
+
+    def __init__(self, regras):
+        self._regras = normalizar_regras(regras)
+
+    def decidir(self, ip, porta=None, origem=None, protocolo=None, direcao=None):
+        pacote = normalizar_pacote(ip, porta, origem, protocolo, direcao)
+        for regra in self._regras:
+            if regra_casa(regra, pacote):
+                return regra.acao
+        return ACAO_PADRAO
+
+
+def medir(decidir, pacotes, tempo_maximo=TEMPO_MEDICAO):
+    """
+    Mede o tempo médio por decisão, parando após tempo_maximo segundos.
+
+    Retorna:
+        dict: Pacotes decididos e microssegundos por pacote
+    """
+    feitos = 0
+    inicio = time.perf_counter()
+    limite = inicio + tempo_maximo
+    for pacote in pacotes:
+        decidir(*pacote)
+        feitos += 1
+        if feitos % 64 == 0 and time.perf_counter() > limite:
+            break
+    decorrido = time.perf_counter() - inicio
+    return {'pacotes': feitos, 'us_por_pacote': round(decorrido / feitos * 1e6, 3)}
+
+
+def _memoria_retida(construir):
+    """
+    Mede quantos bytes continuam alocados pelo objeto que construir() cria
+    (alocações temporárias da construção não entram na conta).
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        objeto = construir()
+        depois = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del objeto
+    return depois - antes
+
+
+def medir_memoria(regras):
+    """
+    Compara a memória das representações de um conjunto de regras.
+
+    Retorna:
+        dict: Bytes por regra de cada representação
+    """
+    texto = json.dumps(regras)
+    total = len(regras)
+    medidas = {
+        'dicts_json': _memoria_retida(lambda: json.loads(texto)),
+        'lista_regra': _memoria_retida(lambda: normalizar_regras(regras)),
+        'tabela_regras': _memoria_retida(lambda: TabelaRegras(regras)),
+        'indice_regras': _memoria_retida(lambda: IndiceRegras(regras))
+    }
+    return {nome: round(valor / total, 1) for nome, valor in medidas.items()}
+
+
+def comparar_classificadores(tamanhos, total_pacotes=5000, diretorio=None, ipv6=False):
+    """
+    Mede os três classificadores para cada tamanho de conjunto de regras e
+    confere se todos chegaram às mesmas decisões.
+
+    Args:
+        tamanhos (list): Quantidades de regras a testar
+        total_pacotes (int): Pacotes gerados por tamanho
+        diretorio (str, opcional): Onde gravar os binários compilados
+        ipv6 (bool): Medir também os mesmos conjuntos convertidos para IPv6
+
+    Retorna:
+        list: Um dicionário de resultados por tamanho (e família)
+    """
+    casos = [(total, familia) for total in tamanhos
+             for familia in (('IPv4', 'IPv6') if ipv6 else ('IPv4',))]
+    resultados = []
+    with tempfile.TemporaryDirectory(dir=diretorio) as temporario:
+        for total, familia in casos:
+            regras = gerar_regras(total)
+            pacotes = gerar_pacotes(total_pacotes, regras)
+            if familia == 'IPv6':
+                regras, pacotes = converter_ipv6(regras, pacotes)
+
+            arquivo_json = os.path.join(temporario, f'regras_{total}_{familia}.json')
+            arquivo_bin = os.path.join(temporario, f'regras_{total}_{familia}.fwc')
+            with open(arquivo_json, 'w', encoding='utf-8') as f:
+                json.dump(regras, f)
+
+            inicio = time.perf_counter()
+            indice = IndiceRegras(regras)
+            construcao_indice = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            compilar_regras(arquivo_json, arquivo_bin)
+            compilacao = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            compilada = PoliticaCompilada(arquivo_bin)
+            abertura = time.perf_counter() - inicio
+
+            linear = BuscaLinear(regras)
+            amostra = pacotes[:200]
+            divergencias = sum(
+                1 for pacote in amostra
+                if not linear.decidir(*pacote) == indice.decidir(*pacote) == compilada.decidir(*pacote)
+            )
+
+            resultados.append({
+                'regras': total,
+                'familia': familia,
+                'tuplas': len(indice._tuplas),
+                'busca_linear': medir(linear.decidir, pacotes),
+                'indice_regras': medir(indice.decidir, pacotes),
+                'politica_compilada': medir(compilada.decidir, pacotes),
+                'construcao_indice_ms': round(construcao_indice * 1000, 2),
+                'compilacao_ms': round(compilacao * 1000, 2),
+                'abertura_compilada_ms': round(abertura * 1000, 3),
+                'divergencias': divergencias,
+                'memoria_bytes_por_regra': medir_memoria(regras)
+            })
+            compilada.fechar()
+    return resultados
+
+
+def _tempo_execucao(comando, repeticoes):
+    """
+    Executa um comando várias vezes e retorna a mediana e o mínimo (ms).
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        subprocess.run(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {'mediana_ms': round(statistics.median(tempos), 2), 'minimo_ms': round(min(tempos), 2)}
+
+
+def medir_inicializacao(repeticoes=20, total_regras=10000):
+    """
+    Mede o tempo de uma invocação completa de "firewall.py avaliar -q"
+    (processo novo a cada vez), com as regras lidas do JSON e do binário
+    compilado, comparado a um interpretador Python vazio.
+
+    Retorna:
+        dict: Tempos por cenário
+    """
+    with tempfile.TemporaryDirectory() as temporario:
+        arquivo_json = os.path.join(temporario, 'regras.json')
+        arquivo_bin = os.path.join(temporario, 'regras.fwc')
+        with open(arquivo_json, 'w', encoding='utf-8') as f:
+            json.dump(gerar_regras(total_regras), f)
+        compilar_regras(arquivo_json, arquivo_bin)
+
+        avaliar = [sys.executable, ARQUIVO_FIREWALL, 'avaliar', '10.0.0.1', '80', '-q',
+                   '--regras', arquivo_json]
+        return {
+            'regras': total_regras,
+            'python_vazio': _tempo_execucao([sys.executable, '-c', 'pass'], repeticoes),
+            'avaliar_json': _tempo_execucao(
+                avaliar + ['--compilado', os.path.join(temporario, 'inexistente.fwc')], repeticoes),
+            'avaliar_compilado': _tempo_execucao(avaliar + ['--compilado', arquivo_bin], repeticoes)
+        }
+
+
+def imprimir_tabela(resultados):
+    """
+    Exibe os resultados da comparação em forma de tabela.
+    """
+    print(f"{'Regras':>8} {'Família':>8} {'Tuplas':>7} {'Linear (µs)':>12} {'Índice (µs)':>12} "
+          f"{'Compilada (µs)':>15} {'Abrir .fwc (ms)':>16} {'Diverg.':>8}")
+    for r in resultados:
+        print(f"{r['regras']:>8} {r['familia']:>8} {r['tuplas']:>7} "
+              f"{r['busca_linear']['us_por_pacote']:>12} "
+              f"{r['indice_regras']['us_por_pacote']:>12} "
+              f"{r['politica_compilada']['us_por_pacote']:>15} "
+              f"{r['abertura_compilada_ms']:>16} {r['divergencias']:>8}")
+
+    print()
+    print("Memória (bytes por regra):")
+    print(f"{'Regras':>8} {'Família':>8} {'Dicts JSON':>11} {'list[Regra]':>12} "
+          f"{'TabelaRegras':>13} {'IndiceRegras':>13}")
+    for r in resultados:
+        memoria = r['memoria_bytes_por_regra']
+        print(f"{r['regras']:>8} {r['familia']:>8} {memoria['dicts_json']:>11} {memoria['lista_regra']:>12} "
+              f"{memoria['tabela_regras']:>13} {memoria['indice_regras']:>13}")
+
+
+def imprimir_inicializacao(inicializacao):
+    """
+    Exibe os tempos de inicialização da linha de comando.
+    """
+    print(f"Inicialização de 'firewall.py avaliar -q' ({inicializacao['regras']} regras):")
+    for cenario in ('python_vazio', 'avaliar_json', 'avaliar_compilado'):
+        tempos = inicializacao[cenario]
+        print(f"  {cenario:<18} mediana {tempos['mediana_ms']:>8} ms   mínimo {tempos['minimo_ms']:>8} ms")
+
+
+def main(argv=None):
+    """
+    Função principal: executa o benchmark e exibe os resultados.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark dos classificadores de pacotes")
+    parser.add_argument('--regras', default='100,1000,10000',
+                        help="Tamanhos dos conjuntos de regras (padrão: 100,1000,10000; "
+                             "vazio = não medir os classificadores)")
+    parser.add_argument('--pacotes', type=int, default=5000,
+                        help="Pacotes por conjunto (padrão: 5000)")
+    parser.add_argument('--inicializacao', type=int, default=20, metavar='N',
+                        help="Execuções da CLI no benchmark de inicialização (padrão: 20, 0 = pular)")
+    parser.add_argument('--ipv6', action='store_true',
+                        help="Medir também os mesmos conjuntos de regras em IPv6")
+    parser.add_argument('--json', action='store_true', help="Saída em JSON")
+    args = parser.parse_args(argv)
+
+    tamanhos = [int(t) for t in args.regras.split(',') if t.strip()]
+    resultados = comparar_classificadores(tamanhos, args.pacotes, ipv6=args.ipv6)
+    inicializacao = medir_inicializacao(args.inicializacao) if args.inicializacao > 0 else None
+
+    if args.json:
+        relatorio = {'classificadores': resultados}
+        if inicializacao is not None:
+            relatorio['inicializacao'] = inicializacao
+        print(json.dumps(relatorio, indent=2))
+    else:
+        if resultados:
+            imprimir_tabela(resultados)
+        if inicializacao is not None:
+            if resultados:
+                print()
+            imprimir_inicializacao(inicializacao)
+    return 1 if any(r['divergencias'] for r in resultados) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""
+Gerador de Carga - Tráfego sintético e teste de carga da API web
+Gera pacotes com distribuições configuráveis, envia requisições para a
+API do firewall_web em uma taxa alvo e mede vazão, latência (p50/p95/p99)
+e taxa de erros. O relatório sai em JSON para poder barrar releases.
+
+Uso:
+    python carga.py --local --taxa 500 --duracao 10
+    python carga.py --url http://localhost:5000 --alvos avaliar=8,avaliar-lote=2
+"""
+
+import argparse
+import http.client
+import json
+import queue
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Portas mais comuns e seus pesos no tráfego gerado
+MISTURA_PORTAS = {
+    80: 30, 443: 40, 53: 10, 22: 5, 25: 2, 3306: 2, 5432: 2, 8080: 4, 3389: 1
+}
+
+# Fração dos pacotes que usa uma porta alta aleatória fora da mistura
+FRACAO_PORTAS_ALTAS = 0.05
+
+# Caminho (POST) de cada alvo do teste de carga
+ALVOS = {
+    'testar-pacote': '/api/testar-pacote',
+    'avaliar': '/api/avaliar',
+    'avaliar-lote': '/api/avaliar',
+}
+
+
+# ============================================================================
+# GERAÇÃO DE PACOTES
+# ============================================================================
+
+class GeradorPacotes:
+    """
+    Gera pacotes sintéticos {"ip": ..., "porta": ...}.
+
+    Distribuições:
+        - "zipf": um conjunto fixo de fluxos, escolhidos com frequência
+          proporcional a 1/k^s (poucos fluxos concentram o tráfego)
+        - "aleatorio": IPv4 e porta sorteados a cada pacote
+    """
+
+    def __init__(self, distribuicao='zipf', fluxos=1000, expoente=1.1,
+                 regras=None, fracao_regras=0.5, semente=None):
+        """
+        Args:
+            distribuicao (str): "zipf" ou "aleatorio"
+            fluxos (int): Quantidade de fluxos distintos (zipf)
+            expoente (float): Expoente s da distribuição Zipf
+            regras (list, opcional): Regras cujos IP:porta entram no tráfego
+            fracao_regras (float): Fração dos fluxos tirada das regras
+            semente (int, opcional): Semente para tráfego reprodutível
+        """
+        if distribuicao not in ('zipf', 'aleatorio'):
+            raise ValueError(f"Distribuição desconhecida: {distribuicao}")
+        self.distribuicao = distribuicao
+        self._aleatorio = random.Random(semente)
+        self._portas = list(MISTURA_PORTAS)
+        self._pesos_portas = list(MISTURA_PORTAS.values())
+        # Só regras com host e porta concretos viram alvos de tráfego
+        self._regras = [
+            (r['ip'], r['porta']) for r in (regras or [])
+            if r.get('porta') not in (None, '*') and '/' not in str(r['ip']) and r['ip'] != '*'
+        ]
+        self._fracao_regras = fracao_regras if self._regras else 0
+
+        if distribuicao == 'zipf':
+            self._fluxos = [self._novo_fluxo() for _ in range(fluxos)]
+            self._pesos_acumulados = []
+            acumulado = 0.0
+            for k in range(1, fluxos + 1):
+                acumulado += 1 / k ** expoente
+                self._pesos_acumulados.append(acumulado)
+
+    def _nova_porta(self):
+        """
+        Sorteia uma porta da mistura de portas comuns (ou uma porta alta).
+        """
+        if self._aleatorio.random() < FRACAO_PORTAS_ALTAS:
+            return self._aleatorio.randint(1024, 65535)
+        return self._aleatorio.choices(self._portas, self._pesos_portas)[0]
+
+    def _novo_fluxo(self):
+        """
+        Sorteia um fluxo (ip, porta).
+        """
+        # Parte do tráfego acerta regras existentes, o resto cai no padrão
+        if self._aleatorio.random() < self._fracao_regras:
+            return self._aleatorio.choice(self._regras)
+        ip = '.'.join(str(self._aleatorio.randint(1, 254)) for _ in range(4))
+        return ip, self._nova_porta()
+
+    def proximo(self):
+        """
+        Retorna o próximo pacote da distribuição.
+        """
+        if self.distribuicao == 'zipf':
+            ip, porta = self._aleatorio.choices(
+                self._fluxos, cum_weights=self._pesos_acumulados)[0]
+        else:
+            ip, porta = self._novo_fluxo()
+        return {'ip': ip, 'porta': porta}
+
+
+# ============================================================================
+# EXECUÇÃO DA CARGA
+# ============================================================================
+
+def percentil(valores_ordenados, p):
+    """
+    Percentil pelo método do posto mais próximo.
+
+    Args:
+        valores_ordenados (list): Valores já ordenados
+        p (float): Percentil entre 0 e 100
+
+    Retorna:
+        float: Valor do percentil (0.0 se a lista estiver vazia)
+    """
+    if not valores_ordenados:
+        return 0.0
+    posto = max(1, -(-len(valores_ordenados) * p // 100))
+    return valores_ordenados[int(posto) - 1]
+
+
+def _corpo_requisicao(alvo, gerador, lote):
+    """
+    Monta o corpo JSON de uma requisição para o alvo informado.
+    """
+    if alvo == 'avaliar-lote':
+        return {'pacotes': [gerador.proximo() for _ in range(lote)]}
+    return gerador.proximo()
+
+
+def executar_carga(url, alvos, taxa, duracao, gerador, lote=100,
+                   trabalhadores=32, timeout=10):
+    """
+    Envia requisições em malha aberta: cada requisição tem um horário de
+    saída agendado pela taxa alvo, e a latência é medida a partir desse
+    horário. Se o servidor atrasar, a fila cresce e o atraso aparece na
+    latência (evita a omissão coordenada).
+
+    Args:
+        url (str): Endereço base da aplicação (ex.: http://localhost:5000)
+        alvos (dict): Peso de cada alvo, ex.: {"avaliar": 8, "avaliar-lote": 2}
+        taxa (float): Requisições por segundo
+        duracao (float): Duração do teste em segundos
+        gerador (GeradorPacotes): Fonte dos pacotes
+        lote (int): Pacotes por requisição no alvo "avaliar-lote"
+        trabalhadores (int): Conexões HTTP simultâneas
+        timeout (float): Tempo limite de cada requisição em segundos
+
+    Retorna:
+        dict: Relatório com métricas gerais e por alvo
+    """
+    endereco = urlsplit(url)
+    nomes = list(alvos)
+    pesos = [alvos[nome] for nome in nomes]
+    sorteio = random.Random(0)
+
+    agenda = queue.Queue()
+    medidas = {nome: {'latencias': [], 'erros': 0, 'status': {}} for nome in nomes}
+    trava = threading.Lock()
+
+    def trabalhador():
+        conexao = None
+        while True:
+            item = agenda.get()
+            if item is None:
+                break
+            alvo, horario, corpo = item
+            atraso = horario - time.perf_counter()
+            if atraso > 0:
+                time.sleep(atraso)
+
+            status = None
+            try:
+                if conexao is None:
+                    conexao = http.client.HTTPConnection(endereco.hostname,
+                                                         endereco.port or 80,
+                                                         timeout=timeout)
+                conexao.request('POST', ALVOS[alvo], body=corpo,
+                                headers={'Content-Type': 'application/json'})
+                resposta = conexao.getresponse()
+                resposta.read()
+                status = resposta.status
+            except (OSError, http.client.HTTPException):
+                if conexao is not None:
+                    conexao.close()
+                conexao = None
+            latencia = (time.perf_counter() - horario) * 1000
+
+            with trava:
+                medida = medidas[alvo]
+                medida['latencias'].append(latencia)
+                chave = str(status) if status is not None else 'falha'
+                medida['status'][chave] = medida['status'].get(chave, 0) + 1
+                if status is None or status >= 400:
+                    medida['erros'] += 1
+        if conexao is not None:
+            conexao.close()
+
+    threads = [threading.Thread(target=trabalhador, daemon=True)
+               for _ in range(trabalhadores)]
+    for thread in threads:
+        thread.start()
+
+    # Agenda as requisições no ritmo da taxa alvo
+    inicio = time.perf_counter()
+    total = int(taxa * duracao)
+    for i in range(total):
+        horario = inicio + i / taxa
+        alvo = sorteio.choices(nomes, pesos)[0]
+        corpo = json.dumps(_corpo_requisicao(alvo, gerador, lote))
+        espera = horario - time.perf_counter() - 0.05
+        if espera > 0:
+            time.sleep(espera)
+        agenda.put((alvo, horario, corpo))
+
+    for _ in threads:
+        agenda.put(None)
+    for thread in threads:
+        thread.join()
+    decorrido = time.perf_counter() - inicio
+
+    return montar_relatorio(medidas, decorrido, taxa, lote)
+
+
+def _resumo(latencias, erros, decorrido):
+    """
+    Calcula vazão, taxa de erros e percentis de latência de uma série.
+    """
+    latencias = sorted(latencias)
+    total = len(latencias)
+    return {
+        'requisicoes': total,
+        'erros': erros,
+        'taxa_erros': round(erros / total, 4) if total else 0.0,
+        'vazao_rps': round(total / decorrido, 2) if decorrido else 0.0,
+        'latencia_ms': {
+            'p50': round(percentil(latencias, 50), 3),
+            'p95': round(percentil(latencias, 95), 3),
+            'p99': round(percentil(latencias, 99), 3),
+            'max': round(latencias[-1], 3) if latencias else 0.0
+        }
+    }
+
+
+def montar_relatorio(medidas, decorrido, taxa, lote):
+    """
+    Monta o relatório final a partir das medidas de cada alvo.
+    """
+    todas = [lat for medida in medidas.values() for lat in medida['latencias']]
+    erros = sum(medida['erros'] for medida in medidas.values())
+
+    relatorio = {
+        'taxa_alvo_rps': taxa,
+        'duracao_s': round(decorrido, 3),
+        'geral': _resumo(todas, erros, decorrido),
+        'alvos': {}
+    }
+    for nome, medida in medidas.items():
+        resumo = _resumo(medida['latencias'], medida['erros'], decorrido)
+        resumo['status'] = medida['status']
+        if nome == 'avaliar-lote':
+            resumo['pacotes_por_s'] = round(resumo['vazao_rps'] * lote, 2)
+        relatorio['alvos'][nome] = resumo
+    return relatorio
+
+
+def verificar_limites(relatorio, max_p99_ms=None, max_taxa_erros=None):
+    """
+    Compara o relatório com os limites de aprovação.
+
+    Retorna:
+        list: Mensagens de violação (vazia se aprovado)
+    """
+    violacoes = []
+    geral = relatorio['geral']
+    if max_p99_ms is not None and geral['latencia_ms']['p99'] > max_p99_ms:
+        violacoes.append(f"p99 {geral['latencia_ms']['p99']} ms > {max_p99_ms} ms")
+    if max_taxa_erros is not None and geral['taxa_erros'] > max_taxa_erros:
+        violacoes.append(f"taxa de erros {geral['taxa_erros']} > {max_taxa_erros}")
+    return violacoes
+
+
+# ============================================================================
+# SERVIDOR LOCAL
+# ============================================================================
+
+def iniciar_servidor_local():
+    """
+    Sobe o firewall_web em uma porta livre de 127.0.0.1, em segundo plano.
+
+    Retorna:
+        tuple: (url base, servidor) — chame servidor.shutdown() ao final
+    """
+    import logging
+    from werkzeug.serving import make_server
+    from firewall_web import app
+
+    # O log por requisição do servidor de desenvolvimento distorce a medição
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}", servidor
+
+
+def _ler_alvos(especificacao):
+    """
+    Converte "avaliar=8,avaliar-lote=2" em {"avaliar": 8.0, "avaliar-lote": 2.0}.
+    """
+    alvos = {}
+    for item in especificacao.split(','):
+        nome, _, peso = item.strip().partition('=')
+        if nome not in ALVOS:
+            raise ValueError(f"Alvo desconhecido: {nome} (opções: {', '.join(ALVOS)})")
+        alvos[nome] = float(peso or 1)
+    return alvos
+
+
+def main(argv=None):
+    """
+    Função principal: executa o teste de carga e imprime o relatório JSON.
+    """
+    parser = argparse.ArgumentParser(description="Teste de carga da API do Simulador de Firewall")
+    destino = parser.add_mutually_exclusive_group()
+    destino.add_argument('--url', default='http://127.0.0.1:5000',
+                         help="Endereço da aplicação (padrão: http://127.0.0.1:5000)")
+    destino.add_argument('--local', action='store_true',
+                         help="Sobe uma instância local do firewall_web para o teste")
+    parser.add_argument('--alvos', default='avaliar=8,avaliar-lote=2',
+                        help="Alvos e pesos (padrão: avaliar=8,avaliar-lote=2; "
+                             "opções: testar-pacote, avaliar, avaliar-lote)")
+    parser.add_argument('--taxa', type=float, default=200, help="Requisições por segundo (padrão: 200)")
+    parser.add_argument('--duracao', type=float, default=10, help="Duração em segundos (padrão: 10)")
+    parser.add_argument('--lote', type=int, default=100, help="Pacotes por requisição em lote (padrão: 100)")
+    parser.add_argument('--trabalhadores', type=int, default=32,
+                        help="Conexões simultâneas (padrão: 32)")
+    parser.add_argument('--distribuicao', choices=['zipf', 'aleatorio'], default='zipf',
+                        help="Distribuição dos pacotes (padrão: zipf)")
+    parser.add_argument('--fluxos', type=int, default=1000, help="Fluxos distintos na Zipf (padrão: 1000)")
+    parser.add_argument('--expoente', type=float, default=1.1, help="Expoente da Zipf (padrão: 1.1)")
+    parser.add_argument('--regras', default='regras.json',
+                        help="Regras usadas para gerar tráfego que casa com elas (padrão: regras.json)")
+    parser.add_argument('--semente', type=int, default=None, help="Semente do gerador de pacotes")
+    parser.add_argument('--saida', help="Grava o relatório JSON neste arquivo")
+    parser.add_argument('--max-p99-ms', type=float, help="Reprova se o p99 geral passar deste valor")
+    parser.add_argument('--max-taxa-erros', type=float, help="Reprova se a taxa de erros passar deste valor")
+    args = parser.parse_args(argv)
+
+    try:
+        alvos = _ler_alvos(args.alvos)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        with open(args.regras, 'r', encoding='utf-8') as f:
+            regras = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        regras = []
+    gerador = GeradorPacotes(args.distribuicao, args.fluxos, args.expoente,
+                             regras=regras, semente=args.semente)
+
+    servidor = None
+    url = args.url
+    if args.local:
+        url, servidor = iniciar_servidor_local()
+
+    try:
+        relatorio = executar_carga(url, alvos, args.taxa, args.duracao, gerador,
+                                   lote=args.lote, trabalhadores=args.trabalhadores)
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+
+    violacoes = verificar_limites(relatorio, args.max_p99_ms, args.max_taxa_erros)
+    relatorio['aprovado'] = not violacoes
+    relatorio['violacoes'] = violacoes
+
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(saida + '\n')
+    print(saida)
+    return 0 if not violacoes else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
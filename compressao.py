@@ -0,0 +1,197 @@
+"""
+Compressão - Codificação gzip/brotli e cache HTTP das respostas
+Comprime respostas de texto (HTML, JSON, CSS, JS) conforme o
+Accept-Encoding do cliente, guarda os corpos já comprimidos por ETag (um
+painel que consulta sempre o mesmo recurso não paga a compressão de novo)
+e calcula as impressões digitais dos arquivos estáticos usadas nas URLs
+de cache longo.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# brotli é opcional (pip install brotli); sem ele, só gzip é oferecido
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Respostas menores que isso não compensam a compressão
+TAMANHO_MINIMO = 500
+
+# Tipos de conteúdo comprimidos
+TIPOS_COMPRIMIVEIS = frozenset({
+    'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json'
+})
+
+# Corpos comprimidos guardados (por ETag e codificação)
+MAX_CORPOS_CACHE = 64
+
+# Validade de um arquivo estático servido com impressão digital na URL
+CACHE_ESTATICOS = 365 * 24 * 3600
+
+
+def codificacoes_suportadas():
+    """
+    Retorna as codificações oferecidas, da preferida para a menos preferida.
+    """
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def escolher_codificacao(aceitas):
+    """
+    Escolhe a codificação da resposta a partir do Accept-Encoding.
+
+    Args:
+        aceitas: request.accept_encodings (werkzeug)
+
+    Retorna:
+        str ou None: "br", "gzip" ou None (sem compressão)
+    """
+    for codificacao in codificacoes_suportadas():
+        if aceitas[codificacao] > 0:
+            return codificacao
+    return None
+
+
+def comprimir(dados, codificacao):
+    """
+    Comprime os bytes na codificação pedida. O gzip é gerado sem data no
+    cabeçalho, para que o mesmo conteúdo gere sempre os mesmos bytes (a
+    ETag forte da versão comprimida continua válida).
+    """
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=5)
+    return gzip.compress(dados, compresslevel=6, mtime=0)
+
+
+def variantes_etag(etag, aceitas):
+    """
+    Retorna as ETags que um cliente pode revalidar nesta requisição: a do
+    recurso sem compressão e a da versão na codificação que ele aceita
+    agora, que recebe o nome da codificação como sufixo ("...-gzip").
+
+    Args:
+        etag (str): ETag forte do recurso (sem aspas)
+        aceitas: request.accept_encodings (werkzeug)
+    """
+    codificacao = escolher_codificacao(aceitas)
+    if codificacao is None:
+        return (etag,)
+    return (etag, f"{etag}-{codificacao}")
+
+
+class CompressorRespostas:
+    """
+    Comprime respostas do Flask e guarda os corpos comprimidos das que têm
+    ETag forte, em uma tabela LRU de tamanho limitado.
+    """
+
+    def __init__(self, max_corpos=MAX_CORPOS_CACHE):
+        """
+        Args:
+            max_corpos (int): Corpos comprimidos guardados
+        """
+        self.max_corpos = max_corpos
+        self._corpos = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.compressoes = 0
+
+    def _corpo_comprimido(self, chave, dados, codificacao):
+        """
+        Retorna o corpo comprimido, do cache quando a chave é conhecida.
+        """
+        if chave is not None:
+            with self._trava:
+                corpo = self._corpos.get(chave)
+                if corpo is not None:
+                    self._corpos.move_to_end(chave)
+                    self.acertos += 1
+                    return corpo
+
+        corpo = comprimir(dados, codificacao)
+        with self._trava:
+            self.compressoes += 1
+            if chave is not None:
+                self._corpos[chave] = corpo
+                while len(self._corpos) > self.max_corpos:
+                    self._corpos.popitem(last=False)
+        return corpo
+
+    def processar(self, response, aceitas):
+        """
+        Comprime a resposta, se o tipo, o tamanho e o cliente permitirem.
+
+        Respostas em streaming (geradores) e já codificadas passam sem
+        alteração; arquivos estáticos são lidos e comprimidos.
+
+        Args:
+            response: Resposta do Flask
+            aceitas: request.accept_encodings
+
+        Retorna:
+            A mesma resposta, possivelmente comprimida
+        """
+        if (response.status_code != 200 or 'Content-Encoding' in response.headers
+                or response.mimetype not in TIPOS_COMPRIMIVEIS
+                or (response.is_streamed and not response.direct_passthrough)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        codificacao = escolher_codificacao(aceitas)
+        if codificacao is None:
+            return response
+
+        response.direct_passthrough = False
+        dados = response.get_data()
+        if len(dados) < TAMANHO_MINIMO:
+            return response
+
+        etag, fraca = response.get_etag()
+        chave = (etag, codificacao) if etag and not fraca else None
+        response.set_data(self._corpo_comprimido(chave, dados, codificacao))
+        response.headers['Content-Encoding'] = codificacao
+        if etag:
+            response.set_etag(f"{etag}-{codificacao}", weak=fraca)
+        return response
+
+    def estatisticas(self):
+        """
+        Retorna os contadores do cache de corpos comprimidos.
+        """
+        with self._trava:
+            return {'corpos': len(self._corpos), 'acertos': self.acertos,
+                    'compressoes': self.compressoes}
+
+
+_impressoes = {}
+
+
+def impressao_digital(caminho):
+    """
+    Retorna um resumo curto do conteúdo de um arquivo, usado na URL dos
+    estáticos: a URL muda quando o arquivo muda, então ela pode ficar em
+    cache por tempo indeterminado. Recalcula só se o arquivo mudar.
+
+    Retorna:
+        str ou None se o arquivo não existir
+    """
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    assinatura = (info.st_mtime_ns, info.st_size)
+
+    guardada = _impressoes.get(caminho)
+    if guardada is not None and guardada[0] == assinatura:
+        return guardada[1]
+
+    with open(caminho, 'rb') as f:
+        resumo = hashlib.sha256(f.read()).hexdigest()[:12]
+    _impressoes[caminho] = (assinatura, resumo)
+    return resumo
@@ -1,6 +1,15 @@
+import argparse
 import json
-import socket
-from datetime import datetime
+import os
+import sys
+
+# Os módulos do motor de regras são importados sob demanda, dentro de cada
+# comando, para que invocações rápidas (ex.: "avaliar -q") não paguem pelo
+# que não usam
+
+# Arquivos padrão de regras e da política compilada
+ARQUIVO_REGRAS = "regras.json"
+ARQUIVO_COMPILADO = "regras.fwc"
 
 # Cores para terminal (funciona no Linux/Mac, Windows 10+)
 class Cores:
@@ -14,8 +23,15 @@ class Cores:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+def desativar_cores():
+    """Remove as cores (saída redirecionada ou NO_COLOR definido)"""
+    for nome in ('HEADER', 'AZUL', 'CIANO', 'VERDE', 'AMARELO', 'VERMELHO', 'RESET', 'BOLD', 'UNDERLINE'):
+        setattr(Cores, nome, '')
+
 def print_header():
     """Exibe o cabeçalho do programa"""
+    from datetime import datetime
+    
     print(f"\n{Cores.CIANO}{'='*70}{Cores.RESET}")
     print(f"{Cores.BOLD}{Cores.AZUL}🧱 SIMULADOR DE FIREWALL - FILTRO DE PACOTES{Cores.RESET}")
     print(f"{Cores.CIANO}{'='*70}{Cores.RESET}")
@@ -23,6 +39,8 @@ def print_header():
 
 def carregar_regras(arquivo):
     """Carrega regras de filtragem do arquivo JSON"""
+    from motor_regras import formatar_portas
+    
     try:
         with open(arquivo, 'r', encoding='utf-8') as f:
             regras = json.load(f)
@@ -33,7 +51,7 @@ def carregar_regras(arquivo):
             print(f"{Cores.CIANO}{'─'*70}{Cores.RESET}")
             for i, regra in enumerate(regras, 1):
                 cor_acao = Cores.VERDE if regra['acao'] == 'PERMITIDO' else Cores.VERMELHO
-                print(f"  {i}. IP: {regra['ip']:<15} | Porta: {regra['porta']:<6} | Ação: {cor_acao}{regra['acao']}{Cores.RESET}")
+                print(f"  {i}. IP: {regra['ip']:<15} | Porta: {formatar_portas(regra):<6} | Ação: {cor_acao}{regra['acao']}{Cores.RESET}")
             print(f"{Cores.CIANO}{'─'*70}{Cores.RESET}\n")
             
             return regras
@@ -45,27 +63,38 @@ def carregar_regras(arquivo):
         return []
 
 def verificar_porta(ip, porta, timeout=1):
-    """Testa se uma porta está respondendo"""
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.settimeout(timeout)
+    """Testa se uma porta está respondendo (IPv4 ou IPv6, todos os endereços do host)"""
+    import socket
+    
     try:
-        resultado = s.connect_ex((ip, porta))
-        s.close()
-        return resultado == 0
+        enderecos = socket.getaddrinfo(ip, porta, type=socket.SOCK_STREAM)
     except socket.gaierror:
         return None  # Host não encontrado
     except:
         return False
+    
+    for familia, tipo, protocolo, _, endereco in enderecos:
+        try:
+            s = socket.socket(familia, tipo, protocolo)
+            try:
+                s.settimeout(timeout)
+                if s.connect_ex(endereco) == 0:
+                    return True
+            finally:
+                s.close()
+        except:
+            continue
+    return False
 
 def filtrar_pacote(pacote, regras):
-    """Aplica regras de filtragem no pacote"""
-    for regra in regras:
-        if pacote['ip'] == regra['ip'] and pacote['porta'] == regra['porta']:
-            return regra['acao']
-    return "BLOQUEADO"  # Política padrão: negar tudo que não tem regra
-
-def testar_pacote(pacote, regras, numero):
-    """Testa um pacote específico"""
+    """Aplica regras de filtragem no pacote (primeira regra que casa vence)"""
+    from motor_regras import filtrar_referencia
+    
+    # Política padrão: negar tudo que não tem regra
+    return filtrar_referencia(pacote, regras)
+
+def testar_pacote(pacote, regras, numero, politica=None):
+    """Testa um pacote específico (usa a política compilada quando informada)"""
     print(f"{Cores.BOLD}{Cores.AZUL}🔍 Teste #{numero}: {pacote['ip']}:{pacote['porta']}{Cores.RESET}")
     print(f"{Cores.CIANO}{'─'*70}{Cores.RESET}")
     
@@ -81,7 +110,11 @@ def testar_pacote(pacote, regras, numero):
         print(f"{Cores.VERMELHO}✗ Porta FECHADA (sem resposta){Cores.RESET}")
     
     # 2. Aplicação das regras
-    resultado = filtrar_pacote(pacote, regras)
+    if politica is not None:
+        resultado = politica.decidir(pacote['ip'], pacote.get('porta'), pacote.get('origem'),
+                                     pacote.get('protocolo'), pacote.get('direcao'))
+    else:
+        resultado = filtrar_pacote(pacote, regras)
     print(f"  🛡️  Decisão do Firewall...", end=" ")
     
     if resultado == "PERMITIDO":
@@ -115,7 +148,7 @@ def obter_descricao_servico(porta):
     }
     return servicos.get(porta, "Desconhecido")
 
-def modo_interativo(regras):
+def modo_interativo(regras, politica=None):
     """Modo interativo para testar pacotes personalizados"""
     print(f"\n{Cores.BOLD}{Cores.VERDE}🎮 MODO INTERATIVO{Cores.RESET}")
     print(f"{Cores.AMARELO}Digite os dados do pacote para testar (ou 'sair' para encerrar){Cores.RESET}\n")
@@ -143,7 +176,7 @@ def modo_interativo(regras):
             print(f"{Cores.AMARELO}ℹ️  Serviço comum: {servico}{Cores.RESET}\n")
             
             pacote = {"ip": ip, "porta": porta}
-            testar_pacote(pacote, regras, contador)
+            testar_pacote(pacote, regras, contador, politica)
             contador += 1
             
             # Pergunta se quer continuar
@@ -157,17 +190,26 @@ def modo_interativo(regras):
             print(f"\n{Cores.AMARELO}⚠️  Interrompido pelo usuário{Cores.RESET}")
             break
 
-def main():
-    """Função principal"""
+def executar_simulacao():
+    """Executa a simulação completa (testes automáticos + modo interativo)"""
+    from politica_compilada import carregar_politica
+    
     print_header()
     
     # Carrega regras
-    regras = carregar_regras("regras.json")
+    regras = carregar_regras(ARQUIVO_REGRAS)
     
     if not regras:
         print(f"{Cores.VERMELHO}⚠️  Nenhuma regra carregada. Encerrando...{Cores.RESET}")
         return
     
+    # Decisões usam o binário compilado quando ele está atualizado
+    try:
+        politica = carregar_politica(ARQUIVO_REGRAS, ARQUIVO_COMPILADO)
+    except ValueError as e:
+        print(f"{Cores.VERMELHO}❌ ERRO: {e}{Cores.RESET}")
+        return
+    
     # Testes automáticos
     print(f"{Cores.BOLD}{Cores.VERDE}🚀 EXECUTANDO TESTES AUTOMÁTICOS{Cores.RESET}\n")
     
@@ -181,7 +223,7 @@ def main():
     resultados = {"PERMITIDO": 0, "BLOQUEADO": 0}
     
     for i, pacote in enumerate(pacotes_teste, 1):
-        resultado = testar_pacote(pacote, regras, i)
+        resultado = testar_pacote(pacote, regras, i, politica)
         resultados[resultado] += 1
     
     # Estatísticas
@@ -195,12 +237,389 @@ def main():
     # Pergunta se quer modo interativo
     resposta = input(f"{Cores.AMARELO}Deseja testar pacotes personalizados? (s/n): {Cores.RESET}").strip().lower()
     if resposta == 's':
-        modo_interativo(regras)
+        modo_interativo(regras, politica)
     
     # Finalização
     print(f"\n{Cores.CIANO}{'='*70}{Cores.RESET}")
     print(f"{Cores.VERDE}{Cores.BOLD}✅ SIMULAÇÃO CONCLUÍDA COM SUCESSO!{Cores.RESET}")
     print(f"{Cores.CIANO}{'='*70}{Cores.RESET}\n")
 
+def comando_compilar(args):
+    """
+    Compila o arquivo de regras JSON para o formato binário.
+    Código de saída: 0 = compilado, 2 = erro.
+    """
+    from politica_compilada import compilar_regras
+    
+    try:
+        total = compilar_regras(args.regras, args.saida)
+    except FileNotFoundError:
+        print(f"{Cores.VERMELHO}❌ ERRO: Arquivo '{args.regras}' não encontrado!{Cores.RESET}",
+              file=sys.stderr)
+        return 2
+    except json.JSONDecodeError:
+        print(f"{Cores.VERMELHO}❌ ERRO: Formato JSON inválido no arquivo '{args.regras}'!{Cores.RESET}",
+              file=sys.stderr)
+        return 2
+    except (OSError, ValueError) as e:
+        print(f"{Cores.VERMELHO}❌ ERRO: {e}{Cores.RESET}", file=sys.stderr)
+        return 2
+    
+    if args.json:
+        print(json.dumps({"regras": total, "saida": args.saida}))
+    elif not args.quieto:
+        print(f"{Cores.VERDE}✅ {total} regra(s) compilada(s) em '{args.saida}'{Cores.RESET}")
+    return 0
+
+def carregar_politica_cli(args):
+    """Carrega a política de decisão indicada pelas opções --regras/--compilado"""
+    from politica_compilada import carregar_politica
+    
+    return carregar_politica(args.regras, args.compilado)
+
+def decidir_pacote(politica, pacote, baldes=None, agora=None):
+    """Decide um pacote no formato JSON (ip, porta, origem, protocolo, direcao)"""
+    return politica.decidir(pacote['ip'], pacote.get('porta'), pacote.get('origem'),
+                            pacote.get('protocolo'), pacote.get('direcao'),
+                            baldes=baldes, agora=agora)
+
+def comando_avaliar(args):
+    """
+    Decide um pacote sem testar conectividade nem pedir dados ao usuário.
+    Código de saída: 0 = PERMITIDO, 1 = BLOQUEADO, 2 = erro.
+    """
+    pacote = {"ip": args.ip, "porta": args.porta, "origem": args.origem,
+              "protocolo": args.protocolo, "direcao": args.direcao}
+    pacote = {campo: valor for campo, valor in pacote.items() if valor is not None}
+    
+    try:
+        politica = carregar_politica_cli(args)
+        decisao = decidir_pacote(politica, pacote)
+        explicacao = None
+        if args.explicar:
+            explicacao = politica.explicar(pacote['ip'], pacote.get('porta'), pacote.get('origem'),
+                                           pacote.get('protocolo'), pacote.get('direcao'))
+    except ValueError as e:
+        print(f"{Cores.VERMELHO}❌ ERRO: {e}{Cores.RESET}", file=sys.stderr)
+        return 2
+    
+    if args.json:
+        resultado = {**pacote, "decisao": decisao}
+        if explicacao is not None:
+            resultado["explicacao"] = explicacao
+        print(json.dumps(resultado))
+    elif not args.quieto:
+        cor_acao = Cores.VERDE if decisao == 'PERMITIDO' else Cores.VERMELHO
+        alvo = f"{args.ip}:{args.porta}" if args.porta is not None else args.ip
+        print(f"{alvo} {cor_acao}{decisao}{Cores.RESET}")
+        if explicacao is not None:
+            print(f"  {explicacao['motivo']}")
+            print(f"  {explicacao['candidatos']} regra(s) candidata(s), "
+                  f"{explicacao['tabelas_consultadas']} de {explicacao['tabelas']} tabela(s) consultada(s)")
+    return 0 if decisao == 'PERMITIDO' else 1
+
+def ler_pacotes(arquivo):
+    """
+    Lê pacotes gravados: uma lista JSON (ex.: testes_historico.json) ou um
+    objeto JSON por linha (NDJSON). Linhas inválidas viram None.
+    """
+    primeira = arquivo.readline()
+    if primeira.lstrip().startswith('['):
+        try:
+            pacotes = json.loads(primeira + arquivo.read())
+        except json.JSONDecodeError:
+            raise ValueError("Formato JSON inválido")
+        yield from (p if isinstance(p, dict) else None for p in pacotes)
+        return
+    
+    linha = primeira
+    while linha:
+        if linha.strip():
+            try:
+                pacote = json.loads(linha)
+            except json.JSONDecodeError:
+                pacote = None
+            yield pacote if isinstance(pacote, dict) else None
+        linha = arquivo.readline()
+
+def comando_reproduzir(args):
+    """
+    Reavalia tráfego gravado contra as regras atuais. Regras LIMITADO usam
+    o campo "tempo" (segundos) de cada pacote, ou, sem ele, pacotes
+    espaçados igualmente a --pps pacotes por segundo.
+    """
+    from limitacao import CAPACIDADE_PADRAO, TabelaBaldes
+    
+    contagem = {"PERMITIDO": 0, "BLOQUEADO": 0, "LIMITADO": 0, "invalidos": 0, "alterados": 0}
+    
+    try:
+        baldes = TabelaBaldes(args.capacidade_baldes or CAPACIDADE_PADRAO)
+        politica = carregar_politica_cli(args)
+        arquivo = sys.stdin if args.arquivo == '-' else open(args.arquivo, 'r', encoding='utf-8')
+    except (OSError, ValueError) as e:
+        print(f"{Cores.VERMELHO}❌ ERRO: {e}{Cores.RESET}", file=sys.stderr)
+        return 2
+    
+    try:
+        with arquivo:
+            for numero, pacote in enumerate(ler_pacotes(arquivo)):
+                # Como em impacto.agrupar_fluxos: a porta gravada precisa ser um inteiro
+                if (pacote is None or 'ip' not in pacote
+                        or (pacote.get('porta') is not None and type(pacote['porta']) is not int)):
+                    contagem["invalidos"] += 1
+                    continue
+                agora = pacote.get('tempo')
+                if isinstance(agora, bool) or not isinstance(agora, (int, float)):
+                    agora = numero / args.pps
+                try:
+                    decisao = decidir_pacote(politica, pacote, baldes, agora)
+                except (AttributeError, TypeError, ValueError):
+                    # Porta fora de 0-65535, protocolo/direção que não são texto...
+                    contagem["invalidos"] += 1
+                    continue
+                contagem[decisao] += 1
+                anterior = pacote.get('decisao')
+                if anterior is not None and anterior != decisao:
+                    contagem["alterados"] += 1
+                
+                if args.quieto:
+                    continue
+                if args.json:
+                    resultado = {campo: pacote[campo] for campo in
+                                 ('ip', 'porta', 'origem', 'protocolo', 'direcao') if campo in pacote}
+                    resultado["decisao"] = decisao
+                    if anterior is not None:
+                        resultado["decisao_anterior"] = anterior
+                    print(json.dumps(resultado))
+                else:
+                    cor_acao = {'PERMITIDO': Cores.VERDE, 'LIMITADO': Cores.AMARELO}.get(decisao, Cores.VERMELHO)
+                    alvo = f"{pacote['ip']}:{pacote['porta']}" if pacote.get('porta') is not None else pacote['ip']
+                    mudou = f" {Cores.AMARELO}(antes: {anterior}){Cores.RESET}" if anterior not in (None, decisao) else ""
+                    print(f"  {alvo:<22} {cor_acao}{decisao}{Cores.RESET}{mudou}")
+    except ValueError as e:
+        print(f"{Cores.VERMELHO}❌ ERRO: {e}{Cores.RESET}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print(f"\n{Cores.AMARELO}⚠️  Interrompido pelo usuário{Cores.RESET}", file=sys.stderr)
+        return 130
+    
+    total = contagem["PERMITIDO"] + contagem["BLOQUEADO"] + contagem["LIMITADO"]
+    if args.json:
+        print(json.dumps({"resumo": {"total": total, "permitidos": contagem["PERMITIDO"],
+                                     "bloqueados": contagem["BLOQUEADO"],
+                                     "limitados": contagem["LIMITADO"],
+                                     "alterados": contagem["alterados"],
+                                     "invalidos": contagem["invalidos"],
+                                     "baldes": baldes.estatisticas()}}))
+    else:
+        print(f"{Cores.BOLD}📊 {total} pacote(s) | "
+              f"{Cores.VERDE}{contagem['PERMITIDO']} permitido(s){Cores.RESET}{Cores.BOLD} | "
+              f"{Cores.VERMELHO}{contagem['BLOQUEADO']} bloqueado(s){Cores.RESET}{Cores.BOLD} | "
+              f"{Cores.AMARELO}{contagem['LIMITADO']} limitado(s){Cores.RESET}{Cores.BOLD} | "
+              f"{contagem['alterados']} com decisão alterada | "
+              f"{contagem['invalidos']} inválido(s){Cores.RESET}")
+    return 0
+
+def ler_json(arquivo):
+    """Lê um arquivo JSON sem exibir nada (lança OSError/ValueError)"""
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def comando_impacto(args):
+    """
+    Mostra quais fluxos do tráfego gravado mudariam de decisão com as
+    regras candidatas. Código de saída: 0 = nenhuma mudança, 1 = há
+    mudanças, 2 = erro.
+    """
+    from impacto import comparar_politicas
+    
+    try:
+        atuais, candidatas = ler_json(args.regras), ler_json(args.candidatas)
+        arquivo = sys.stdin if args.arquivo == '-' else open(args.arquivo, 'r', encoding='utf-8')
+        with arquivo:
+            resultado = comparar_politicas(atuais, candidatas, ler_pacotes(arquivo),
+                                           max_exemplos=args.exemplos)
+    except (OSError, ValueError) as e:
+        print(f"{Cores.VERMELHO}❌ ERRO: {e}{Cores.RESET}", file=sys.stderr)
+        return 2
+    
+    if args.json:
+        print(json.dumps(resultado))
+    else:
+        if not args.quieto:
+            for mudanca in resultado['mudancas']:
+                print(f"{Cores.BOLD}{mudanca['antes']} → {mudanca['depois']}: "
+                      f"{mudanca['pacotes']} pacote(s) em {mudanca['fluxos']} fluxo(s){Cores.RESET}")
+                for exemplo in mudanca['exemplos']:
+                    alvo = f"{exemplo['ip']}:{exemplo['porta']}" if 'porta' in exemplo else exemplo['ip']
+                    origem = f" de {exemplo['origem']}" if 'origem' in exemplo else ""
+                    print(f"  {alvo:<22}{origem:<20} {exemplo['pacotes']:>8} pacote(s)  "
+                          f"regra {exemplo['regra_atual']} → {exemplo['regra_candidata']}")
+        print(f"{Cores.BOLD}📊 {resultado['pacotes']} pacote(s) em {resultado['fluxos']} fluxo(s) | "
+              f"{Cores.AMARELO}{resultado['pacotes_alterados']} pacote(s) "
+              f"({resultado['fluxos_alterados']} fluxo(s)) mudariam de decisão{Cores.RESET}{Cores.BOLD} | "
+              f"{resultado['invalidos']} inválido(s){Cores.RESET}")
+    return 1 if resultado['mudancas'] else 0
+
+def comando_bench(args):
+    """Executa o benchmark (benchmark.py), repassando as opções restantes"""
+    import benchmark
+    
+    opcoes = list(args.extras)
+    if args.json:
+        opcoes.append('--json')
+    return benchmark.main(opcoes)
+
+def comando_varrer(args):
+    """
+    Varre faixas de hosts/portas comparando a sondagem com as regras.
+    Código de saída: 0 = varredura concluída, 2 = erro.
+    """
+    from varredura import expandir_hosts, expandir_portas, varrer
+    
+    try:
+        hosts = expandir_hosts(args.hosts)
+        portas = expandir_portas(args.portas)
+        politica = carregar_politica_cli(args)
+        resultados = varrer(hosts, portas, politica.decidir,
+                            concorrencia=args.concorrencia, taxa=args.taxa,
+                            timeout=args.timeout)
+        
+        contagem = {"abertas": 0, "bloqueadas_abertas": 0, "total": 0}
+        for resultado in resultados:
+            contagem["total"] += 1
+            if resultado['conectividade']:
+                contagem["abertas"] += 1
+                if resultado['decisao'] == "BLOQUEADO":
+                    contagem["bloqueadas_abertas"] += 1
+            
+            if args.quieto:
+                continue
+            if args.json:
+                print(json.dumps(resultado), flush=True)
+                continue
+            if resultado['conectividade'] is None:
+                status = f"{Cores.AMARELO}HOST NÃO ENCONTRADO{Cores.RESET}"
+            elif resultado['conectividade']:
+                status = f"{Cores.VERDE}ABERTA {Cores.RESET}"
+            else:
+                status = f"{Cores.VERMELHO}FECHADA{Cores.RESET}"
+            cor_acao = Cores.VERDE if resultado['decisao'] == 'PERMITIDO' else Cores.VERMELHO
+            print(f"  {resultado['ip']:<15} {resultado['porta']:<6} {status} | "
+                  f"Firewall: {cor_acao}{resultado['decisao']}{Cores.RESET}", flush=True)
+    except ValueError as e:
+        print(f"{Cores.VERMELHO}❌ ERRO: {e}{Cores.RESET}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print(f"\n{Cores.AMARELO}⚠️  Interrompido pelo usuário{Cores.RESET}", file=sys.stderr)
+        return 130
+    
+    if not args.json:
+        print(f"\n{Cores.BOLD}📊 {contagem['total']} alvo(s) | "
+              f"{contagem['abertas']} porta(s) aberta(s) | "
+              f"{contagem['bloqueadas_abertas']} aberta(s) mas BLOQUEADA(s) pelas regras{Cores.RESET}")
+    return 0
+
+def _porta(texto):
+    """Valida uma porta informada na linha de comando"""
+    try:
+        porta = int(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Porta deve ser um número")
+    if porta < 1 or porta > 65535:
+        raise argparse.ArgumentTypeError("Porta deve estar entre 1 e 65535")
+    return porta
+
+def main(argv=None):
+    """Função principal"""
+    # Opções comuns: formato da saída e arquivos de regras
+    saida = argparse.ArgumentParser(add_help=False)
+    saida.add_argument('-q', '--quiet', dest='quieto', action='store_true',
+                       help="Sem saída (só o código de saída / resumo)")
+    saida.add_argument('--json', action='store_true', help="Saída em JSON")
+    arquivos = argparse.ArgumentParser(add_help=False)
+    arquivos.add_argument('--regras', default=ARQUIVO_REGRAS,
+                          help=f"Arquivo JSON de regras (padrão: {ARQUIVO_REGRAS})")
+    arquivos.add_argument('--compilado', default=ARQUIVO_COMPILADO,
+                          help=f"Política compilada (padrão: {ARQUIVO_COMPILADO})")
+    
+    parser = argparse.ArgumentParser(description="Simulador de Firewall - Filtro de Pacotes")
+    subcomandos = parser.add_subparsers(dest='comando')
+    
+    p_avaliar = subcomandos.add_parser('avaliar', aliases=['evaluate'], parents=[saida, arquivos],
+                                       help="Decide um pacote (0 = PERMITIDO, 1 = BLOQUEADO, 2 = erro)")
+    p_avaliar.add_argument('ip', help="IP (ou nome) de destino")
+    p_avaliar.add_argument('porta', nargs='?', type=_porta, help="Porta de destino (omitida em ICMP)")
+    p_avaliar.add_argument('--origem', help="IP de origem")
+    p_avaliar.add_argument('--protocolo', type=str.upper, choices=('TCP', 'UDP', 'ICMP'),
+                           help="Protocolo (padrão: TCP)")
+    p_avaliar.add_argument('--direcao', type=str.upper, choices=('ENTRADA', 'SAIDA'),
+                           help="Direção (padrão: ENTRADA)")
+    p_avaliar.add_argument('--explicar', action='store_true',
+                           help="Mostra a regra que casou, o motivo e o trabalho da busca")
+    p_avaliar.set_defaults(executar=comando_avaliar)
+    
+    p_reproduzir = subcomandos.add_parser('reproduzir', aliases=['replay'], parents=[saida, arquivos],
+                                          help="Reavalia pacotes gravados (NDJSON ou lista JSON)")
+    p_reproduzir.add_argument('arquivo', nargs='?', default='-',
+                              help="Arquivo de pacotes, '-' = entrada padrão (padrão: -)")
+    p_reproduzir.add_argument('--pps', type=float, default=1000,
+                              help="Ritmo assumido para pacotes sem o campo 'tempo' (padrão: 1000/s)")
+    p_reproduzir.add_argument('--capacidade-baldes', type=int,
+                              help="Máximo de baldes de limite de taxa em memória (padrão: 100000)")
+    p_reproduzir.set_defaults(executar=comando_reproduzir)
+    
+    p_impacto = subcomandos.add_parser('impacto', aliases=['diff'], parents=[saida],
+                                       help="Fluxos gravados que mudariam de decisão com novas regras "
+                                            "(0 = nenhum, 1 = há mudanças, 2 = erro)")
+    p_impacto.add_argument('candidatas', help="Arquivo JSON com as regras candidatas")
+    p_impacto.add_argument('arquivo', nargs='?', default='-',
+                           help="Arquivo de pacotes, '-' = entrada padrão (padrão: -)")
+    p_impacto.add_argument('--regras', default=ARQUIVO_REGRAS,
+                           help=f"Regras atuais (padrão: {ARQUIVO_REGRAS})")
+    p_impacto.add_argument('--exemplos', type=int, default=10,
+                           help="Exemplos por tipo de mudança (padrão: 10)")
+    p_impacto.set_defaults(executar=comando_impacto)
+    
+    p_compilar = subcomandos.add_parser('compilar', aliases=['compile'], parents=[saida],
+                                        help="Compila o regras.json para o formato binário")
+    p_compilar.add_argument('regras', nargs='?', default=ARQUIVO_REGRAS,
+                            help=f"Arquivo JSON de regras (padrão: {ARQUIVO_REGRAS})")
+    p_compilar.add_argument('-o', '--saida', default=ARQUIVO_COMPILADO,
+                            help=f"Arquivo binário de saída (padrão: {ARQUIVO_COMPILADO})")
+    p_compilar.set_defaults(executar=comando_compilar)
+    
+    p_varrer = subcomandos.add_parser('varrer', aliases=['sweep'], parents=[saida, arquivos],
+                                      help="Varre faixas de hosts (CIDR) e portas")
+    p_varrer.add_argument('hosts', help="Hosts/redes separados por vírgula (ex.: 10.0.0.0/24,1.1.1.1)")
+    p_varrer.add_argument('-p', '--portas', required=True,
+                          help="Portas/faixas separadas por vírgula (ex.: 22,80,8000-8010)")
+    p_varrer.add_argument('-c', '--concorrencia', type=int, default=256,
+                          help="Máximo de conexões simultâneas (padrão: 256)")
+    p_varrer.add_argument('-t', '--taxa', type=float, default=1000,
+                          help="Máximo de sondagens por segundo, 0 = sem limite (padrão: 1000)")
+    p_varrer.add_argument('--timeout', type=float, default=1.0,
+                          help="Tempo limite máximo de cada sondagem em segundos (padrão: 1.0)")
+    p_varrer.set_defaults(executar=comando_varrer)
+    
+    p_bench = subcomandos.add_parser('bench', aliases=['benchmark'], parents=[saida],
+                                     help="Benchmark dos classificadores e da inicialização "
+                                          "(demais opções vão para benchmark.py)")
+    p_bench.set_defaults(executar=comando_bench)
+    
+    args, extras = parser.parse_known_args(argv)
+    if extras and args.comando not in ('bench', 'benchmark'):
+        parser.error(f"argumentos não reconhecidos: {' '.join(extras)}")
+    args.extras = extras
+    
+    # Sem subcomando: mantém a simulação interativa original
+    if args.comando is None:
+        executar_simulacao()
+        return 0
+    
+    if os.environ.get('NO_COLOR') or not sys.stdout.isatty():
+        desativar_cores()
+    return args.executar(args)
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
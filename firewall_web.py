@@ -4,21 +4,98 @@ Sistema de simulação de firewall com interface web para testar pacotes,
 gerenciar regras de filtragem e visualizar estatísticas.
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import (Flask, Response, g, make_response, render_template, request, jsonify,
+                   stream_with_context, url_for)
+import atexit
+import itertools
 import json
+import signal
 import socket
+import threading
+import time
 from datetime import datetime
 import os
 
+from auditoria import CAPACIDADE_PADRAO as CAPACIDADE_AUDITORIA, DESCARTAR, RegistroAuditoria
+from compressao import CACHE_ESTATICOS, CompressorRespostas, impressao_digital, variantes_etag
+from impacto import EXEMPLOS_PADRAO, comparar_politicas
+from limitacao import CAPACIDADE_PADRAO, TabelaBaldes
+from motor_regras import (
+    ACOES,
+    DIRECAO_PADRAO,
+    DIRECOES,
+    PROTOCOLO_PADRAO,
+    PROTOCOLOS,
+    IndiceRegras,
+    chave_regra,
+    filtrar_referencia,
+    formatar_portas
+)
+from perfil import Perfilador, trecho
+from politica_compilada import abrir_compilada
+from varredura import LIMITE_ALVOS, expandir_hosts, expandir_portas, varrer
+
 # Inicializa a aplicação Flask
 app = Flask(__name__)
 
+# Exibe portas/faixas das regras nos templates ("80", "1000-2000", "*")
+app.jinja_env.globals['formatar_portas'] = formatar_portas
+
+# Perfil de requisições (desligado por padrão):
+#   PERFIL_AMOSTRAGEM - fração das requisições perfiladas (0 a 1)
+#   PERFIL_CABECALHO  - permite forçar o perfil com o cabeçalho "X-Perfil: 1"
+#   PERFIL_CPROFILE   - inclui estatísticas do cProfile nos rastros
+app.config.update(
+    PERFIL_AMOSTRAGEM=float(os.environ.get('FIREWALL_PERFIL_AMOSTRAGEM', 0)),
+    PERFIL_CABECALHO=os.environ.get('FIREWALL_PERFIL_CABECALHO', '1') == '1',
+    PERFIL_CPROFILE=True,
+)
+
+# Guarda os rastros mais lentos para inspeção em /api/admin/perfis
+perfilador = Perfilador(max_rastros=int(os.environ.get('FIREWALL_PERFIL_MAX_RASTROS', 20)))
+
 # Caminho do arquivo de configuração de regras
 REGRAS_FILE = "regras.json"
 
+# Caminho da política compilada (gerada com: python firewall.py compilar)
+REGRAS_COMPILADO = "regras.fwc"
+
+# Intervalo (segundos) com que o observador verifica mudanças no arquivo
+INTERVALO_OBSERVADOR = 0.25
+
+# Quantidade máxima de pacotes aceita em uma avaliação em lote
+LIMITE_LOTE = 10000
+
 # Lista para armazenar histórico de testes realizados
 testes_realizados = []
 
+# Versão do histórico, incrementada a cada mudança (usada nas ETags)
+_contador_historico = itertools.count(1)
+_versao_historico = 0
+
+# Identifica esta execução do servidor nas ETags: as versões das regras e
+# do histórico recomeçam a cada início
+_INSTANCIA = f"{os.getpid():x}{time.time_ns():x}"
+
+# Compressão gzip/brotli das respostas, com cache dos corpos comprimidos
+compressor = CompressorRespostas()
+
+# Registro de auditoria das decisões (ligado com FIREWALL_AUDITORIA_DIR).
+# As requisições só enfileiram; uma thread grava os lotes em NDJSON gzip
+auditoria = None
+if os.environ.get('FIREWALL_AUDITORIA_DIR'):
+    auditoria = RegistroAuditoria(
+        os.environ['FIREWALL_AUDITORIA_DIR'],
+        politica=os.environ.get('FIREWALL_AUDITORIA_POLITICA', DESCARTAR),
+        capacidade=int(os.environ.get('FIREWALL_AUDITORIA_FILA', CAPACIDADE_AUDITORIA))
+    )
+    auditoria.iniciar()
+    atexit.register(auditoria.fechar)
+
+# Baldes de fichas das regras LIMITADO (compartilhados entre as versões das
+# regras: uma regra que não mudou mantém seus baldes após uma recarga)
+baldes = TabelaBaldes(int(os.environ.get('FIREWALL_BALDES_CAPACIDADE', CAPACIDADE_PADRAO)))
+
 
 # ============================================================================
 # FUNÇÕES DE CARREGAMENTO E SALVAMENTO DE DADOS
@@ -53,14 +130,271 @@ def salvar_regras(regras):
         bool: True se salvo com sucesso, False caso contrário
     """
     try:
-        with open(REGRAS_FILE, 'w', encoding='utf-8') as f:
+        # Escreve em arquivo temporário e troca atomicamente, para que
+        # nenhum leitor veja o arquivo pela metade
+        temporario = f"{REGRAS_FILE}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
             json.dump(regras, f, indent=2, ensure_ascii=False)
+        os.replace(temporario, REGRAS_FILE)
         return True
     except Exception as e:
         print(f"Erro ao salvar regras: {e}")
         return False
 
 
+def _assinatura_regras():
+    """
+    Retorna (mtime_ns, tamanho) do arquivo de regras, ou None se não existir.
+    """
+    try:
+        info = os.stat(REGRAS_FILE)
+    except OSError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+# ============================================================================
+# PUBLICAÇÃO DE VERSÕES DAS REGRAS (TROCA ATÔMICA)
+# ============================================================================
+
+class ConjuntoRegras:
+    """
+    Versão imutável das regras, publicada para as requisições.
+    
+    Cada requisição lê a referência do conjunto ativo uma única vez e usa
+    esse mesmo objeto até o fim; uma recarga cria um conjunto novo e troca
+    a referência, sem alterar o antigo. Assim, requisições em andamento
+    terminam na versão em que começaram.
+    """
+    
+    def __init__(self, versao, politica, assinatura, regras=None, texto=None):
+        """
+        Args:
+            versao (int): Número da versão (crescente)
+            politica: Objeto com o método decidir(ip, porta)
+            assinatura (tuple): (mtime_ns, tamanho) do JSON de origem
+            regras (list, opcional): Regras já decodificadas
+            texto (bytes, opcional): Conteúdo do JSON, decodificado sob demanda
+        """
+        self.versao = versao
+        self.politica = politica
+        self.assinatura = assinatura
+        self._regras = regras
+        self._texto = texto
+    
+    @property
+    def regras(self):
+        """
+        Lista de regras desta versão (não deve ser modificada).
+        """
+        if self._regras is None:
+            try:
+                self._regras = json.loads(self._texto or b'[]')
+            except json.JSONDecodeError:
+                self._regras = []
+        return self._regras
+
+
+_conjunto_ativo = None
+_proxima_versao = 1
+
+# Serializa quem publica versões novas (edições pela API e recargas)
+_trava_publicacao = threading.RLock()
+
+# Sinaliza para o observador que uma recarga foi pedida (ex.: SIGHUP)
+_pedido_recarga = threading.Event()
+
+# Thread do observador do arquivo de regras (iniciada uma única vez)
+_observador = None
+_trava_observador = threading.Lock()
+
+
+def _ler_arquivo_regras():
+    """
+    Lê o conteúdo bruto do arquivo de regras junto com sua assinatura.
+    
+    Repete a leitura se o arquivo mudar durante ela, garantindo que o
+    conteúdo corresponde à assinatura retornada.
+    
+    Retorna:
+        tuple: (assinatura, conteúdo em bytes)
+    """
+    while True:
+        assinatura = _assinatura_regras()
+        try:
+            with open(REGRAS_FILE, 'rb') as f:
+                texto = f.read()
+        except FileNotFoundError:
+            texto = b'[]'
+        if _assinatura_regras() == assinatura:
+            return assinatura, texto
+
+
+def _publicar(politica, assinatura, regras=None, texto=None):
+    """
+    Cria o próximo ConjuntoRegras e o torna ativo com uma troca de referência.
+    Deve ser chamada com _trava_publicacao adquirida.
+    """
+    global _conjunto_ativo, _proxima_versao
+    
+    conjunto = ConjuntoRegras(_proxima_versao, politica, assinatura,
+                              regras=regras, texto=texto)
+    _proxima_versao += 1
+    _conjunto_ativo = conjunto
+    return conjunto
+
+
+def recarregar_regras(forcar=False):
+    """
+    Constrói uma nova versão das regras a partir do disco e a publica.
+    
+    A política é montada fora do caminho das requisições: usa o binário
+    compilado quando ele corresponde ao JSON lido e, caso contrário, indexa
+    o JSON em memória. Se o JSON estiver inválido, a versão ativa é mantida.
+    
+    Args:
+        forcar (bool): Recarrega mesmo que o JSON não tenha mudado
+            (ex.: o binário foi recompilado)
+    
+    Retorna:
+        ConjuntoRegras: O conjunto ativo após a recarga
+    """
+    with _trava_publicacao:
+        if (not forcar and _conjunto_ativo is not None
+                and _conjunto_ativo.assinatura == _assinatura_regras()):
+            return _conjunto_ativo
+        
+        with trecho('carregar_regras'):
+            assinatura, texto = _ler_arquivo_regras()
+            
+            politica = abrir_compilada(REGRAS_COMPILADO)
+            if politica is not None and politica.origem == assinatura:
+                return _publicar(politica, assinatura, texto=texto)
+            
+            try:
+                regras = json.loads(texto)
+                indice = IndiceRegras(regras)
+            except json.JSONDecodeError:
+                print(f"Erro ao decodificar JSON de {REGRAS_FILE}")
+                regras, indice = None, None
+            except (ValueError, TypeError, AttributeError) as e:
+                print(f"Regra inválida em {REGRAS_FILE}: {e}")
+                regras, indice = None, None
+            
+            if indice is None:
+                if _conjunto_ativo is not None:
+                    return _conjunto_ativo
+                regras, indice = [], IndiceRegras([])
+            return _publicar(indice, assinatura, regras=regras)
+
+
+def publicar_regras(regras):
+    """
+    Salva uma nova lista de regras e a publica como próxima versão.
+    Deve ser chamada com _trava_publicacao adquirida.
+    
+    Args:
+        regras (list): Lista completa de regras
+        
+    Retorna:
+        ConjuntoRegras: Conjunto publicado, ou None se não foi possível salvar
+    """
+    if not salvar_regras(regras):
+        return None
+    return _publicar(IndiceRegras(regras), _assinatura_regras(), regras=regras)
+
+
+def copiar_regras_ativas():
+    """
+    Retorna uma cópia editável das regras da versão mais recente em disco.
+    Deve ser chamada com _trava_publicacao adquirida.
+    """
+    return [dict(regra) for regra in recarregar_regras().regras]
+
+
+def obter_conjunto():
+    """
+    Retorna o conjunto de regras ativo (carregando-o na primeira chamada).
+    
+    Na primeira chamada também inicia o observador do arquivo de regras,
+    para que edições externas sejam aplicadas mesmo quando a aplicação é
+    servida por flask run, por um servidor WSGI ou pelo carga.py --local.
+    """
+    if _observador is None:
+        iniciar_recarga_automatica()
+    conjunto = _conjunto_ativo
+    if conjunto is None:
+        conjunto = recarregar_regras()
+    return conjunto
+
+
+def _observar_regras(intervalo):
+    """
+    Laço do observador: recarrega as regras quando o arquivo muda ou
+    quando uma recarga é pedida por sinal.
+    
+    Um erro em uma passagem (ex.: PermissionError ou OSError passageiro
+    enquanto um editor substitui o arquivo) é registrado e a versão ativa
+    continua valendo; a próxima passagem tenta de novo. Cada erro só é
+    impresso uma vez enquanto se repetir.
+    """
+    ultimo_erro = None
+    while True:
+        pedido = _pedido_recarga.wait(intervalo)
+        _pedido_recarga.clear()
+        try:
+            conjunto = _conjunto_ativo
+            if pedido or conjunto is None or conjunto.assinatura != _assinatura_regras():
+                recarregar_regras(forcar=pedido)
+            ultimo_erro = None
+        except Exception as e:
+            if repr(e) != ultimo_erro:
+                print(f"Erro ao recarregar {REGRAS_FILE}: {e}")
+            ultimo_erro = repr(e)
+
+
+def iniciar_recarga_automatica(intervalo=INTERVALO_OBSERVADOR):
+    """
+    Inicia o observador do arquivo de regras.
+    
+    Pode ser chamada mais de uma vez (e de qualquer thread): só a primeira
+    chamada inicia o observador.
+    
+    Args:
+        intervalo (float): Intervalo de verificação do arquivo em segundos
+    """
+    global _observador
+    
+    with _trava_observador:
+        if _observador is not None:
+            return
+        _observador = threading.Thread(target=_observar_regras, args=(intervalo,),
+                                       name='observador-regras', daemon=True)
+        _observador.start()
+
+
+def instalar_tratador_sighup():
+    """
+    Faz o SIGHUP pedir uma recarga das regras ao observador.
+    
+    O módulo signal só aceita tratadores instalados pela thread principal,
+    então isto é feito na importação do módulo, e não quando o observador
+    é iniciado (o que costuma acontecer na thread de uma requisição).
+    
+    Retorna:
+        bool: True se o tratador foi instalado
+    """
+    # SIGHUP não existe no Windows
+    if (not hasattr(signal, 'SIGHUP')
+            or threading.current_thread() is not threading.main_thread()):
+        return False
+    signal.signal(signal.SIGHUP, lambda *_: _pedido_recarga.set())
+    return True
+
+
+instalar_tratador_sighup()
+
+
 # ============================================================================
 # FUNÇÕES DE TESTE DE CONECTIVIDADE
 # ============================================================================
@@ -69,57 +403,72 @@ def verificar_porta(ip, porta, timeout=1):
     """
     Testa se uma porta está aberta/respondendo usando socket.
     
+    Funciona com IPv4 e IPv6: o endereço (ou nome) é resolvido com
+    getaddrinfo e cada endereço obtido é tentado em ordem, como em
+    socket.create_connection, até um aceitar a conexão.
+    
     Args:
-        ip (str): Endereço IP a testar
+        ip (str): Endereço IP (IPv4 ou IPv6) ou nome a testar
         porta (int): Número da porta a testar
-        timeout (int): Tempo máximo de espera em segundos
+        timeout (int): Tempo máximo de espera em segundos (por endereço)
         
     Retorna:
         bool: True se porta está aberta, False se fechada
         None: Se host não foi encontrado (erro de DNS)
     """
     try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(timeout)
-        resultado = s.connect_ex((ip, porta))
-        s.close()
-        return resultado == 0  # 0 = sucesso na conexão
+        enderecos = socket.getaddrinfo(ip, porta, type=socket.SOCK_STREAM)
     except socket.gaierror:
         # Erro de DNS - host não encontrado
         return None
     except Exception:
-        # Qualquer outro erro = porta fechada
         return False
+    
+    for familia, tipo, protocolo, _, endereco in enderecos:
+        try:
+            s = socket.socket(familia, tipo, protocolo)
+            try:
+                s.settimeout(timeout)
+                if s.connect_ex(endereco) == 0:  # 0 = sucesso na conexão
+                    return True
+            finally:
+                s.close()
+        except Exception:
+            # Qualquer outro erro = porta fechada neste endereço
+            continue
+    return False
 
 
 # ============================================================================
 # FUNÇÕES DE FILTRAGEM E REGRAS
 # ============================================================================
 
-def filtrar_pacote(ip, porta, regras):
+def filtrar_pacote(ip, porta, regras, origem=None, protocolo=PROTOCOLO_PADRAO,
+                   direcao=DIRECAO_PADRAO):
     """
     Aplica as regras de firewall para decidir se um pacote é permitido ou bloqueado.
     
     Política de segurança:
-    - Se há regra PERMITIDO para IP:porta -> PERMITIDO
-    - Se há regra BLOQUEADO para IP:porta -> BLOQUEADO
+    - Vale a primeira regra (na ordem da lista) que casa com o pacote
     - Se não há regra -> BLOQUEADO (fail-safe)
     
+    Percorre as regras uma a uma (implementação de referência); as rotas
+    usam o IndiceRegras da versão ativa, que dá o mesmo resultado.
+    
     Args:
-        ip (str): Endereço IP do pacote
-        porta (int): Porta do pacote
+        ip (str): Endereço IP de destino do pacote
+        porta (int): Porta de destino do pacote (None em ICMP)
         regras (list): Lista de regras de firewall
+        origem (str, opcional): Endereço IP de origem
+        protocolo (str): "TCP", "UDP" ou "ICMP"
+        direcao (str): "ENTRADA" ou "SAIDA"
         
     Retorna:
         str: "PERMITIDO" ou "BLOQUEADO"
     """
-    # Procura por uma regra que corresponda ao IP e porta
-    for regra in regras:
-        if regra['ip'] == ip and regra['porta'] == porta:
-            return regra['acao']
-    
-    # Se não encontrou regra, nega por padrão (fail-safe)
-    return "BLOQUEADO"
+    pacote = {'ip': ip, 'porta': porta, 'origem': origem,
+              'protocolo': protocolo, 'direcao': direcao}
+    return filtrar_referencia(pacote, regras)
 
 
 def obter_descricao_servico(porta):
@@ -163,18 +512,164 @@ def calcular_estatisticas(regras):
         regras (list): Lista de regras
         
     Retorna:
-        dict: Dicionário com contagem de permitidos, bloqueados e total
+        dict: Dicionário com contagem de permitidos, bloqueados, limitados e total
     """
     permitidos = sum(1 for r in regras if r['acao'] == 'PERMITIDO')
     bloqueados = sum(1 for r in regras if r['acao'] == 'BLOQUEADO')
+    limitados = sum(1 for r in regras if r['acao'] == 'LIMITADO')
     
     return {
         'permitidos': permitidos,
         'bloqueados': bloqueados,
+        'limitados': limitados,
         'total': len(regras)
     }
 
 
+# ============================================================================
+# PERFIL DE REQUISIÇÕES
+# ============================================================================
+
+@app.before_request
+def iniciar_perfil():
+    """
+    Começa o rastro da requisição quando ela é sorteada pela amostragem
+    ou pedida com o cabeçalho X-Perfil.
+    """
+    forcar = app.config['PERFIL_CABECALHO'] and request.headers.get('X-Perfil') == '1'
+    if not forcar and app.config['PERFIL_AMOSTRAGEM'] <= 0:
+        return
+    
+    perfilador.amostragem = app.config['PERFIL_AMOSTRAGEM']
+    perfilador.usar_cprofile = app.config['PERFIL_CPROFILE']
+    g.rastro = perfilador.iniciar(request.path, request.method, forcar=forcar)
+
+
+@app.after_request
+def finalizar_perfil(response):
+    """
+    Encerra o rastro e informa os tempos nos cabeçalhos da resposta
+    (X-Perfil-Id e Server-Timing, exibido nas ferramentas do navegador).
+    """
+    rastro = g.pop('rastro', None)
+    if rastro is None:
+        return response
+    
+    perfilador.finalizar(rastro)
+    response.headers['X-Perfil-Id'] = str(rastro.id)
+    response.headers['Server-Timing'] = ', '.join(
+        f"{caminho[-1]};dur={duracao * 1000:.3f}" for caminho, duracao in rastro.trechos
+    )
+    return response
+
+
+@app.teardown_request
+def descartar_perfil(_erro):
+    """
+    Encerra um rastro que ficou aberto por erro na requisição.
+    """
+    rastro = g.pop('rastro', None)
+    if rastro is not None:
+        perfilador.finalizar(rastro)
+
+
+# ============================================================================
+# CACHE HTTP E COMPRESSÃO
+# ============================================================================
+
+def url_estatico(arquivo):
+    """
+    URL de um arquivo estático com a impressão digital do conteúdo
+    (?v=...), servida com cache longo.
+    """
+    caminho = os.path.join(app.static_folder, arquivo)
+    return url_for('static', filename=arquivo, v=impressao_digital(caminho))
+
+
+app.jinja_env.globals['url_estatico'] = url_estatico
+
+
+def _registrar_mudanca_historico():
+    """
+    Avança a versão do histórico (chamar depois de alterá-lo).
+    """
+    global _versao_historico
+    _versao_historico = next(_contador_historico)
+
+
+def _nao_modificada(etag):
+    """
+    Retorna a resposta 304 se o If-None-Match da requisição traz a ETag do
+    recurso ou a da versão na codificação que a requisição aceita; senão,
+    None.
+    
+    Args:
+        etag (str): ETag forte do recurso (sem aspas)
+    """
+    for variante in variantes_etag(etag, request.accept_encodings):
+        if request.if_none_match.contains(variante):
+            resposta = Response(status=304)
+            resposta.set_etag(variante)
+            resposta.vary.add('Accept-Encoding')
+            return resposta
+    return None
+
+
+def responder_com_etag(etag, gerar):
+    """
+    Responde 304 se o cliente já tem a versão indicada pela ETag; senão,
+    gera a resposta e a marca com a ETag. O corpo só é gerado quando
+    necessário.
+    
+    A ETag de uma versão comprimida só vale se a requisição aceita a mesma
+    codificação: um cliente sem gzip que reenvia "...-gzip" recebe o corpo.
+    
+    Args:
+        etag (str): ETag forte do recurso (sem aspas)
+        gerar (callable): Produz a resposta completa
+    """
+    resposta = _nao_modificada(etag)
+    if resposta is not None:
+        return resposta
+    
+    resposta = make_response(gerar())
+    resposta.set_etag(etag)
+    # Pode ficar em cache, mas deve ser revalidado a cada uso
+    resposta.cache_control.no_cache = True
+    return resposta
+
+
+@app.after_request
+def comprimir_resposta(response):
+    """
+    Dá cache longo aos estáticos pedidos com a impressão digital atual e
+    comprime a resposta conforme o Accept-Encoding.
+    
+    Os estáticos são revalidados aqui também: o Flask só compara o
+    If-None-Match com a ETag sem compressão, e a versão gzip recebe outra
+    ETag ("...-gzip") depois dessa verificação.
+    """
+    if request.endpoint == 'static' and response.status_code == 200:
+        versao = request.args.get('v')
+        caminho = os.path.join(app.static_folder, request.view_args['filename'])
+        if versao and versao == impressao_digital(caminho):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = CACHE_ESTATICOS
+            response.cache_control.immutable = True
+        
+        etag, fraca = response.get_etag()
+        if etag and not fraca:
+            nao_modificada = _nao_modificada(etag)
+            if nao_modificada is not None:
+                if 'Cache-Control' in response.headers:
+                    nao_modificada.headers['Cache-Control'] = response.headers['Cache-Control']
+                response.close()
+                return nao_modificada
+    
+    return compressor.processar(response, request.accept_encodings)
+
+
 # ============================================================================
 # ROTAS - PÁGINAS
 # ============================================================================
@@ -183,57 +678,132 @@ def calcular_estatisticas(regras):
 def index():
     """
     Rota principal - exibe a página inicial com todas as informações.
+    
+    A página só muda com as regras e o histórico; um navegador que já tem
+    a versão atual recebe 304 sem que o template seja renderizado.
     """
-    regras = carregar_regras()
-    stats = calcular_estatisticas(regras)
-    data_hora = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+    conjunto = obter_conjunto()
     
-    return render_template('index.html', 
-                         regras=regras, 
-                         stats=stats,
-                         data_hora=data_hora,
-                         testes=testes_realizados)
+    def gerar():
+        regras = conjunto.regras
+        stats = calcular_estatisticas(regras)
+        data_hora = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+        
+        with trecho('render_template'):
+            return render_template('index.html', 
+                                 regras=regras, 
+                                 stats=stats,
+                                 data_hora=data_hora,
+                                 testes=testes_realizados)
+    
+    return responder_com_etag(f"{_INSTANCIA}-r{conjunto.versao}-t{_versao_historico}", gerar)
 
 
 # ============================================================================
 # API - TESTES DE PACOTES
 # ============================================================================
 
+def auditar(pacote, decisao, versao):
+    """
+    Enfileira o registro de auditoria de uma decisão (sem E/S; não faz
+    nada se a auditoria estiver desligada).
+    
+    Args:
+        pacote (dict): ip, porta, origem, protocolo e direcao
+        decisao (str): Decisão tomada
+        versao (int): Versão das regras usada
+    """
+    if auditoria is None:
+        return
+    auditoria.registrar({
+        'tempo': time.time(),
+        'rota': request.path,
+        'cliente': request.remote_addr,
+        'ip': pacote['ip'],
+        'porta': pacote.get('porta'),
+        'origem': pacote.get('origem'),
+        'protocolo': pacote.get('protocolo'),
+        'direcao': pacote.get('direcao'),
+        'decisao': decisao,
+        'versao_regras': versao
+    })
+
+
+def ler_pacote(data):
+    """
+    Valida os campos de um pacote recebido pela API.
+    
+    Args:
+        data (dict): ip, porta e, opcionalmente, origem, protocolo e direcao
+        
+    Retorna:
+        dict: Pacote com os campos convertidos
+        
+    Lança:
+        ValueError: Com a mensagem de erro para o cliente
+    """
+    ip = str(data.get('ip', '')).strip()
+    if not ip:
+        raise ValueError('IP é obrigatório')
+    
+    protocolo = str(data.get('protocolo') or PROTOCOLO_PADRAO).upper()
+    if protocolo not in PROTOCOLOS:
+        raise ValueError(f"Protocolo deve ser {', '.join(PROTOCOLOS)}")
+    direcao = str(data.get('direcao') or DIRECAO_PADRAO).upper()
+    if direcao not in DIRECOES:
+        raise ValueError(f"Direção deve ser {', '.join(DIRECOES)}")
+    
+    # Pacotes ICMP não têm porta
+    porta = None
+    if protocolo != 'ICMP':
+        try:
+            porta = int(data.get('porta', ''))
+        except (TypeError, ValueError):
+            raise ValueError('Porta deve ser um número')
+        if porta < 1 or porta > 65535:
+            raise ValueError('Porta deve estar entre 1 e 65535')
+    
+    origem = str(data.get('origem') or '').strip() or None
+    return {'ip': ip, 'porta': porta, 'origem': origem,
+            'protocolo': protocolo, 'direcao': direcao}
+
+
 @app.route('/api/testar-pacote', methods=['POST'])
 def testar_pacote():
     """
     API para testar um pacote contra as regras de firewall.
     
     Recebe JSON com:
-        - ip (str): Endereço IP
-        - porta (int): Número da porta
+        - ip (str): Endereço IP de destino
+        - porta (int): Número da porta (dispensada em ICMP)
+        - origem (str, opcional): Endereço IP de origem
+        - protocolo (str, opcional): "TCP" (padrão), "UDP" ou "ICMP"
+        - direcao (str, opcional): "ENTRADA" (padrão) ou "SAIDA"
         
     Retorna:
         JSON com resultado do teste ou erro
     """
     try:
-        data = request.json
-        ip = data.get('ip', '').strip()
-        porta = data.get('porta', '')
-        
         # Validação de entrada
-        if not ip:
-            return jsonify({'erro': 'IP é obrigatório'}), 400
-        
-        # Converte e valida a porta
         try:
-            porta = int(porta)
-            if porta < 1 or porta > 65535:
-                return jsonify({'erro': 'Porta deve estar entre 1 e 65535'}), 400
-        except ValueError:
-            return jsonify({'erro': 'Porta deve ser um número'}), 400
+            pacote = ler_pacote(request.json)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+        ip, porta = pacote['ip'], pacote['porta']
         
-        # Testa conectividade da porta
-        conectividade = verificar_porta(ip, porta)
+        # Testa conectividade da porta (a sondagem só fala TCP)
+        conectividade = None
+        if pacote['protocolo'] == 'TCP':
+            with trecho('verificar_porta'):
+                conectividade = verificar_porta(ip, porta)
         
-        # Carrega regras e aplica filtragem
-        regras = carregar_regras()
-        decisao = filtrar_pacote(ip, porta, regras)
+        # Aplica filtragem na versão ativa das regras
+        conjunto = obter_conjunto()
+        with trecho('filtrar_pacote'):
+            decisao = conjunto.politica.decidir(ip, porta, pacote['origem'],
+                                                pacote['protocolo'], pacote['direcao'],
+                                                baldes=baldes)
+        auditar(pacote, decisao, conjunto.versao)
         
         # Obtém descrição do serviço
         servico = obter_descricao_servico(porta)
@@ -242,14 +812,19 @@ def testar_pacote():
         resultado = {
             'ip': ip,
             'porta': porta,
+            'origem': pacote['origem'],
+            'protocolo': pacote['protocolo'],
+            'direcao': pacote['direcao'],
             'servico': servico,
             'conectividade': conectividade,
             'decisao': decisao,
+            'versao_regras': conjunto.versao,
             'timestamp': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
         }
         
         # Adiciona ao histórico
         testes_realizados.append(resultado)
+        _registrar_mudanca_historico()
         
         return jsonify(resultado), 200
     
@@ -257,6 +832,128 @@ def testar_pacote():
         return jsonify({'erro': str(e)}), 500
 
 
+@app.route('/api/avaliar', methods=['POST'])
+def avaliar():
+    """
+    API para decidir um ou vários pacotes sem testar a conectividade.
+    
+    Recebe JSON com:
+        - ip, porta (e origem, protocolo, direcao opcionais): Um pacote, ou
+        - pacotes (list): Lista de pacotes com os mesmos campos
+        
+    Retorna:
+        JSON com a versão das regras e a decisão de cada pacote, ou erro
+    """
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'erro': 'Corpo JSON inválido'}), 400
+    
+    pacotes = data.get('pacotes')
+    if pacotes is None:
+        pacotes = [data]
+    if not isinstance(pacotes, list) or not pacotes:
+        return jsonify({'erro': 'Informe ip/porta ou uma lista de pacotes'}), 400
+    if len(pacotes) > LIMITE_LOTE:
+        return jsonify({'erro': f'Máximo de {LIMITE_LOTE} pacotes por lote'}), 400
+    
+    # Todo o lote é decidido na mesma versão das regras
+    conjunto = obter_conjunto()
+    decidir = conjunto.politica.decidir
+    resultados = []
+    for dados in pacotes:
+        try:
+            pacote = ler_pacote(dados)
+        except (AttributeError, ValueError) as e:
+            return jsonify({'erro': f'Pacote inválido ({e}): {dados!r}'}), 400
+        pacote['decisao'] = decidir(pacote['ip'], pacote['porta'], pacote['origem'],
+                                    pacote['protocolo'], pacote['direcao'], baldes=baldes)
+        resultados.append(pacote)
+    
+    for pacote in resultados:
+        auditar(pacote, pacote['decisao'], conjunto.versao)
+    return jsonify({'versao_regras': conjunto.versao, 'resultados': resultados}), 200
+
+
+@app.route('/api/explicar', methods=['POST'])
+def explicar():
+    """
+    API para explicar a decisão de um pacote: qual regra casou (ou se
+    valeu a política padrão), o motivo e quantas regras e tabelas foram
+    examinadas. Não testa conectividade, não consome fichas de regras
+    LIMITADO e não entra no histórico.
+    
+    Recebe JSON com os mesmos campos de /api/testar-pacote.
+    
+    Retorna:
+        JSON com o pacote, a explicação, a regra que casou (como está no
+        regras.json) e a versão das regras, ou erro
+    """
+    try:
+        pacote = ler_pacote(request.json)
+    except (AttributeError, ValueError) as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    conjunto = obter_conjunto()
+    explicacao = conjunto.politica.explicar(pacote['ip'], pacote['porta'], pacote['origem'],
+                                            pacote['protocolo'], pacote['direcao'])
+    regras = conjunto.regras
+    indice = explicacao['regra']
+    return jsonify({
+        **pacote,
+        **explicacao,
+        'regra_json': regras[indice] if indice is not None and indice < len(regras) else None,
+        'versao_regras': conjunto.versao
+    }), 200
+
+
+@app.route('/api/varredura', methods=['POST'])
+def varredura():
+    """
+    API para varrer faixas de hosts e portas comparando a conectividade
+    real com a decisão do firewall.
+    
+    Recebe JSON com:
+        - hosts (str): IPs, redes CIDR ou nomes separados por vírgula
+        - portas (str): Portas ou faixas separadas por vírgula (ex.: "22,80-90")
+        - concorrencia (int, opcional): Máximo de conexões simultâneas
+        - taxa (float, opcional): Máximo de sondagens por segundo
+        - timeout (float, opcional): Tempo limite máximo por sondagem
+        
+    Retorna:
+        NDJSON (uma linha por alvo, enviada assim que fica pronta) ou erro
+    """
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'erro': 'Corpo JSON inválido'}), 400
+    
+    try:
+        hosts = expandir_hosts(str(data.get('hosts', '')))
+        portas = expandir_portas(data.get('portas', ''))
+        opcoes = {
+            'concorrencia': int(data.get('concorrencia', 256)),
+            'taxa': float(data.get('taxa', 1000)),
+            'timeout': float(data.get('timeout', 1.0))
+        }
+    except (TypeError, ValueError) as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    if len(hosts) * len(portas) > LIMITE_ALVOS:
+        return jsonify({'erro': f'A varredura passa do limite de {LIMITE_ALVOS} alvos'}), 400
+    if opcoes['concorrencia'] < 1 or opcoes['timeout'] <= 0:
+        return jsonify({'erro': 'Concorrência e timeout devem ser positivos'}), 400
+    
+    # A varredura inteira usa a mesma versão das regras
+    conjunto = obter_conjunto()
+    
+    def gerar():
+        for resultado in varrer(hosts, portas, conjunto.politica.decidir, **opcoes):
+            resultado['versao_regras'] = conjunto.versao
+            auditar(resultado, resultado['decisao'], conjunto.versao)
+            yield json.dumps(resultado) + '\n'
+    
+    return Response(stream_with_context(gerar()), mimetype='application/x-ndjson')
+
+
 # ============================================================================
 # API - GERENCIAMENTO DE REGRAS
 # ============================================================================
@@ -265,9 +962,13 @@ def testar_pacote():
 def get_regras():
     """
     API para obter todas as regras configuradas.
+    
+    A ETag acompanha a versão das regras: enquanto ela não muda, clientes
+    que enviam If-None-Match recebem 304.
     """
-    regras = carregar_regras()
-    return jsonify(regras), 200
+    conjunto = obter_conjunto()
+    return responder_com_etag(f"{_INSTANCIA}-r{conjunto.versao}",
+                              lambda: jsonify(conjunto.regras))
 
 
 @app.route('/api/regras', methods=['POST'])
@@ -276,9 +977,14 @@ def adicionar_regra():
     API para adicionar uma nova regra de firewall.
     
     Recebe JSON com:
-        - ip (str): Endereço IP
-        - porta (int): Número da porta
-        - acao (str): "PERMITIDO" ou "BLOQUEADO"
+        - ip (str): IP, rede CIDR ou nome de destino ("*" = qualquer)
+        - porta (int): Número da porta ("*" = qualquer; dispensada em ICMP)
+        - porta_fim (int, opcional): Fim da faixa de portas
+        - origem (str, opcional): IP ou rede CIDR de origem
+        - protocolo (str, opcional): "TCP", "UDP", "ICMP" ou "QUALQUER"
+        - direcao (str, opcional): "ENTRADA", "SAIDA" ou "QUALQUER"
+        - acao (str): "PERMITIDO", "BLOQUEADO" ou "LIMITADO"
+        - taxa, rajada, limitar_por (opcionais): Limite de taxa da ação LIMITADO
         - descricao (str, opcional): Descrição da regra
     """
     try:
@@ -287,45 +993,64 @@ def adicionar_regra():
         porta = data.get('porta', '')
         acao = data.get('acao', '').upper()
         descricao = data.get('descricao', '').strip()
+        protocolo = str(data.get('protocolo') or '').strip().upper()
         
         # Validações
         if not ip:
             return jsonify({'erro': 'IP é obrigatório'}), 400
         
-        try:
-            porta = int(porta)
-            if porta < 1 or porta > 65535:
-                return jsonify({'erro': 'Porta deve estar entre 1 e 65535'}), 400
-        except ValueError:
-            return jsonify({'erro': 'Porta deve ser um número'}), 400
+        # Cria nova regra (campos opcionais só entram se informados)
+        nova_regra = {'ip': ip}
+        if porta != '*' and protocolo != 'ICMP':
+            try:
+                nova_regra['porta'] = int(porta)
+            except (TypeError, ValueError):
+                return jsonify({'erro': 'Porta deve ser um número'}), 400
+        for campo in ('porta_fim', 'origem', 'protocolo', 'direcao', 'taxa', 'rajada', 'limitar_por'):
+            valor = data.get(campo)
+            if isinstance(valor, str):
+                valor = valor.strip()
+            if valor not in (None, ''):
+                nova_regra[campo] = valor
+        for campo in ('protocolo', 'direcao', 'limitar_por'):
+            if campo in nova_regra:
+                nova_regra[campo] = str(nova_regra[campo]).upper()
+        if 'porta_fim' in nova_regra:
+            try:
+                nova_regra['porta_fim'] = int(nova_regra['porta_fim'])
+            except (TypeError, ValueError):
+                return jsonify({'erro': 'porta_fim deve ser um número'}), 400
+        for campo in ('taxa', 'rajada'):
+            if isinstance(nova_regra.get(campo), str):
+                try:
+                    nova_regra[campo] = float(nova_regra[campo])
+                except ValueError:
+                    return jsonify({'erro': f'{campo} deve ser um número'}), 400
+        nova_regra['acao'] = acao
         
-        if acao not in ['PERMITIDO', 'BLOQUEADO']:
-            return jsonify({'erro': 'Ação deve ser PERMITIDO ou BLOQUEADO'}), 400
-        
-        # Carrega regras existentes
-        regras = carregar_regras()
-        
-        # Verifica se já existe uma regra para este IP:porta
-        for regra in regras:
-            if regra['ip'] == ip and regra['porta'] == porta:
-                return jsonify({'erro': 'Regra já existe para este IP e porta'}), 400
-        
-        # Cria nova regra
-        nova_regra = {
-            'ip': ip,
-            'porta': porta,
-            'acao': acao
-        }
+        try:
+            chave = chave_regra(nova_regra)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
         if descricao:
             nova_regra['descricao'] = descricao
         
-        # Adiciona à lista e salva
-        regras.append(nova_regra)
-        
-        if salvar_regras(regras):
-            return jsonify(nova_regra), 201
-        else:
-            return jsonify({'erro': 'Erro ao salvar regra'}), 500
+        with _trava_publicacao:
+            # Copia as regras da versão atual
+            regras = copiar_regras_ativas()
+            
+            # Verifica se já existe uma regra para os mesmos campos
+            for regra in regras:
+                if chave_regra(regra) == chave:
+                    return jsonify({'erro': 'Regra já existe para este IP e porta'}), 400
+            
+            # Adiciona à lista, salva e publica a nova versão
+            regras.append(nova_regra)
+            
+            if publicar_regras(regras):
+                return jsonify(nova_regra), 201
+            else:
+                return jsonify({'erro': 'Erro ao salvar regra'}), 500
     
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
@@ -337,37 +1062,51 @@ def editar_regra(index):
     API para editar uma regra existente.
     
     Pode editar:
-        - acao: "PERMITIDO" ou "BLOQUEADO"
+        - acao: "PERMITIDO", "BLOQUEADO" ou "LIMITADO"
+        - taxa, rajada, limitar_por: limite de taxa (ação LIMITADO)
         - descricao: descrição da regra
     """
     try:
-        regras = carregar_regras()
-        
-        # Valida índice
-        if index < 0 or index >= len(regras):
-            return jsonify({'erro': 'Regra não encontrada'}), 404
-        
-        data = request.json
-        
-        # Atualiza ação se fornecida
-        if 'acao' in data:
-            acao = data['acao'].upper()
-            if acao not in ['PERMITIDO', 'BLOQUEADO']:
-                return jsonify({'erro': 'Ação deve ser PERMITIDO ou BLOQUEADO'}), 400
-            regras[index]['acao'] = acao
-        
-        # Atualiza descrição se fornecida
-        if 'descricao' in data:
-            if data['descricao'].strip():
-                regras[index]['descricao'] = data['descricao'].strip()
-            elif 'descricao' in regras[index]:
-                del regras[index]['descricao']
-        
-        # Salva mudanças
-        if salvar_regras(regras):
-            return jsonify(regras[index]), 200
-        else:
-            return jsonify({'erro': 'Erro ao salvar regra'}), 500
+        with _trava_publicacao:
+            regras = copiar_regras_ativas()
+            
+            # Valida índice
+            if index < 0 or index >= len(regras):
+                return jsonify({'erro': 'Regra não encontrada'}), 404
+            
+            data = request.json
+            
+            # Atualiza ação se fornecida
+            if 'acao' in data:
+                acao = data['acao'].upper()
+                if acao not in ACOES:
+                    return jsonify({'erro': 'Ação deve ser PERMITIDO, BLOQUEADO ou LIMITADO'}), 400
+                regras[index]['acao'] = acao
+            
+            # Limite de taxa: só existe na ação LIMITADO
+            for campo in ('taxa', 'rajada', 'limitar_por'):
+                if campo in data:
+                    regras[index][campo] = data[campo]
+            if regras[index]['acao'] != 'LIMITADO':
+                for campo in ('taxa', 'rajada', 'limitar_por'):
+                    regras[index].pop(campo, None)
+            try:
+                chave_regra(regras[index])
+            except ValueError as e:
+                return jsonify({'erro': str(e)}), 400
+            
+            # Atualiza descrição se fornecida
+            if 'descricao' in data:
+                if data['descricao'].strip():
+                    regras[index]['descricao'] = data['descricao'].strip()
+                elif 'descricao' in regras[index]:
+                    del regras[index]['descricao']
+            
+            # Salva mudanças e publica a nova versão
+            if publicar_regras(regras):
+                return jsonify(regras[index]), 200
+            else:
+                return jsonify({'erro': 'Erro ao salvar regra'}), 500
     
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
@@ -379,28 +1118,70 @@ def deletar_regra(index):
     API para deletar uma regra existente.
     """
     try:
-        regras = carregar_regras()
-        
-        # Valida índice
-        if index < 0 or index >= len(regras):
-            return jsonify({'erro': 'Regra não encontrada'}), 404
-        
-        # Remove regra
-        regra_deletada = regras.pop(index)
-        
-        # Salva mudanças
-        if salvar_regras(regras):
-            return jsonify({
-                'mensagem': 'Regra deletada com sucesso',
-                'regra': regra_deletada
-            }), 200
-        else:
-            return jsonify({'erro': 'Erro ao salvar regras'}), 500
+        with _trava_publicacao:
+            regras = copiar_regras_ativas()
+            
+            # Valida índice
+            if index < 0 or index >= len(regras):
+                return jsonify({'erro': 'Regra não encontrada'}), 404
+            
+            # Remove regra
+            regra_deletada = regras.pop(index)
+            
+            # Salva mudanças e publica a nova versão
+            if publicar_regras(regras):
+                return jsonify({
+                    'mensagem': 'Regra deletada com sucesso',
+                    'regra': regra_deletada
+                }), 200
+            else:
+                return jsonify({'erro': 'Erro ao salvar regras'}), 500
     
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 
+@app.route('/api/impacto', methods=['POST'])
+def impacto_regras():
+    """
+    API para prever o impacto de um conjunto de regras candidato antes de
+    publicá-lo: quais fluxos do tráfego gravado mudariam de decisão.
+    
+    Recebe JSON com:
+        - regras (list): Regras candidatas, no formato do regras.json
+        - pacotes (list, opcional): Tráfego gravado (padrão: o histórico de testes)
+        - exemplos (int, opcional): Exemplos por tipo de mudança (padrão: 10)
+        
+    Retorna:
+        JSON com os totais e, para cada mudança (antes -> depois), as
+        contagens de pacotes e fluxos e os fluxos com mais pacotes
+    """
+    data = request.json
+    if not isinstance(data, dict) or not isinstance(data.get('regras'), list):
+        return jsonify({'erro': 'Informe a lista de regras candidatas'}), 400
+    
+    pacotes = data.get('pacotes', testes_realizados)
+    if not isinstance(pacotes, list):
+        return jsonify({'erro': 'pacotes deve ser uma lista'}), 400
+    try:
+        exemplos = int(data.get('exemplos', EXEMPLOS_PADRAO))
+    except (TypeError, ValueError):
+        return jsonify({'erro': 'exemplos deve ser um número'}), 400
+    
+    # Compara com a versão ativa; reaproveita o índice se já estiver em memória
+    conjunto = obter_conjunto()
+    atuais = conjunto.politica if isinstance(conjunto.politica, IndiceRegras) else conjunto.regras
+    try:
+        with trecho('comparar_politicas'):
+            resultado = comparar_politicas(atuais, data['regras'], list(pacotes),
+                                           max_exemplos=max(exemplos, 0))
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    resultado['versao_regras'] = conjunto.versao
+    return jsonify(resultado), 200
+
+
 # ============================================================================
 # API - HISTÓRICO DE TESTES
 # ============================================================================
@@ -408,9 +1189,10 @@ def deletar_regra(index):
 @app.route('/api/testes', methods=['GET'])
 def get_testes():
     """
-    API para obter o histórico de testes realizados.
+    API para obter o histórico de testes realizados (304 se não mudou).
     """
-    return jsonify(testes_realizados), 200
+    return responder_com_etag(f"{_INSTANCIA}-t{_versao_historico}",
+                              lambda: jsonify(testes_realizados))
 
 
 @app.route('/api/testes', methods=['DELETE'])
@@ -420,14 +1202,107 @@ def limpar_testes():
     """
     global testes_realizados
     testes_realizados = []
+    _registrar_mudanca_historico()
     return jsonify({'mensagem': 'Histórico limpo'}), 200
 
 
+# ============================================================================
+# API - ADMINISTRAÇÃO (PERFIL, LIMITES E AUDITORIA)
+# ============================================================================
+
+@app.route('/api/admin/perfis', methods=['GET'])
+def listar_perfis():
+    """
+    API para listar os rastros mais lentos guardados em memória.
+    """
+    return jsonify([rastro.resumo() for rastro in perfilador.listar()]), 200
+
+
+@app.route('/api/admin/perfis', methods=['DELETE'])
+def limpar_perfis():
+    """
+    API para descartar os rastros guardados.
+    """
+    perfilador.limpar()
+    return jsonify({'mensagem': 'Rastros descartados'}), 200
+
+
+@app.route('/api/admin/perfis/<int:identificador>', methods=['GET'])
+def obter_perfil(identificador):
+    """
+    API para obter os tempos de cada etapa de um rastro.
+    """
+    rastro = perfilador.obter(identificador)
+    if rastro is None:
+        return jsonify({'erro': 'Rastro não encontrado'}), 404
+    return jsonify(rastro.detalhes()), 200
+
+
+@app.route('/api/admin/perfis/<int:identificador>/pilhas', methods=['GET'])
+def obter_pilhas_perfil(identificador):
+    """
+    API para obter as etapas de um rastro no formato colapsado do flamegraph
+    (compatível com flamegraph.pl e speedscope).
+    """
+    rastro = perfilador.obter(identificador)
+    if rastro is None:
+        return jsonify({'erro': 'Rastro não encontrado'}), 404
+    return Response(rastro.pilhas_colapsadas(), mimetype='text/plain')
+
+
+@app.route('/api/admin/perfis/<int:identificador>/cprofile', methods=['GET'])
+def obter_cprofile(identificador):
+    """
+    API para baixar as estatísticas do cProfile de um rastro (arquivo .prof,
+    legível com pstats, snakeviz ou flameprof).
+    """
+    rastro = perfilador.obter(identificador)
+    dados = rastro.cprofile_serializado() if rastro is not None else None
+    if dados is None:
+        return jsonify({'erro': 'Rastro sem dados do cProfile'}), 404
+    return Response(dados, mimetype='application/octet-stream', headers={
+        'Content-Disposition': f'attachment; filename=perfil-{identificador}.prof'
+    })
+
+
+@app.route('/api/admin/limites', methods=['GET'])
+def obter_limites():
+    """
+    API para consultar a tabela de baldes das regras LIMITADO.
+    """
+    return jsonify(baldes.estatisticas()), 200
+
+
+@app.route('/api/admin/limites', methods=['DELETE'])
+def limpar_limites():
+    """
+    API para esvaziar a tabela de baldes (todas as origens voltam a ter o
+    balde cheio).
+    """
+    baldes.limpar()
+    return jsonify({'mensagem': 'Baldes descartados'}), 200
+
+
+@app.route('/api/admin/auditoria', methods=['GET'])
+def obter_auditoria():
+    """
+    API para consultar a fila de auditoria: profundidade, registros
+    gravados e descartados.
+    """
+    if auditoria is None:
+        return jsonify({'ativo': False}), 200
+    return jsonify(auditoria.estatisticas()), 200
+
+
 # ============================================================================
 # EXECUÇÃO DA APLICAÇÃO
 # ============================================================================
 
 if __name__ == '__main__':
+    # Recarrega as regras quando o arquivo muda ou ao receber SIGHUP (o
+    # tratador do sinal já foi instalado na importação)
+    iniciar_recarga_automatica()
+    
     # Inicia servidor Flask em modo debug
     # Acesse em http://localhost:5000
     app.run(debug=True, host='0.0.0.0', port=5000)
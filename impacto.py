@@ -0,0 +1,168 @@
+"""
+Impacto - Comparação de políticas sobre tráfego gravado
+Responde "o que mudaria?" antes de publicar uma alteração nas regras:
+decide cada fluxo de uma amostra de tráfego (histórico de testes ou log
+do replay) com as regras atuais e com as candidatas, e conta os fluxos
+cuja decisão muda, com exemplos.
+"""
+
+import heapq
+
+from motor_regras import ACAO_PADRAO, IndiceRegras, normalizar_pacote
+
+# Exemplos guardados por tipo de mudança (os fluxos com mais pacotes)
+EXEMPLOS_PADRAO = 10
+
+# Campos que identificam um fluxo
+CAMPOS_FLUXO = ('ip', 'porta', 'origem', 'protocolo', 'direcao')
+
+
+def agrupar_fluxos(pacotes):
+    """
+    Conta os pacotes de cada fluxo distinto.
+
+    Tráfego real repete muito os mesmos fluxos; decidir cada fluxo uma vez
+    só, em vez de cada pacote, é o que deixa amostras de milhões de
+    pacotes rápidas.
+
+    Args:
+        pacotes (iterable): Pacotes (dict com ip e, opcionalmente, porta,
+            origem, protocolo e direcao); None conta como inválido
+
+    Retorna:
+        tuple: (dict {fluxo: pacotes}, quantidade de pacotes inválidos)
+    """
+    fluxos = {}
+    invalidos = 0
+    for pacote in pacotes:
+        try:
+            fluxo = (pacote['ip'], pacote.get('porta'), pacote.get('origem'),
+                     pacote.get('protocolo'), pacote.get('direcao'))
+            if fluxo[1] is not None and type(fluxo[1]) is not int:
+                raise TypeError
+            fluxos[fluxo] = fluxos.get(fluxo, 0) + 1
+        except (AttributeError, KeyError, TypeError):
+            invalidos += 1
+    return fluxos, invalidos
+
+
+def _regras_alteradas(atuais, candidatas):
+    """
+    Retorna as regras fora do trecho inicial e do trecho final comuns às
+    duas tabelas (mesmos campos de casamento e ação, na mesma ordem).
+
+    Um pacote que não casa com nenhuma delas só casa com regras dos
+    trechos comuns, que estão na mesma ordem nas duas listas: a primeira
+    regra que casa é a mesma, e a decisão não muda.
+    """
+    total = min(len(atuais), len(candidatas))
+    prefixo = 0
+    while prefixo < total and atuais[prefixo][1:-1] == candidatas[prefixo][1:-1]:
+        prefixo += 1
+    sufixo = 0
+    while (sufixo < total - prefixo
+           and atuais[len(atuais) - 1 - sufixo][1:-1] == candidatas[len(candidatas) - 1 - sufixo][1:-1]):
+        sufixo += 1
+
+    alteradas = [atuais[i] for i in range(prefixo, len(atuais) - sufixo)]
+    alteradas += [candidatas[i] for i in range(prefixo, len(candidatas) - sufixo)]
+    return [regra.para_json() for regra in alteradas]
+
+
+def comparar_politicas(regras_atuais, regras_candidatas, pacotes,
+                       max_exemplos=EXEMPLOS_PADRAO):
+    """
+    Compara as decisões de duas listas de regras sobre o mesmo tráfego.
+
+    A decisão considerada é a ação da regra que casa (LIMITADO conta como
+    ação própria, já que o estado dos limites não se aplica aqui). Cada
+    fluxo passa antes por um índice só com as regras que diferem entre as
+    listas; quem não casa com nenhuma delas não pode mudar de decisão e
+    nem é buscado nas listas completas.
+
+    Args:
+        regras_atuais (list ou IndiceRegras): Regras em vigor
+        regras_candidatas (list ou IndiceRegras): Regras propostas
+        pacotes (iterable): Pacotes gravados (ver agrupar_fluxos)
+        max_exemplos (int): Exemplos guardados por tipo de mudança
+
+    Retorna:
+        dict: Totais de pacotes e fluxos, e uma entrada por mudança
+        (antes, depois) com contagens e os fluxos com mais pacotes
+
+    Lança:
+        ValueError: Se alguma regra for inválida
+    """
+    atual = regras_atuais if isinstance(regras_atuais, IndiceRegras) else IndiceRegras(regras_atuais)
+    candidata = (regras_candidatas if isinstance(regras_candidatas, IndiceRegras)
+                 else IndiceRegras(regras_candidatas))
+    fluxos, invalidos = agrupar_fluxos(pacotes)
+
+    alteradas = IndiceRegras(_regras_alteradas(atual.regras, candidata.regras))
+    filtrar = alteradas.buscar
+    acao_atual, acao_candidata = atual.regras.acao, candidata.regras.acao
+    buscar_atual, buscar_candidata = atual.buscar, candidata.buscar
+
+    # (antes, depois) -> [pacotes, fluxos, heap de exemplos]
+    mudancas = {}
+    total = distintos_validos = 0
+    for sequencia, (fluxo, quantidade) in enumerate(fluxos.items()):
+        ip, porta, origem, protocolo, direcao = fluxo
+        try:
+            pacote = normalizar_pacote(ip, porta, origem, protocolo, direcao)
+        except (AttributeError, TypeError, ValueError):
+            invalidos += quantidade
+            continue
+        total += quantidade
+        distintos_validos += 1
+
+        if filtrar(pacote) is None:
+            continue
+        indice_atual = buscar_atual(pacote)
+        indice_candidata = buscar_candidata(pacote)
+        antes = acao_atual(indice_atual) if indice_atual is not None else ACAO_PADRAO
+        depois = acao_candidata(indice_candidata) if indice_candidata is not None else ACAO_PADRAO
+        if antes is depois:
+            continue
+
+        mudanca = mudancas.get((antes, depois))
+        if mudanca is None:
+            mudanca = mudancas[(antes, depois)] = [0, 0, []]
+        mudanca[0] += quantidade
+        mudanca[1] += 1
+        exemplo = (quantidade, -sequencia, fluxo, indice_atual, indice_candidata)
+        if len(mudanca[2]) < max_exemplos:
+            heapq.heappush(mudanca[2], exemplo)
+        elif max_exemplos and exemplo > mudanca[2][0]:
+            heapq.heapreplace(mudanca[2], exemplo)
+
+    resultado = []
+    for (antes, depois), (quantidade, distintos, exemplos) in sorted(
+            mudancas.items(), key=lambda item: -item[1][0]):
+        resultado.append({
+            'antes': antes,
+            'depois': depois,
+            'pacotes': quantidade,
+            'fluxos': distintos,
+            'exemplos': [_exemplo(*exemplo) for exemplo in sorted(exemplos, reverse=True)]
+        })
+
+    return {
+        'pacotes': total,
+        'fluxos': distintos_validos,
+        'invalidos': invalidos,
+        'pacotes_alterados': sum(mudanca['pacotes'] for mudanca in resultado),
+        'fluxos_alterados': sum(mudanca['fluxos'] for mudanca in resultado),
+        'mudancas': resultado
+    }
+
+
+def _exemplo(quantidade, _sequencia, fluxo, indice_atual, indice_candidata):
+    """
+    Monta o exemplo de um fluxo alterado (só com os campos presentes).
+    """
+    exemplo = {campo: valor for campo, valor in zip(CAMPOS_FLUXO, fluxo) if valor is not None}
+    exemplo['pacotes'] = quantidade
+    exemplo['regra_atual'] = indice_atual
+    exemplo['regra_candidata'] = indice_candidata
+    return exemplo
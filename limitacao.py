@@ -0,0 +1,128 @@
+"""
+Limitação - Baldes de fichas para a ação LIMITADO
+Guarda o estado dos limites de taxa (por regra ou por origem) em uma tabela
+com expiração e tamanho máximo, para que milhões de origens distintas não
+façam a memória crescer sem limite.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Quantidade máxima de baldes guardados ao mesmo tempo
+CAPACIDADE_PADRAO = 100000
+
+# Baldes cheios removidos do início da tabela a cada consulta
+_EXPIRACOES_POR_CONSULTA = 2
+
+# Tolerância para arredondamento de ponto flutuante
+_EPSILON = 1e-9
+
+
+class TabelaBaldes:
+    """
+    Tabela de baldes de fichas com expiração e tamanho máximo.
+
+    Cada balde guarda um único número: o instante em que ele volta a ficar
+    cheio (como no GCRA). Com taxa r fichas/s e capacidade b, um balde que
+    fica cheio em T tem b - (T - agora) * r fichas; um pacote passa se
+    houver ao menos uma ficha, e cada pacote aceito adianta T em 1/r.
+
+    Um balde cheio (T <= agora) se comporta como um balde inexistente e
+    pode ser descartado sem mudar nenhuma decisão: é assim que as entradas
+    expiram. A tabela fica em ordem de uso (LRU); a cada consulta, baldes
+    cheios são removidos do início e, se a capacidade for ultrapassada, o
+    menos usado é descartado (a origem dele volta com o balde cheio).
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO):
+        """
+        Args:
+            capacidade (int): Quantidade máxima de baldes guardados
+        """
+        if capacidade < 1:
+            raise ValueError("Capacidade deve ser positiva")
+        self.capacidade = capacidade
+        self._baldes = OrderedDict()
+        self._trava = threading.Lock()
+        self.expirados = 0
+        self.despejados = 0
+        self.limitados = 0
+
+    def __len__(self):
+        return len(self._baldes)
+
+    def consumir(self, chave, taxa, rajada, agora=None):
+        """
+        Tenta retirar uma ficha do balde da chave.
+
+        Args:
+            chave (int): Identifica o balde (regra, ou regra + origem)
+            taxa (float): Fichas repostas por segundo
+            rajada (float): Capacidade do balde
+            agora (float, opcional): Instante em segundos (padrão: time.monotonic())
+
+        Retorna:
+            bool: True se o pacote passa, False se foi limitado
+        """
+        if agora is None:
+            agora = time.monotonic()
+        intervalo = 1.0 / taxa
+
+        with self._trava:
+            cheio_em = self._baldes.get(chave)
+            if cheio_em is None or cheio_em < agora:
+                cheio_em = agora
+
+            # Passa se, depois de retirar a ficha, o balde não ficar negativo
+            permitido = cheio_em + intervalo - agora <= rajada * intervalo + _EPSILON
+            if permitido:
+                cheio_em += intervalo
+            else:
+                self.limitados += 1
+            self._baldes[chave] = cheio_em
+            self._baldes.move_to_end(chave)
+            self._limpar(agora)
+        return permitido
+
+    def _limpar(self, agora):
+        """
+        Remove baldes expirados do início e respeita a capacidade.
+        Deve ser chamada com a trava adquirida.
+        """
+        baldes = self._baldes
+        while len(baldes) > self.capacidade:
+            _, cheio_em = baldes.popitem(last=False)
+            if cheio_em <= agora:
+                self.expirados += 1
+            else:
+                self.despejados += 1
+
+        for _ in range(_EXPIRACOES_POR_CONSULTA):
+            if not baldes:
+                break
+            chave, cheio_em = next(iter(baldes.items()))
+            if cheio_em > agora:
+                break
+            del baldes[chave]
+            self.expirados += 1
+
+    def estatisticas(self):
+        """
+        Retorna o tamanho da tabela e os contadores de limitação.
+        """
+        with self._trava:
+            return {
+                'baldes': len(self._baldes),
+                'capacidade': self.capacidade,
+                'limitados': self.limitados,
+                'expirados': self.expirados,
+                'despejados': self.despejados
+            }
+
+    def limpar(self):
+        """
+        Descarta todos os baldes (todas as origens voltam com o balde cheio).
+        """
+        with self._trava:
+            self._baldes.clear()
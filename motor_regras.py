@@ -0,0 +1,986 @@
+"""
+Motor de Regras - Classificação de pacotes para o Simulador de Firewall
+Define o modelo de regras com 5 campos (origem, destino, portas, protocolo e
+direção), a implementação de referência (busca linear) e o classificador
+indexado por busca em espaço de tuplas (tuple space search).
+
+Campos de uma regra no regras.json:
+    - ip (str): Destino - IP, rede CIDR ("10.0.0.0/8", "2001:db8::/32"),
+      nome de host ou "*"
+    - porta (int, opcional): Porta de destino (ausente = qualquer porta)
+    - porta_fim (int, opcional): Fim da faixa de portas [porta, porta_fim]
+    - origem (str, opcional): IP ou rede CIDR de origem (ausente = qualquer)
+    - protocolo (str, opcional): "TCP", "UDP", "ICMP" ou "QUALQUER" (padrão)
+    - direcao (str, opcional): "ENTRADA", "SAIDA" ou "QUALQUER" (padrão)
+    - acao (str): "PERMITIDO", "BLOQUEADO" ou "LIMITADO"
+    - taxa (float): Pacotes por segundo permitidos (só na ação LIMITADO)
+    - rajada (float, opcional): Tamanho do balde de fichas (padrão: taxa, mínimo 1)
+    - limitar_por (str, opcional): "ORIGEM" (um balde por IP de origem,
+      padrão) ou "REGRA" (um balde compartilhado pela regra)
+
+Campos de um pacote:
+    - ip, porta: Destino (porta inteira de 0 a 65535; pode faltar em ICMP)
+    - origem (opcional): IP de origem (ausente = desconhecida)
+    - protocolo (opcional): padrão "TCP"
+    - direcao (opcional): padrão "ENTRADA"
+
+Quando mais de uma regra casa com o pacote, vale a primeira da lista. Se
+ela for LIMITADO, o pacote é PERMITIDO enquanto houver ficha no balde e
+LIMITADO quando não houver (ver limitacao.TabelaBaldes); sem tabela de
+baldes, regras LIMITADO deixam o pacote passar.
+
+Endereços: IPv4 e IPv6 ficam no mesmo espaço de 128 bits. Um IPv4 vira o
+IPv6 mapeado ::ffff:a.b.c.d e uma rede IPv4 /n vira /96+n, então
+"10.0.0.1" e "::ffff:10.0.0.1" (ou qualquer outra grafia do mesmo IPv6)
+são o mesmo inteiro, e uma única tabela de busca atende às duas famílias.
+"*" casa com qualquer endereço; "0.0.0.0/0" só com os IPv4.
+
+Representação em memória: Regra e Pacote são tuplas nomeadas imutáveis
+(sem __dict__), com IPs como inteiros e a ação como enum; TabelaRegras
+guarda muitas regras em colunas de array (cerca de 18 bytes por regra).
+Todos convertem de/para o formato JSON sem perda (forma canônica).
+"""
+
+import enum
+import ipaddress
+import socket
+from array import array
+from collections import namedtuple
+
+
+class Acao(str, enum.Enum):
+    """
+    Ação de uma regra. Compara igual à string ("PERMITIDO" == Acao.PERMITIDO)
+    e é serializada como string em JSON.
+    """
+
+    PERMITIDO = 'PERMITIDO'
+    BLOQUEADO = 'BLOQUEADO'
+    LIMITADO = 'LIMITADO'
+
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+
+# Política padrão: negar tudo que não tem regra (fail-safe)
+ACAO_PADRAO = Acao.BLOQUEADO
+
+ACOES = tuple(acao.value for acao in Acao)
+
+# Chaves de balde da ação LIMITADO
+LIMITAR_POR = ('ORIGEM', 'REGRA')
+LIMITAR_POR_PADRAO = 'ORIGEM'
+PROTOCOLOS = ('TCP', 'UDP', 'ICMP')
+DIRECOES = ('ENTRADA', 'SAIDA')
+QUALQUER = 'QUALQUER'
+
+# Valores padrão dos campos opcionais de um pacote
+PROTOCOLO_PADRAO = 'TCP'
+DIRECAO_PADRAO = 'ENTRADA'
+
+# Destino de uma regra que não é IP/CIDR: nome de host comparado literalmente
+PREFIXO_NOME = -1
+
+# Espaço único de endereços: IPv4 a.b.c.d = IPv6 mapeado ::ffff:a.b.c.d
+BITS_ENDERECO = 128
+MAPEADO_IPV4 = 0xFFFF << 32
+PREFIXO_IPV4 = 96
+
+# Faixa que representa "qualquer porta"
+PORTA_MINIMA = 0
+PORTA_MAXIMA = 65535
+
+# Códigos numéricos (armazenamento em array, chaves hash e binário compilado)
+CODIGO_ACAO = {Acao.PERMITIDO: 1, Acao.BLOQUEADO: 2, Acao.LIMITADO: 3}
+CODIGO_PROTOCOLO = {QUALQUER: 0, 'TCP': 1, 'UDP': 2, 'ICMP': 3}
+CODIGO_DIRECAO = {QUALQUER: 0, 'ENTRADA': 1, 'SAIDA': 2}
+ACAO_POR_CODIGO = {codigo: acao for acao, codigo in CODIGO_ACAO.items()}
+PROTOCOLO_POR_CODIGO = {codigo: nome for nome, codigo in CODIGO_PROTOCOLO.items()}
+DIRECAO_POR_CODIGO = {codigo: nome for nome, codigo in CODIGO_DIRECAO.items()}
+
+# Campos do regras.json interpretados pelo motor; os demais (ex.: descricao)
+# são preservados como estão
+CAMPOS_REGRA = ('ip', 'porta', 'porta_fim', 'origem', 'protocolo', 'direcao', 'acao',
+                'taxa', 'rajada', 'limitar_por')
+
+
+def formatar_endereco(valor):
+    """
+    Converte um endereço do espaço de 128 bits para texto: IPv4 com
+    pontos se for um IPv4 mapeado, senão IPv6 na forma comprimida.
+    """
+    if valor >> 32 == 0xFFFF:
+        return str(ipaddress.IPv4Address(valor & 0xFFFFFFFF))
+    return str(ipaddress.IPv6Address(valor))
+
+
+def _formatar_rede(valor, tamanho):
+    """
+    Converte (inteiro, prefixo) de volta para texto: IP, CIDR ou "*".
+    """
+    if tamanho == PREFIXO_NOME:
+        return valor
+    if tamanho == 0:
+        return '*'
+    endereco = formatar_endereco(valor)
+    if tamanho >= PREFIXO_IPV4 and valor >> 32 == 0xFFFF:
+        tamanho -= PREFIXO_IPV4
+        return endereco if tamanho == 32 else f"{endereco}/{tamanho}"
+    return endereco if tamanho == BITS_ENDERECO else f"{endereco}/{tamanho}"
+
+
+class Regra(namedtuple('Regra', [
+    'prioridade', 'origem', 'origem_len', 'destino', 'destino_len',
+    'porta_ini', 'porta_fim', 'protocolo', 'direcao', 'acao', 'limite', 'extras'
+])):
+    """
+    Regra normalizada (imutável):
+        prioridade           - posição da regra na lista (menor = mais prioritária)
+        origem, origem_len   - rede de origem como inteiro de 128 bits +
+                               tamanho do prefixo (IPv4 mapeado: 96 + n)
+        destino, destino_len - rede de destino como inteiro + prefixo, ou nome
+                               do host com destino_len = PREFIXO_NOME
+        porta_ini, porta_fim - faixa de portas de destino
+        protocolo, direcao   - valor ou QUALQUER
+        acao                 - Acao
+        limite               - (taxa, rajada, por_origem) na ação LIMITADO,
+                               senão None
+        extras               - outros campos do JSON, como pares (chave, valor),
+                               ou None
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def de_json(cls, regra, prioridade=0):
+        """
+        Cria a regra a partir do formato do regras.json (ver normalizar_regra).
+        """
+        return normalizar_regra(regra, prioridade)
+
+    def para_json(self):
+        """
+        Converte a regra de volta para o formato do regras.json.
+
+        Retorna:
+            dict: Regra na forma canônica (campos padrão omitidos)
+        """
+        regra = {'ip': _formatar_rede(self.destino, self.destino_len)}
+        if (self.porta_ini, self.porta_fim) != (PORTA_MINIMA, PORTA_MAXIMA):
+            regra['porta'] = self.porta_ini
+            if self.porta_fim != self.porta_ini:
+                regra['porta_fim'] = self.porta_fim
+        if self.origem_len > 0:
+            regra['origem'] = _formatar_rede(self.origem, self.origem_len)
+        if self.protocolo != QUALQUER:
+            regra['protocolo'] = self.protocolo
+        if self.direcao != QUALQUER:
+            regra['direcao'] = self.direcao
+        regra['acao'] = self.acao.value
+        if self.limite is not None:
+            taxa, rajada, por_origem = self.limite
+            regra['taxa'] = taxa
+            if rajada != _rajada_padrao(taxa):
+                regra['rajada'] = rajada
+            if not por_origem:
+                regra['limitar_por'] = 'REGRA'
+        if self.extras:
+            regra.update(self.extras)
+        return regra
+
+
+class Pacote(namedtuple('Pacote', [
+    'origem', 'destino', 'destino_eh_ip', 'porta', 'protocolo', 'direcao'
+])):
+    """
+    Pacote normalizado (imutável): origem é um inteiro de 128 bits ou None
+    (desconhecida), destino é um inteiro (IPv4 mapeado ou IPv6) ou o nome
+    do host em minúsculas, porta é None em ICMP.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def de_json(cls, pacote):
+        """
+        Cria o pacote a partir do formato JSON (ip, porta, origem, ...).
+        """
+        return normalizar_pacote(pacote['ip'], pacote.get('porta'), pacote.get('origem'),
+                                 pacote.get('protocolo'), pacote.get('direcao'))
+
+    def para_json(self):
+        """
+        Converte o pacote de volta para o formato JSON.
+
+        Retorna:
+            dict: Pacote na forma canônica (campos padrão omitidos)
+        """
+        pacote = {'ip': formatar_endereco(self.destino) if self.destino_eh_ip
+                  else self.destino}
+        if self.porta is not None:
+            pacote['porta'] = self.porta
+        if self.origem is not None:
+            pacote['origem'] = formatar_endereco(self.origem)
+        if self.protocolo != PROTOCOLO_PADRAO:
+            pacote['protocolo'] = self.protocolo
+        if self.direcao != DIRECAO_PADRAO:
+            pacote['direcao'] = self.direcao
+        return pacote
+
+
+# ============================================================================
+# NORMALIZAÇÃO DE REGRAS E PACOTES
+# ============================================================================
+
+def _ler_rede(texto, campo):
+    """
+    Converte IP ou CIDR (IPv4 ou IPv6) em (inteiro da rede, tamanho do
+    prefixo) no espaço de 128 bits.
+
+    Lança:
+        ValueError: Se o texto não for um IP/CIDR válido
+    """
+    try:
+        rede = ipaddress.ip_network(texto, strict=False)
+    except ValueError:
+        raise ValueError(f"{campo} inválido: {texto}")
+    if rede.version == 4:
+        return MAPEADO_IPV4 | int(rede.network_address), PREFIXO_IPV4 + rede.prefixlen
+    return int(rede.network_address), rede.prefixlen
+
+
+def _ler_destino(texto):
+    """
+    Converte o destino de uma regra em (valor, tamanho do prefixo).
+    Nomes de host usam tamanho PREFIXO_NOME e são comparados literalmente.
+    """
+    texto = str(texto).strip()
+    if not texto:
+        raise ValueError("IP é obrigatório")
+    if texto == '*':
+        return 0, 0
+    try:
+        return _ler_rede(texto, 'IP')
+    except ValueError:
+        if '/' in texto or ':' in texto or texto.replace('.', '').isdigit():
+            raise
+        return texto.lower(), PREFIXO_NOME
+
+
+def _ler_porta(valor, campo):
+    """
+    Converte e valida um número de porta (1-65535).
+    """
+    try:
+        porta = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo} deve ser um número")
+    if porta < 1 or porta > 65535:
+        raise ValueError(f"{campo} deve estar entre 1 e 65535")
+    return porta
+
+
+def _ler_opcao(valor, opcoes, campo):
+    """
+    Valida um campo de escolha (protocolo/direção), aceitando QUALQUER.
+    Retorna a constante correspondente, compartilhada entre as regras.
+    """
+    valor = str(valor).strip().upper()
+    if valor == QUALQUER:
+        return QUALQUER
+    for opcao in opcoes:
+        if opcao == valor:
+            return opcao
+    raise ValueError(f"{campo} deve ser {', '.join(opcoes)} ou {QUALQUER}")
+
+
+def _rajada_padrao(taxa):
+    """
+    Tamanho padrão do balde: um segundo de taxa, com ao menos uma ficha.
+    """
+    return taxa if taxa >= 1 else 1
+
+
+def _ler_limite(regra):
+    """
+    Valida os campos da ação LIMITADO.
+
+    Retorna:
+        tuple: (taxa, rajada, por_origem)
+    """
+    taxa = regra.get('taxa')
+    if isinstance(taxa, bool) or not isinstance(taxa, (int, float)) or not taxa > 0:
+        raise ValueError("Taxa deve ser um número positivo (pacotes por segundo)")
+
+    rajada = regra.get('rajada')
+    if rajada in (None, ''):
+        rajada = _rajada_padrao(taxa)
+    elif isinstance(rajada, bool) or not isinstance(rajada, (int, float)) or not rajada >= 1:
+        raise ValueError("Rajada deve ser um número maior ou igual a 1")
+
+    limitar_por = str(regra.get('limitar_por') or LIMITAR_POR_PADRAO).strip().upper()
+    if limitar_por not in LIMITAR_POR:
+        raise ValueError(f"limitar_por deve ser {' ou '.join(LIMITAR_POR)}")
+    return taxa, rajada, limitar_por == 'ORIGEM'
+
+
+def normalizar_regra(regra, prioridade=0):
+    """
+    Valida uma regra do regras.json e a converte para o formato de busca.
+
+    Args:
+        regra (dict): Regra no formato do regras.json
+        prioridade (int): Posição da regra na lista
+
+    Retorna:
+        Regra
+
+    Lança:
+        ValueError: Se algum campo for inválido (mensagem descreve o campo)
+    """
+    if not isinstance(regra, dict):
+        raise ValueError("Regra deve ser um objeto JSON")
+    if 'ip' not in regra:
+        raise ValueError("IP é obrigatório")
+    destino, destino_len = _ler_destino(regra['ip'])
+
+    if regra.get('origem') in (None, '', '*'):
+        origem, origem_len = 0, 0
+    else:
+        origem, origem_len = _ler_rede(str(regra['origem']).strip(), 'Origem')
+
+    protocolo = _ler_opcao(regra.get('protocolo', QUALQUER), PROTOCOLOS, 'Protocolo')
+    direcao = _ler_opcao(regra.get('direcao', QUALQUER), DIRECOES, 'Direção')
+
+    if regra.get('porta') in (None, '', '*'):
+        if regra.get('porta_fim') not in (None, ''):
+            raise ValueError("porta_fim exige porta")
+        porta_ini, porta_fim = PORTA_MINIMA, PORTA_MAXIMA
+    else:
+        porta_ini = _ler_porta(regra['porta'], 'Porta')
+        porta_fim = porta_ini
+        if regra.get('porta_fim') not in (None, ''):
+            porta_fim = _ler_porta(regra['porta_fim'], 'porta_fim')
+            if porta_fim < porta_ini:
+                raise ValueError("porta_fim deve ser maior ou igual a porta")
+        if protocolo == 'ICMP':
+            raise ValueError("Regras ICMP não usam porta")
+
+    try:
+        acao = Acao(str(regra.get('acao', '')).upper())
+    except ValueError:
+        raise ValueError("Ação deve ser PERMITIDO, BLOQUEADO ou LIMITADO")
+
+    limite = None
+    if acao is Acao.LIMITADO:
+        limite = _ler_limite(regra)
+    elif any(regra.get(campo) not in (None, '') for campo in ('taxa', 'rajada', 'limitar_por')):
+        raise ValueError("taxa, rajada e limitar_por só valem para a ação LIMITADO")
+
+    extras = tuple((k, v) for k, v in regra.items() if k not in CAMPOS_REGRA) or None
+
+    return Regra(prioridade, origem, origem_len, destino, destino_len,
+                 porta_ini, porta_fim, protocolo, direcao, acao, limite, extras)
+
+
+def normalizar_regras(regras):
+    """
+    Normaliza uma lista de regras, preservando a ordem como prioridade.
+
+    Lança:
+        ValueError: Se alguma regra for inválida (indica qual)
+    """
+    normalizadas = []
+    for i, regra in enumerate(regras):
+        try:
+            normalizadas.append(normalizar_regra(regra, i))
+        except ValueError as e:
+            raise ValueError(f"Regra {i}: {e}")
+    return normalizadas
+
+
+def chave_regra(regra):
+    """
+    Retorna os campos de casamento de uma regra (tudo menos prioridade,
+    ação, limite e extras). Duas regras com a mesma chave casam os mesmos
+    pacotes.
+    """
+    return normalizar_regra(regra)[1:-3]
+
+
+def identificador_limite(regra):
+    """
+    Identifica o balde de uma regra LIMITADO pelos seus campos (e não pela
+    posição), para que o estado dos baldes sobreviva a recargas das regras
+    enquanto a regra não mudar.
+
+    Retorna:
+        int: Identificador de 64 bits
+    """
+    return hash(tuple(regra[1:-3]) + tuple(regra.limite)) & 0xFFFFFFFFFFFFFFFF
+
+
+def aplicar_limite(baldes, limite, origem, agora=None):
+    """
+    Resolve a ação LIMITADO consumindo uma ficha do balde correspondente.
+
+    Args:
+        baldes (TabelaBaldes ou None): Estado dos baldes (None = não limitar)
+        limite (tuple): (taxa, rajada, por_origem, identificador)
+        origem (int ou None): IP de origem do pacote
+        agora (float, opcional): Instante do pacote em segundos
+
+    Retorna:
+        Acao: PERMITIDO ou LIMITADO
+    """
+    if baldes is None:
+        return Acao.PERMITIDO
+    taxa, rajada, por_origem, identificador = limite
+    chave = ((origem or 0) << 64 | identificador) if por_origem else identificador
+    return Acao.PERMITIDO if baldes.consumir(chave, taxa, rajada, agora) else Acao.LIMITADO
+
+
+def _ip_para_inteiro(texto):
+    """
+    Converte um IPv4 ou IPv6 em inteiro de 128 bits (IPv4 como IPv6
+    mapeado), ou retorna None se não for um IP.
+
+    inet_pton aceita as mesmas formas que ipaddress (quatro
+    octetos decimais, sem zeros à esquerda) e é bem mais rápido, o que
+    pesa ao normalizar milhões de pacotes. Grafias diferentes do mesmo
+    IPv6 (zeros, maiúsculas, "::", IPv4 mapeado) dão o mesmo inteiro; o
+    escopo ("fe80::1%eth0") é ignorado.
+    """
+    texto = str(texto).strip()
+    try:
+        if ':' in texto:
+            if '%' in texto:
+                texto = texto.partition('%')[0]
+            return int.from_bytes(socket.inet_pton(socket.AF_INET6, texto), 'big')
+        return MAPEADO_IPV4 | int.from_bytes(socket.inet_pton(socket.AF_INET, texto), 'big')
+    except (OSError, ValueError):
+        return None
+
+
+def normalizar_pacote(ip, porta=None, origem=None, protocolo=PROTOCOLO_PADRAO,
+                      direcao=DIRECAO_PADRAO):
+    """
+    Converte os campos de um pacote para o formato de busca.
+
+    Retorna:
+        Pacote
+
+    Lança:
+        ValueError: Se a porta não for None nem um inteiro de 0 a 65535
+            (fora da faixa, ela invadiria os bits de endereço da chave de busca)
+    """
+    if porta is not None and (type(porta) is not int or not PORTA_MINIMA <= porta <= PORTA_MAXIMA):
+        raise ValueError(f"Porta inválida: {porta!r}")
+    destino = _ip_para_inteiro(ip)
+    destino_eh_ip = destino is not None
+    if not destino_eh_ip:
+        destino = str(ip).strip().lower()
+    origem_int = _ip_para_inteiro(origem) if origem not in (None, '') else None
+    protocolo = (protocolo or PROTOCOLO_PADRAO).upper()
+    direcao = (direcao or DIRECAO_PADRAO).upper()
+    return Pacote(origem_int, destino, destino_eh_ip, porta, protocolo, direcao)
+
+
+def formatar_portas(regra):
+    """
+    Retorna a porta ou faixa de uma regra para exibição ("80", "1000-2000", "*").
+    """
+    porta = regra.get('porta')
+    if porta in (None, '', '*'):
+        return '*'
+    if regra.get('porta_fim') not in (None, '', porta):
+        return f"{porta}-{regra['porta_fim']}"
+    return str(porta)
+
+
+def explicar_decisao(regra, candidatos, tabelas, total_tabelas):
+    """
+    Monta a explicação de uma decisão: qual regra casou (ou se valeu a
+    política padrão), por quê e quanto trabalho a busca fez.
+
+    Args:
+        regra (Regra ou None): Regra que casou, ou None
+        candidatos (int): Regras comparadas com o pacote
+        tabelas (int): Tabelas hash consultadas
+        total_tabelas (int): Tabelas hash do classificador
+
+    Retorna:
+        dict: decisao, regra (índice ou None), padrao, motivo, candidatos,
+        tabelas_consultadas e tabelas
+    """
+    explicacao = {'decisao': ACAO_PADRAO, 'regra': None, 'padrao': True,
+                  'candidatos': candidatos, 'tabelas_consultadas': tabelas,
+                  'tabelas': total_tabelas}
+    if regra is None:
+        explicacao['motivo'] = (f"Nenhuma regra casou com o pacote; "
+                                f"vale a política padrão ({ACAO_PADRAO})")
+        return explicacao
+
+    campos = regra.para_json()
+    condicoes = []
+    if campos['ip'] != '*':
+        condicoes.append(f"destino {campos['ip']}")
+    if 'porta' in campos:
+        condicoes.append(f"porta {formatar_portas(campos)}")
+    if 'origem' in campos:
+        condicoes.append(f"origem {campos['origem']}")
+    if 'protocolo' in campos:
+        condicoes.append(f"protocolo {campos['protocolo']}")
+    if 'direcao' in campos:
+        condicoes.append(f"direção {campos['direcao']}")
+    motivo = (f"Regra {regra.prioridade} casou "
+              f"({', '.join(condicoes) if condicoes else 'qualquer pacote'}): {regra.acao}")
+    if regra.limite is not None:
+        taxa, rajada, por_origem = regra.limite
+        motivo += (f", até {taxa:g} pacote(s)/s com rajada de {rajada:g} "
+                   f"{'por origem' if por_origem else 'para a regra toda'}")
+
+    explicacao.update(decisao=regra.acao, regra=regra.prioridade, padrao=False, motivo=motivo)
+    return explicacao
+
+
+# ============================================================================
+# IMPLEMENTAÇÃO DE REFERÊNCIA (BUSCA LINEAR)
+# ============================================================================
+
+def _mascara(tamanho):
+    """
+    Máscara de rede (128 bits) para um prefixo de `tamanho` bits.
+    """
+    todos = (1 << BITS_ENDERECO) - 1
+    return (todos << (BITS_ENDERECO - tamanho)) & todos
+
+
+_MASCARAS = tuple(_mascara(tamanho) for tamanho in range(BITS_ENDERECO + 1))
+
+
+def regra_casa(regra, pacote):
+    """
+    Verifica se uma regra normalizada casa com um pacote normalizado.
+    """
+    origem, destino, destino_eh_ip, porta, protocolo, direcao = pacote
+
+    if regra.protocolo != QUALQUER and regra.protocolo != protocolo:
+        return False
+    if regra.direcao != QUALQUER and regra.direcao != direcao:
+        return False
+
+    if regra.destino_len == PREFIXO_NOME:
+        if destino_eh_ip or regra.destino != destino:
+            return False
+    elif regra.destino_len > 0:
+        if not destino_eh_ip or (destino & _mascara(regra.destino_len)) != regra.destino:
+            return False
+
+    if regra.origem_len > 0:
+        if origem is None or (origem & _mascara(regra.origem_len)) != regra.origem:
+            return False
+
+    if porta is None:
+        return regra.porta_ini == PORTA_MINIMA and regra.porta_fim == PORTA_MAXIMA
+    return regra.porta_ini <= porta <= regra.porta_fim
+
+
+def filtrar_referencia(pacote, regras):
+    """
+    Decide um pacote percorrendo as regras em ordem (implementação de
+    referência, usada para validar os classificadores indexados).
+
+    Args:
+        pacote (dict): Pacote com ip, porta e campos opcionais
+        regras (list): Regras no formato do regras.json
+
+    Retorna:
+        str: "PERMITIDO" ou "BLOQUEADO"
+    """
+    normalizado = normalizar_pacote(pacote['ip'], pacote.get('porta'), pacote.get('origem'),
+                                    pacote.get('protocolo'), pacote.get('direcao'))
+    for i, regra in enumerate(regras):
+        normalizada = normalizar_regra(regra, i)
+        if regra_casa(normalizada, normalizado):
+            if normalizada.acao is Acao.LIMITADO:
+                return Acao.PERMITIDO
+            return normalizada.acao
+    return ACAO_PADRAO
+
+
+# ============================================================================
+# CLASSIFICADOR INDEXADO (BUSCA EM ESPAÇO DE TUPLAS)
+# ============================================================================
+
+def assinatura_tupla(regra):
+    """
+    Retorna a "tupla" de uma regra: quais campos ela especifica e com que
+    tamanho de prefixo. Regras da mesma tupla podem ser indexadas em uma
+    única tabela hash, cuja chave são os campos especificados.
+
+    Retorna:
+        tuple: (origem_len, destino_len, usa_protocolo, usa_direcao, porta_exata)
+    """
+    return (regra.origem_len, regra.destino_len, regra.protocolo != QUALQUER,
+            regra.direcao != QUALQUER, regra.porta_ini == regra.porta_fim)
+
+
+def chave_tupla(tupla, origem, destino, porta, protocolo, direcao):
+    """
+    Monta a chave de busca de um pacote (ou regra) dentro de uma tupla.
+
+    Os campos são empacotados em um único inteiro (origem e destino de 128
+    bits, porta, códigos de protocolo e direção), o mesmo para IPv4 e IPv6;
+    destinos por nome viram (nome, inteiro).
+
+    Args:
+        protocolo, direcao (int): Códigos (CODIGO_PROTOCOLO/CODIGO_DIRECAO)
+
+    Retorna:
+        int, tuple ou None se o pacote não pode casar com nenhuma regra da tupla
+    """
+    origem_len, destino_len, usa_protocolo, usa_direcao, porta_exata = tupla
+
+    if origem_len > 0:
+        if origem is None:
+            return None
+        origem &= _MASCARAS[origem_len]
+    else:
+        origem = 0
+
+    nome = None
+    if destino_len > 0:
+        if not isinstance(destino, int):
+            return None
+        destino &= _MASCARAS[destino_len]
+    elif destino_len == 0:
+        destino = 0
+    elif isinstance(destino, int):
+        return None
+    else:
+        nome, destino = destino, 0
+
+    if porta_exata:
+        if porta is None:
+            return None
+    else:
+        porta = 0
+
+    chave = ((((origem << BITS_ENDERECO) | destino) << 16 | porta) << 4
+             | (protocolo << 2 if usa_protocolo else 0)
+             | (direcao if usa_direcao else 0))
+    return chave if nome is None else (nome, chave)
+
+
+def _cabe_em_32_bits(valor, tamanho):
+    """
+    Verifica se um endereço de regra é "*" ou uma rede IPv4 mapeada, que
+    a TabelaRegras guarda só com os 32 bits do IPv4.
+    """
+    return tamanho <= 0 or (tamanho >= PREFIXO_IPV4 and valor >> 32 == 0xFFFF)
+
+
+class TabelaRegras:
+    """
+    Armazenamento compacto de regras em colunas (array-of-struct por campo).
+
+    Cada regra ocupa alguns bytes em arrays tipados, em vez de um dict com
+    strings; os arrays de endereço guardam os 32 bits de um IPv4 mapeado.
+    Endereços IPv6, nomes de host, limites de taxa e campos extras ficam em
+    dicionários à parte, só para as regras que os usam. O índice de uma
+    regra é sua prioridade.
+    """
+
+    def __init__(self, regras=()):
+        """
+        Args:
+            regras (iterable): Regras no formato do regras.json ou Regra
+
+        Lança:
+            ValueError: Se alguma regra for inválida (indica qual)
+        """
+        self._origem = array('I')
+        self._origem_len = array('B')
+        self._destino = array('I')
+        self._destino_len = array('h')
+        self._porta_ini = array('H')
+        self._porta_fim = array('H')
+        self._protocolo = array('B')
+        self._direcao = array('B')
+        self._acao = array('B')
+        self._nomes = {}
+        self._ipv6 = {}
+        self._limites = {}
+        self._extras = {}
+
+        for i, regra in enumerate(regras):
+            if not isinstance(regra, Regra):
+                try:
+                    regra = normalizar_regra(regra, i)
+                except ValueError as e:
+                    raise ValueError(f"Regra {i}: {e}")
+            self._anexar(regra)
+
+    def _anexar(self, regra):
+        """
+        Acrescenta uma regra normalizada ao fim da tabela.
+        """
+        indice = len(self._acao)
+        destino = regra.destino
+        if regra.destino_len == PREFIXO_NOME:
+            self._nomes[indice] = destino
+            destino = 0
+        if not (_cabe_em_32_bits(regra.origem, regra.origem_len)
+                and _cabe_em_32_bits(destino, regra.destino_len)):
+            # 32 bytes (origem + destino) ocupam menos que dois inteiros grandes
+            self._ipv6[indice] = regra.origem.to_bytes(16, 'big') + destino.to_bytes(16, 'big')
+        self._origem.append(regra.origem & 0xFFFFFFFF)
+        self._destino.append(destino & 0xFFFFFFFF)
+        if regra.limite is not None:
+            self._limites[indice] = (*regra.limite, identificador_limite(regra))
+        if regra.extras:
+            self._extras[indice] = regra.extras
+        self._origem_len.append(regra.origem_len)
+        self._destino_len.append(regra.destino_len)
+        self._porta_ini.append(regra.porta_ini)
+        self._porta_fim.append(regra.porta_fim)
+        self._protocolo.append(CODIGO_PROTOCOLO[regra.protocolo])
+        self._direcao.append(CODIGO_DIRECAO[regra.direcao])
+        self._acao.append(CODIGO_ACAO[regra.acao])
+
+    def __len__(self):
+        return len(self._acao)
+
+    def __getitem__(self, indice):
+        """
+        Reconstrói a Regra de uma posição da tabela.
+        """
+        if indice < 0:
+            indice += len(self)
+        origem_len = self._origem_len[indice]
+        destino_len = self._destino_len[indice]
+        ipv6 = self._ipv6.get(indice)
+        if ipv6 is not None:
+            origem = int.from_bytes(ipv6[:16], 'big')
+            destino = int.from_bytes(ipv6[16:], 'big')
+        else:
+            origem = MAPEADO_IPV4 | self._origem[indice] if origem_len else 0
+            destino = MAPEADO_IPV4 | self._destino[indice] if destino_len > 0 else 0
+        if destino_len == PREFIXO_NOME:
+            destino = self._nomes[indice]
+        limite = self._limites.get(indice)
+        return Regra(indice, origem, origem_len, destino,
+                     destino_len, self._porta_ini[indice], self._porta_fim[indice],
+                     PROTOCOLO_POR_CODIGO[self._protocolo[indice]],
+                     DIRECAO_POR_CODIGO[self._direcao[indice]],
+                     ACAO_POR_CODIGO[self._acao[indice]],
+                     limite[:3] if limite is not None else None, self._extras.get(indice))
+
+    def __iter__(self):
+        for indice in range(len(self)):
+            yield self[indice]
+
+    def acao(self, indice):
+        """
+        Retorna a Acao da regra, sem reconstruir a regra inteira.
+        """
+        return ACAO_POR_CODIGO[self._acao[indice]]
+
+    def limite(self, indice):
+        """
+        Retorna (taxa, rajada, por_origem, identificador) de uma regra
+        LIMITADO, ou None.
+        """
+        return self._limites.get(indice)
+
+    def para_json(self):
+        """
+        Converte todas as regras de volta para o formato do regras.json.
+        """
+        return [regra.para_json() for regra in self]
+
+
+class IndiceRegras:
+    """
+    Classificador de pacotes por busca em espaço de tuplas.
+
+    As regras são agrupadas pela tupla (prefixo de origem, prefixo de
+    destino, campos especificados); cada grupo vira uma tabela hash. Uma
+    consulta faz uma busca hash por tupla, em ordem de prioridade mínima, e
+    para assim que nenhuma tupla restante pode ter regra mais prioritária.
+    O custo depende do número de tuplas distintas, não do número de regras.
+
+    As regras ficam em uma TabelaRegras; as tabelas hash guardam apenas o
+    índice da regra (ou a lista de índices, se várias têm a mesma chave).
+    """
+
+    def __init__(self, regras):
+        """
+        Constrói o índice a partir da lista de regras.
+
+        Args:
+            regras (list): Lista de regras no formato do regras.json
+
+        Lança:
+            ValueError: Se alguma regra for inválida
+        """
+        normalizadas = normalizar_regras(regras)
+        self.regras = TabelaRegras(normalizadas)
+        self.total = len(self.regras)
+
+        grupos = {}
+        for regra in normalizadas:
+            tupla = assinatura_tupla(regra)
+            chave = chave_tupla(tupla, regra.origem, regra.destino, regra.porta_ini,
+                                CODIGO_PROTOCOLO[regra.protocolo],
+                                CODIGO_DIRECAO[regra.direcao])
+            tabela = grupos.setdefault(tupla, {})
+            balde = tabela.get(chave)
+            if balde is None:
+                tabela[chave] = regra.prioridade
+            elif isinstance(balde, int):
+                tabela[chave] = [balde, regra.prioridade]
+            else:
+                balde.append(regra.prioridade)
+
+        # Cada tupla: (prioridade mínima, tupla, tabela); cada balde é um
+        # índice ou uma lista de índices em ordem de prioridade
+        self._tuplas = sorted(
+            ((min(balde if isinstance(balde, int) else balde[0] for balde in tabela.values()),
+              tupla, tabela)
+             for tupla, tabela in grupos.items()),
+            key=lambda item: item[0]
+        )
+
+    def _buscar(self, pacote):
+        """
+        Retorna o índice da regra mais prioritária que casa com o pacote
+        normalizado, ou None.
+        """
+        origem, destino, _, porta, protocolo, direcao = pacote
+        # Protocolo/direção desconhecidos viram 0, que só casa com QUALQUER
+        protocolo = CODIGO_PROTOCOLO.get(protocolo, 0)
+        direcao = CODIGO_DIRECAO.get(direcao, 0)
+        portas_ini = self.regras._porta_ini
+        portas_fim = self.regras._porta_fim
+
+        melhor = None
+        for prioridade_minima, tupla, tabela in self._tuplas:
+            if melhor is not None and prioridade_minima >= melhor:
+                break
+            chave = chave_tupla(tupla, origem, destino, porta, protocolo, direcao)
+            if chave is None:
+                continue
+            balde = tabela.get(chave)
+            if balde is None:
+                continue
+            for indice in ((balde,) if isinstance(balde, int) else balde):
+                if melhor is not None and indice >= melhor:
+                    break
+                if tupla[4] or (portas_ini[indice] <= porta <= portas_fim[indice]
+                                if porta is not None else
+                                portas_ini[indice] == PORTA_MINIMA
+                                and portas_fim[indice] == PORTA_MAXIMA):
+                    melhor = indice
+                    break
+        return melhor
+
+    def _buscar_contando(self, pacote):
+        """
+        Faz a mesma busca de _buscar contando as regras candidatas e as
+        tabelas de tuplas examinadas. Fica separada para que o caminho
+        normal de decisão não pague nada pela contagem.
+
+        Retorna:
+            tuple: (índice ou None, candidatos, tabelas)
+        """
+        origem, destino, _, porta, protocolo, direcao = pacote
+        protocolo = CODIGO_PROTOCOLO.get(protocolo, 0)
+        direcao = CODIGO_DIRECAO.get(direcao, 0)
+        portas_ini = self.regras._porta_ini
+        portas_fim = self.regras._porta_fim
+
+        melhor = None
+        candidatos = tabelas = 0
+        for prioridade_minima, tupla, tabela in self._tuplas:
+            if melhor is not None and prioridade_minima >= melhor:
+                break
+            chave = chave_tupla(tupla, origem, destino, porta, protocolo, direcao)
+            if chave is None:
+                continue
+            tabelas += 1
+            balde = tabela.get(chave)
+            if balde is None:
+                continue
+            for indice in ((balde,) if isinstance(balde, int) else balde):
+                if melhor is not None and indice >= melhor:
+                    break
+                candidatos += 1
+                if tupla[4] or (portas_ini[indice] <= porta <= portas_fim[indice]
+                                if porta is not None else
+                                portas_ini[indice] == PORTA_MINIMA
+                                and portas_fim[indice] == PORTA_MAXIMA):
+                    melhor = indice
+                    break
+        return melhor, candidatos, tabelas
+
+    def explicar(self, ip, porta=None, origem=None, protocolo=PROTOCOLO_PADRAO,
+                 direcao=DIRECAO_PADRAO):
+        """
+        Decide o pacote como decidir(), mas informa a regra que casou, o
+        motivo e quantas regras e tabelas foram examinadas. Não consome
+        fichas das regras LIMITADO (a decisão informada é a ação da regra).
+
+        Retorna:
+            dict: Ver explicar_decisao
+        """
+        indice, candidatos, tabelas = self._buscar_contando(
+            normalizar_pacote(ip, porta, origem, protocolo, direcao))
+        regra = self.regras[indice] if indice is not None else None
+        return explicar_decisao(regra, candidatos, tabelas, len(self._tuplas))
+
+    def buscar(self, pacote):
+        """
+        Retorna o índice da regra que casa com um Pacote já normalizado
+        (normalizar_pacote), ou None. Útil para decidir o mesmo pacote em
+        vários índices sem normalizá-lo de novo.
+        """
+        return self._buscar(pacote)
+
+    def classificar(self, ip, porta=None, origem=None, protocolo=PROTOCOLO_PADRAO,
+                    direcao=DIRECAO_PADRAO):
+        """
+        Retorna a regra mais prioritária que casa com o pacote.
+
+        Retorna:
+            Regra ou None se nenhuma regra casar
+        """
+        indice = self._buscar(normalizar_pacote(ip, porta, origem, protocolo, direcao))
+        return self.regras[indice] if indice is not None else None
+
+    def decidir(self, ip, porta=None, origem=None, protocolo=PROTOCOLO_PADRAO,
+                direcao=DIRECAO_PADRAO, baldes=None, agora=None):
+        """
+        Decide se um pacote é permitido, bloqueado ou limitado.
+
+        Args:
+            ip (str): Endereço IP (ou nome) de destino
+            porta (int): Porta de destino (None em ICMP)
+            origem (str, opcional): IP de origem
+            protocolo (str): "TCP", "UDP" ou "ICMP"
+            direcao (str): "ENTRADA" ou "SAIDA"
+            baldes (TabelaBaldes, opcional): Estado das regras LIMITADO
+            agora (float, opcional): Instante do pacote (padrão: relógio)
+
+        Retorna:
+            Acao: PERMITIDO, BLOQUEADO ou LIMITADO (compara igual à string)
+        """
+        pacote = normalizar_pacote(ip, porta, origem, protocolo, direcao)
+        indice = self._buscar(pacote)
+        if indice is None:
+            return ACAO_PADRAO
+        acao = self.regras.acao(indice)
+        if acao is Acao.LIMITADO:
+            return aplicar_limite(baldes, self.regras.limite(indice), pacote.origem, agora)
+        return acao
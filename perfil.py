@@ -0,0 +1,253 @@
+"""
+Perfil - Medição de tempo por etapa das requisições
+Registra trechos (spans) com o tempo de cada etapa de uma requisição,
+opcionalmente com cProfile, e guarda em memória os N rastros mais lentos.
+Quando não há rastro ativo, trecho() devolve um contexto vazio e o custo
+no caminho normal é apenas uma leitura de ContextVar.
+"""
+
+import contextvars
+import cProfile
+import heapq
+import itertools
+import marshal
+import pstats
+import random
+import threading
+import time
+
+# Rastro da requisição em andamento (por thread/contexto)
+_rastro_atual = contextvars.ContextVar('rastro_atual', default=None)
+
+
+class _TrechoNulo:
+    """
+    Contexto que não faz nada, usado quando não há rastro ativo.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+_TRECHO_NULO = _TrechoNulo()
+
+
+class _Trecho:
+    """
+    Mede o tempo de uma etapa dentro de um rastro.
+    """
+
+    __slots__ = ('_rastro', '_nome', '_inicio')
+
+    def __init__(self, rastro, nome):
+        self._rastro = rastro
+        self._nome = nome
+
+    def __enter__(self):
+        self._rastro._pilha.append(self._nome)
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        duracao = time.perf_counter() - self._inicio
+        pilha = self._rastro._pilha
+        self._rastro.trechos.append((tuple(pilha), duracao))
+        pilha.pop()
+        return False
+
+
+def trecho(nome):
+    """
+    Mede uma etapa da requisição atual, se ela estiver sendo perfilada.
+
+    Uso:
+        with trecho('verificar_porta'):
+            conectividade = verificar_porta(ip, porta)
+
+    Args:
+        nome (str): Nome da etapa
+
+    Retorna:
+        Gerenciador de contexto
+    """
+    rastro = _rastro_atual.get()
+    if rastro is None:
+        return _TRECHO_NULO
+    return _Trecho(rastro, nome)
+
+
+class Rastro:
+    """
+    Tempos de uma requisição perfilada.
+    """
+
+    def __init__(self, identificador, rota, metodo, usar_cprofile):
+        self.id = identificador
+        self.rota = rota
+        self.metodo = metodo
+        self.inicio = time.time()
+        self.duracao = None
+        self.trechos = []
+        self.estatisticas = None
+        self._pilha = ['requisicao']
+        self._inicio = time.perf_counter()
+        self._token = None
+        self._perfilador_c = None
+
+        if usar_cprofile:
+            perfilador_c = cProfile.Profile()
+            try:
+                perfilador_c.enable()
+                self._perfilador_c = perfilador_c
+            except ValueError:
+                # Outro perfilador já está ativo (Python 3.12+ só permite um)
+                pass
+
+    def resumo(self):
+        """
+        Retorna os dados principais do rastro, sem os trechos.
+        """
+        return {
+            'id': self.id,
+            'rota': self.rota,
+            'metodo': self.metodo,
+            'inicio': time.strftime('%d/%m/%Y %H:%M:%S', time.localtime(self.inicio)),
+            'duracao_ms': round(self.duracao * 1000, 3) if self.duracao is not None else None,
+            'tem_cprofile': self.estatisticas is not None
+        }
+
+    def detalhes(self):
+        """
+        Retorna o resumo junto com o tempo de cada trecho.
+        """
+        dados = self.resumo()
+        dados['trechos'] = [
+            {'caminho': ';'.join(caminho), 'duracao_ms': round(duracao * 1000, 3)}
+            for caminho, duracao in self.trechos
+        ]
+        return dados
+
+    def pilhas_colapsadas(self):
+        """
+        Converte os trechos em pilhas no formato "colapsado" do flamegraph
+        ("a;b;c valor"), com o tempo próprio de cada trecho em microssegundos.
+
+        Retorna:
+            str: Uma pilha por linha
+        """
+        proprio = {}
+        for caminho, duracao in self.trechos:
+            proprio[caminho] = proprio.get(caminho, 0) + duracao
+            if len(caminho) > 1:
+                pai = caminho[:-1]
+                proprio[pai] = proprio.get(pai, 0) - duracao
+        return ''.join(
+            f"{';'.join(caminho)} {max(0, round(tempo * 1e6))}\n"
+            for caminho, tempo in proprio.items()
+        )
+
+    def cprofile_serializado(self):
+        """
+        Retorna as estatísticas do cProfile no formato de arquivo .prof
+        (o mesmo de pstats.Stats.dump_stats), ou None se não houver.
+        """
+        if self.estatisticas is None:
+            return None
+        return marshal.dumps(self.estatisticas.stats)
+
+    def _finalizar(self):
+        """
+        Encerra as medições do rastro.
+        """
+        if self._perfilador_c is not None:
+            self._perfilador_c.disable()
+            self.estatisticas = pstats.Stats(self._perfilador_c)
+            self._perfilador_c = None
+        self.duracao = time.perf_counter() - self._inicio
+        self.trechos.append((('requisicao',), self.duracao))
+
+
+class Perfilador:
+    """
+    Decide quais requisições perfilar e guarda os rastros mais lentos.
+    """
+
+    def __init__(self, max_rastros=20, amostragem=0.0, usar_cprofile=True):
+        """
+        Args:
+            max_rastros (int): Quantidade de rastros mais lentos mantidos
+            amostragem (float): Fração das requisições perfiladas (0 a 1)
+            usar_cprofile (bool): Ativa o cProfile nas requisições perfiladas
+        """
+        self.max_rastros = max_rastros
+        self.amostragem = amostragem
+        self.usar_cprofile = usar_cprofile
+        self._mais_lentos = []
+        self._ids = itertools.count(1)
+        self._trava = threading.Lock()
+
+    def iniciar(self, rota, metodo, forcar=False):
+        """
+        Começa um rastro para a requisição, se ela for sorteada (ou forçada).
+
+        Args:
+            rota (str): Caminho da requisição
+            metodo (str): Método HTTP
+            forcar (bool): Perfila independentemente da amostragem
+
+        Retorna:
+            Rastro ou None
+        """
+        if not forcar and (self.amostragem <= 0 or random.random() >= self.amostragem):
+            return None
+        rastro = Rastro(next(self._ids), rota, metodo, self.usar_cprofile)
+        rastro._token = _rastro_atual.set(rastro)
+        return rastro
+
+    def finalizar(self, rastro):
+        """
+        Encerra o rastro e o guarda se estiver entre os N mais lentos.
+        """
+        rastro._finalizar()
+        if rastro._token is not None:
+            try:
+                _rastro_atual.reset(rastro._token)
+            except ValueError:
+                # Finalizado em outro contexto: apenas limpa o atual
+                _rastro_atual.set(None)
+            rastro._token = None
+
+        with self._trava:
+            item = (rastro.duracao, rastro.id, rastro)
+            if len(self._mais_lentos) < self.max_rastros:
+                heapq.heappush(self._mais_lentos, item)
+            elif item > self._mais_lentos[0]:
+                heapq.heapreplace(self._mais_lentos, item)
+
+    def listar(self):
+        """
+        Retorna os rastros guardados, do mais lento para o mais rápido.
+        """
+        with self._trava:
+            itens = sorted(self._mais_lentos, reverse=True)
+        return [rastro for _, _, rastro in itens]
+
+    def obter(self, identificador):
+        """
+        Retorna o rastro com o id informado, ou None.
+        """
+        with self._trava:
+            for _, _, rastro in self._mais_lentos:
+                if rastro.id == identificador:
+                    return rastro
+        return None
+
+    def limpar(self):
+        """
+        Descarta todos os rastros guardados.
+        """
+        with self._trava:
+            self._mais_lentos = []
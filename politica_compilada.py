@@ -0,0 +1,493 @@
+"""
+Política Compilada - Formato binário das regras para inicialização rápida
+Converte o regras.json em um arquivo binário versionado que já contém as
+tabelas de busca do classificador (uma tabela hash por tupla, como no
+IndiceRegras). O arquivo é mapeado em memória (mmap) e consultado
+diretamente, sem criar um objeto Python por regra.
+
+Layout do arquivo (little-endian):
+    cabeçalho  - mágico, versão, mtime/tamanho do JSON de origem,
+                 número de regras e número de tuplas
+    tuplas     - diretório: campos da tupla, prioridade mínima, slots
+    regras     - um registro por regra, na ordem do JSON; regras do mesmo
+                 balde hash são encadeadas em ordem de prioridade
+    slots      - tabelas hash das tuplas (endereçamento aberto, sondagem
+                 linear), apontando para a primeira regra do balde
+    strings    - nomes de host usados como destino, em UTF-8
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+
+from motor_regras import (
+    ACAO_PADRAO,
+    ACAO_POR_CODIGO,
+    CODIGO_ACAO,
+    DIRECAO_POR_CODIGO,
+    PROTOCOLO_POR_CODIGO,
+    Acao,
+    Regra,
+    CODIGO_DIRECAO,
+    CODIGO_PROTOCOLO,
+    PORTA_MAXIMA,
+    PORTA_MINIMA,
+    PREFIXO_NOME,
+    PROTOCOLO_PADRAO,
+    DIRECAO_PADRAO,
+    IndiceRegras,
+    aplicar_limite,
+    assinatura_tupla,
+    chave_tupla,
+    explicar_decisao,
+    identificador_limite,
+    normalizar_pacote,
+    normalizar_regras
+)
+
+# Identificação do formato
+MAGICO = b'FWPC'
+VERSAO_FORMATO = 5
+
+# magico, versao, reservado, mtime_ns da origem, tamanho da origem, regras, tuplas
+_CABECALHO = struct.Struct('<4sHHqqII')
+
+# origem_len, destino_len, usa_protocolo, usa_direcao, porta_exata,
+# prioridade mínima, quantidade de slots, deslocamento dos slots
+_TUPLA = struct.Struct('<BhBBBxxIII')
+
+# prioridade, próxima regra do balde (índice + 1, 0 = fim), origem, destino
+# (128 bits, IPv4 como IPv6 mapeado), deslocamento do nome, tamanho do nome,
+# porta_ini, porta_fim, origem_len, destino_len, protocolo, direcao, acao,
+# por_origem, taxa, rajada (os três últimos só na ação LIMITADO)
+_REGRA = struct.Struct('<II16s16sIHHHBhBBBBdd')
+
+# hash da chave, primeira regra do balde (índice + 1, 0 = slot vazio)
+_SLOT = struct.Struct('<II')
+
+# Chave hash: inteiro de 276 bits de motor_regras.chave_tupla (+ nome do host)
+_TAMANHO_CHAVE = 35
+
+
+def _chave_bytes(chave):
+    """
+    Serializa uma chave de tupla (ver motor_regras.chave_tupla) em bytes.
+    """
+    if isinstance(chave, tuple):
+        nome, chave = chave
+        return chave.to_bytes(_TAMANHO_CHAVE, 'little') + nome.encode('utf-8')
+    return chave.to_bytes(_TAMANHO_CHAVE, 'little')
+
+
+def _quantidade_slots(total):
+    """
+    Retorna a menor potência de 2 que mantém a ocupação da tabela em até 50%.
+    """
+    slots = 8
+    while slots < total * 2:
+        slots *= 2
+    return slots
+
+
+def compilar_regras(arquivo_json, arquivo_saida):
+    """
+    Compila as regras de um arquivo JSON para o formato binário.
+
+    A escrita é feita em um arquivo temporário e publicada com os.replace,
+    então leitores nunca enxergam um arquivo pela metade.
+
+    Args:
+        arquivo_json (str): Caminho do regras.json de origem
+        arquivo_saida (str): Caminho do arquivo binário a gerar
+
+    Retorna:
+        int: Quantidade de regras compiladas
+
+    Lança:
+        OSError: Se o arquivo de origem não puder ser lido
+        ValueError: Se o JSON for inválido ou uma regra estiver incompleta
+    """
+    # O stat vem antes da leitura: se o JSON mudar durante a compilação,
+    # o binário já nasce desatualizado e será ignorado no carregamento
+    origem = os.stat(arquivo_json)
+    with open(arquivo_json, 'r', encoding='utf-8') as f:
+        regras = json.load(f)
+    if not isinstance(regras, list):
+        raise ValueError(f"O arquivo '{arquivo_json}' deve conter uma lista de regras")
+    regras = normalizar_regras(regras)
+
+    # Agrupa por tupla e por chave, como o IndiceRegras
+    grupos = {}
+    for regra in regras:
+        tupla = assinatura_tupla(regra)
+        chave = chave_tupla(tupla, regra.origem, regra.destino, regra.porta_ini,
+                            CODIGO_PROTOCOLO[regra.protocolo], CODIGO_DIRECAO[regra.direcao])
+        grupos.setdefault(tupla, {}).setdefault(chave, []).append(regra.prioridade)
+
+    # Encadeia as regras de cada balde em ordem de prioridade
+    proxima = [0] * len(regras)
+    for tabela in grupos.values():
+        for balde in tabela.values():
+            for atual, seguinte in zip(balde, balde[1:]):
+                proxima[atual] = seguinte + 1
+
+    strings = bytearray()
+    registros = bytearray()
+    for regra in regras:
+        if regra.destino_len == PREFIXO_NOME:
+            nome = regra.destino.encode('utf-8')
+            deslocamento, destino = len(strings), 0
+            strings += nome
+        else:
+            nome, deslocamento, destino = b'', 0, regra.destino
+        taxa, rajada, por_origem = regra.limite or (0.0, 0.0, False)
+        registros += _REGRA.pack(
+            regra.prioridade, proxima[regra.prioridade], regra.origem.to_bytes(16, 'little'),
+            destino.to_bytes(16, 'little'),
+            deslocamento, len(nome), regra.porta_ini, regra.porta_fim,
+            regra.origem_len, regra.destino_len,
+            CODIGO_PROTOCOLO[regra.protocolo], CODIGO_DIRECAO[regra.direcao],
+            CODIGO_ACAO[regra.acao], por_origem, taxa, rajada)
+
+    tuplas = sorted(((min(b[0] for b in tabela.values()), tupla, tabela)
+                     for tupla, tabela in grupos.items()), key=lambda item: item[0])
+    inicio_slots = _CABECALHO.size + len(tuplas) * _TUPLA.size + len(registros)
+
+    diretorio = bytearray()
+    slots = bytearray()
+    for prioridade_minima, tupla, tabela in tuplas:
+        n_slots = _quantidade_slots(len(tabela))
+        mascara = n_slots - 1
+        tabela_slots = bytearray(n_slots * _SLOT.size)
+        for chave, balde in tabela.items():
+            h = zlib.crc32(_chave_bytes(chave))
+            i = h & mascara
+            # Sondagem linear até achar um slot vazio
+            while _SLOT.unpack_from(tabela_slots, i * _SLOT.size)[1] != 0:
+                i = (i + 1) & mascara
+            _SLOT.pack_into(tabela_slots, i * _SLOT.size, h, balde[0] + 1)
+        diretorio += _TUPLA.pack(*tupla, prioridade_minima, n_slots,
+                                 inicio_slots + len(slots))
+        slots += tabela_slots
+
+    cabecalho = _CABECALHO.pack(MAGICO, VERSAO_FORMATO, 0, origem.st_mtime_ns,
+                                origem.st_size, len(regras), len(tuplas))
+
+    temporario = f"{arquivo_saida}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(cabecalho)
+        f.write(diretorio)
+        f.write(registros)
+        f.write(slots)
+        f.write(strings)
+    os.replace(temporario, arquivo_saida)
+
+    return len(regras)
+
+
+class PoliticaCompilada:
+    """
+    Política carregada de um arquivo binário via mmap.
+
+    As consultas leem as tabelas diretamente da memória mapeada; no
+    carregamento só o diretório de tuplas (poucas entradas) é decodificado.
+    """
+
+    def __init__(self, caminho):
+        """
+        Abre e valida um arquivo de política compilada.
+
+        Args:
+            caminho (str): Caminho do arquivo binário
+
+        Lança:
+            OSError: Se o arquivo não puder ser aberto
+            ValueError: Se o arquivo não estiver no formato esperado
+        """
+        with open(caminho, 'rb') as f:
+            try:
+                self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"Arquivo compilado vazio: {caminho}")
+
+        if len(self._mapa) < _CABECALHO.size:
+            self.fechar()
+            raise ValueError(f"Arquivo compilado truncado: {caminho}")
+
+        magico, versao, _, mtime_ns, tamanho, total, n_tuplas = \
+            _CABECALHO.unpack_from(self._mapa, 0)
+        if magico != MAGICO or versao != VERSAO_FORMATO:
+            self.fechar()
+            raise ValueError(f"Formato de política desconhecido: {caminho}")
+
+        self.total = total
+        self.origem = (mtime_ns, tamanho)
+        self._limites = {}
+        self._inicio_regras = _CABECALHO.size + n_tuplas * _TUPLA.size
+        inicio_slots = self._inicio_regras + total * _REGRA.size
+
+        self._tuplas = []
+        fim_slots = inicio_slots
+        for i in range(n_tuplas):
+            *tupla, prioridade_minima, n_slots, deslocamento = \
+                _TUPLA.unpack_from(self._mapa, _CABECALHO.size + i * _TUPLA.size)
+            tupla = (tupla[0], tupla[1], bool(tupla[2]), bool(tupla[3]), bool(tupla[4]))
+            self._tuplas.append((prioridade_minima, tupla, n_slots, deslocamento))
+            fim_slots = max(fim_slots, deslocamento + n_slots * _SLOT.size)
+        self._inicio_strings = fim_slots
+
+    def atualizada_para(self, arquivo_json):
+        """
+        Verifica se o binário corresponde à versão atual do JSON de origem.
+
+        Args:
+            arquivo_json (str): Caminho do regras.json
+
+        Retorna:
+            bool: True se o JSON não mudou desde a compilação
+        """
+        try:
+            origem = os.stat(arquivo_json)
+        except OSError:
+            return False
+        return (origem.st_mtime_ns, origem.st_size) == self.origem
+
+    def _regra(self, indice):
+        """
+        Lê o registro de uma regra (índice = prioridade).
+        """
+        return _REGRA.unpack_from(self._mapa, self._inicio_regras + indice * _REGRA.size)
+
+    def _chave_regra(self, tupla, registro):
+        """
+        Reconstrói os bytes da chave de uma regra a partir do seu registro.
+        """
+        _, _, origem, destino, deslocamento, tamanho, porta_ini, _, _, destino_len, \
+            protocolo, direcao = registro[:12]
+        destino = (self._nome(deslocamento, tamanho) if destino_len == PREFIXO_NOME
+                   else int.from_bytes(destino, 'little'))
+        chave = chave_tupla(tupla, int.from_bytes(origem, 'little'), destino, porta_ini,
+                            protocolo, direcao)
+        return _chave_bytes(chave)
+
+    def _nome(self, deslocamento, tamanho):
+        """
+        Lê um nome de host da área de strings.
+        """
+        inicio = self._inicio_strings + deslocamento
+        return self._mapa[inicio:inicio + tamanho].decode('utf-8')
+
+    def _regra_completa(self, registro):
+        """
+        Reconstrói a Regra de um registro (os campos extras, como a
+        descrição, não são compilados).
+        """
+        prioridade, _, origem, destino, deslocamento, tamanho, porta_ini, porta_fim, \
+            origem_len, destino_len, protocolo, direcao, acao, por_origem, taxa, rajada = registro
+        destino = (self._nome(deslocamento, tamanho) if destino_len == PREFIXO_NOME
+                   else int.from_bytes(destino, 'little'))
+        origem = int.from_bytes(origem, 'little')
+        acao = ACAO_POR_CODIGO[acao]
+        limite = (taxa, rajada, bool(por_origem)) if acao is Acao.LIMITADO else None
+        return Regra(prioridade, origem, origem_len, destino, destino_len, porta_ini,
+                     porta_fim, PROTOCOLO_POR_CODIGO[protocolo], DIRECAO_POR_CODIGO[direcao],
+                     acao, limite, None)
+
+    def _limite(self, registro):
+        """
+        Retorna (taxa, rajada, por_origem, identificador) de uma regra
+        LIMITADO, com o mesmo identificador calculado pelo TabelaRegras.
+        """
+        prioridade = registro[0]
+        limite = self._limites.get(prioridade)
+        if limite is None:
+            regra = self._regra_completa(registro)
+            limite = (*regra.limite, identificador_limite(regra))
+            self._limites[prioridade] = limite
+        return limite
+
+    def decidir(self, ip, porta=None, origem=None, protocolo=PROTOCOLO_PADRAO,
+                direcao=DIRECAO_PADRAO, baldes=None, agora=None):
+        """
+        Decide se um pacote é permitido, bloqueado ou limitado (mesma
+        semântica do IndiceRegras.decidir).
+
+        Retorna:
+            Acao: PERMITIDO, BLOQUEADO ou LIMITADO
+        """
+        origem, destino, _, porta, protocolo, direcao = normalizar_pacote(
+            ip, porta, origem, protocolo, direcao)
+        protocolo = CODIGO_PROTOCOLO.get(protocolo, 0)
+        direcao = CODIGO_DIRECAO.get(direcao, 0)
+
+        melhor = None
+        for prioridade_minima, tupla, n_slots, deslocamento in self._tuplas:
+            if melhor is not None and prioridade_minima >= melhor[0]:
+                break
+            chave = chave_tupla(tupla, origem, destino, porta, protocolo, direcao)
+            if chave is None:
+                continue
+            chave = _chave_bytes(chave)
+            h = zlib.crc32(chave)
+            mascara = n_slots - 1
+            i = h & mascara
+
+            # Procura o balde da chave na tabela da tupla
+            while True:
+                h_slot, primeira = _SLOT.unpack_from(self._mapa, deslocamento + i * _SLOT.size)
+                if primeira == 0:
+                    break
+                if h_slot == h:
+                    registro = self._regra(primeira - 1)
+                    if self._chave_regra(tupla, registro) == chave:
+                        break
+                i = (i + 1) & mascara
+            if primeira == 0:
+                continue
+
+            # Percorre o balde em ordem de prioridade
+            while True:
+                prioridade, proxima = registro[0], registro[1]
+                if melhor is not None and prioridade >= melhor[0]:
+                    break
+                porta_ini, porta_fim = registro[6], registro[7]
+                if tupla[4] or (porta_ini <= porta <= porta_fim if porta is not None
+                                else porta_ini == PORTA_MINIMA and porta_fim == PORTA_MAXIMA):
+                    melhor = (prioridade, registro)
+                    break
+                if proxima == 0:
+                    break
+                registro = self._regra(proxima - 1)
+
+        if melhor is None:
+            return ACAO_PADRAO
+        acao = ACAO_POR_CODIGO[melhor[1][12]]
+        if acao is Acao.LIMITADO:
+            return aplicar_limite(baldes, self._limite(melhor[1]), origem, agora)
+        return acao
+
+    def _buscar_contando(self, pacote):
+        """
+        Faz a mesma busca de decidir() contando as regras candidatas e as
+        tabelas de tuplas examinadas (decidir mantém o laço sem contagem).
+
+        Retorna:
+            tuple: (registro ou None, candidatos, tabelas)
+        """
+        origem, destino, _, porta, protocolo, direcao = pacote
+        protocolo = CODIGO_PROTOCOLO.get(protocolo, 0)
+        direcao = CODIGO_DIRECAO.get(direcao, 0)
+
+        melhor = None
+        candidatos = tabelas = 0
+        for prioridade_minima, tupla, n_slots, deslocamento in self._tuplas:
+            if melhor is not None and prioridade_minima >= melhor[0]:
+                break
+            chave = chave_tupla(tupla, origem, destino, porta, protocolo, direcao)
+            if chave is None:
+                continue
+            tabelas += 1
+            chave = _chave_bytes(chave)
+            h = zlib.crc32(chave)
+            mascara = n_slots - 1
+            i = h & mascara
+
+            while True:
+                h_slot, primeira = _SLOT.unpack_from(self._mapa, deslocamento + i * _SLOT.size)
+                if primeira == 0:
+                    break
+                if h_slot == h:
+                    registro = self._regra(primeira - 1)
+                    if self._chave_regra(tupla, registro) == chave:
+                        break
+                i = (i + 1) & mascara
+            if primeira == 0:
+                continue
+
+            while True:
+                prioridade, proxima = registro[0], registro[1]
+                if melhor is not None and prioridade >= melhor[0]:
+                    break
+                candidatos += 1
+                porta_ini, porta_fim = registro[6], registro[7]
+                if tupla[4] or (porta_ini <= porta <= porta_fim if porta is not None
+                                else porta_ini == PORTA_MINIMA and porta_fim == PORTA_MAXIMA):
+                    melhor = (prioridade, registro)
+                    break
+                if proxima == 0:
+                    break
+                registro = self._regra(proxima - 1)
+
+        return (melhor[1] if melhor is not None else None), candidatos, tabelas
+
+    def explicar(self, ip, porta=None, origem=None, protocolo=PROTOCOLO_PADRAO,
+                 direcao=DIRECAO_PADRAO):
+        """
+        Decide o pacote como decidir(), mas informa a regra que casou, o
+        motivo e quantas regras e tabelas foram examinadas (mesma saída do
+        IndiceRegras.explicar).
+
+        Retorna:
+            dict: Ver explicar_decisao
+        """
+        registro, candidatos, tabelas = self._buscar_contando(
+            normalizar_pacote(ip, porta, origem, protocolo, direcao))
+        regra = self._regra_completa(registro) if registro is not None else None
+        return explicar_decisao(regra, candidatos, tabelas, len(self._tuplas))
+
+    def fechar(self):
+        """
+        Libera o mapeamento de memória.
+        """
+        self._mapa.close()
+
+
+def abrir_compilada(arquivo_compilado):
+    """
+    Abre um binário compilado, sem lançar erro se ele faltar ou for inválido.
+
+    Args:
+        arquivo_compilado (str): Caminho do binário gerado por compilar_regras
+
+    Retorna:
+        PoliticaCompilada ou None
+    """
+    try:
+        return PoliticaCompilada(arquivo_compilado)
+    except (OSError, ValueError):
+        return None
+
+
+def carregar_politica(arquivo_json, arquivo_compilado):
+    """
+    Carrega a política de decisão, preferindo o binário compilado.
+
+    Se o binário não existir, estiver corrompido ou for mais antigo que o
+    JSON, as regras são lidas do JSON e indexadas em memória.
+
+    Args:
+        arquivo_json (str): Caminho do regras.json
+        arquivo_compilado (str): Caminho do binário gerado por compilar_regras
+
+    Retorna:
+        PoliticaCompilada ou IndiceRegras: Objeto com o método decidir()
+
+    Lança:
+        ValueError: Se o JSON não for uma lista ou tiver alguma regra inválida
+    """
+    politica = abrir_compilada(arquivo_compilado)
+    if politica is not None:
+        if politica.atualizada_para(arquivo_json):
+            return politica
+        politica.fechar()
+
+    try:
+        with open(arquivo_json, 'r', encoding='utf-8') as f:
+            regras = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        regras = []
+    if not isinstance(regras, list):
+        raise ValueError(f"O arquivo '{arquivo_json}' deve conter uma lista de regras")
+    return IndiceRegras(regras)
@@ -96,14 +96,21 @@ function adicionarTesteAoHistorico(teste) {
         conectividadeHTML = '<span class="icon">✗</span> Porta FECHADA';
     }
     
-    const decisaoClass = teste.decisao === 'PERMITIDO' ? 'permitido' : 'bloqueado';
-    const decisaoHTML = teste.decisao === 'PERMITIDO'
-        ? '<span class="icon">✅</span> PERMITIDO'
-        : '<span class="icon">❌</span> BLOQUEADO';
+    let decisaoClass, decisaoHTML;
+    if (teste.decisao === 'PERMITIDO') {
+        decisaoClass = 'permitido';
+        decisaoHTML = '<span class="icon">✅</span> PERMITIDO';
+    } else if (teste.decisao === 'LIMITADO') {
+        decisaoClass = 'limitado';
+        decisaoHTML = '<span class="icon">⏱️</span> LIMITADO';
+    } else {
+        decisaoClass = 'bloqueado';
+        decisaoHTML = '<span class="icon">❌</span> BLOQUEADO';
+    }
     
     testeCard.innerHTML = `
         <div class="teste-header">
-            <span class="teste-ip">${teste.ip}:${teste.porta}</span>
+            <span class="teste-ip">${teste.ip}${teste.porta ? ':' + teste.porta : ''}</span>
             <span class="teste-servico">${teste.servico}</span>
             <span class="teste-timestamp">${teste.timestamp}</span>
         </div>
@@ -6,7 +6,23 @@ Testa todas as funções principais do sistema de filtragem de pacotes.
 import unittest
 import json
 import os
-from app import (
+import contextlib
+import errno
+import gzip
+import io
+import ipaddress
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+import firewall
+import firewall_web
+from firewall_web import (
     carregar_regras,
     salvar_regras,
     verificar_porta,
@@ -14,6 +30,30 @@ from app import (
     obter_descricao_servico,
     calcular_estatisticas
 )
+import random
+from motor_regras import (
+    Acao,
+    IndiceRegras,
+    Pacote,
+    TabelaRegras,
+    filtrar_referencia,
+    normalizar_pacote,
+    normalizar_regra,
+    regra_casa
+)
+from politica_compilada import (
+    PoliticaCompilada,
+    carregar_politica,
+    compilar_regras
+)
+from varredura import (
+    TempoLimiteAdaptativo, expandir_hosts, expandir_portas, varrer
+)
+from carga import GeradorPacotes, percentil
+from perfil import Perfilador, trecho
+from limitacao import TabelaBaldes
+from impacto import comparar_politicas
+from auditoria import AMOSTRAR, BLOQUEAR, RegistroAuditoria
 
 
 class TestCarregarRegras(unittest.TestCase):
@@ -116,40 +156,155 @@ class TestSalvarRegras(unittest.TestCase):
         self.assertEqual(regras_carregadas[1]['porta'], 22)
 
 
+class SocketFalso:
+    """
+    Socket TCP simulado: o resultado do connect_ex vem da RedeFalsa.
+    """
+    
+    def __init__(self, rede, familia=socket.AF_INET, tipo=socket.SOCK_STREAM, *args, **kwargs):
+        self.rede = rede
+        self.familia = familia
+        self.timeout = None
+        self.fechado = False
+        rede.sockets.append(self)
+    
+    def settimeout(self, timeout):
+        self.timeout = timeout
+    
+    def connect_ex(self, endereco):
+        self.rede.conexoes.append(endereco)
+        estado = self.rede.hosts.get(endereco[:2], RedeFalsa.SEM_RESPOSTA)
+        return {RedeFalsa.ABERTA: 0,
+                RedeFalsa.FECHADA: errno.ECONNREFUSED,
+                RedeFalsa.SEM_RESPOSTA: errno.EAGAIN}[estado]
+    
+    def close(self):
+        self.fechado = True
+
+
+class RedeFalsa:
+    """
+    Substitui socket.socket e socket.getaddrinfo enquanto estiver ativa,
+    para testar a conectividade sem rede e sem esperar timeouts.
+    IPs (v4 ou v6) resolvem para si mesmos e nomes, pela tabela de nomes;
+    endereços sem estado cadastrado se comportam como hosts que não respondem.
+    """
+    
+    ABERTA = 'ABERTA'
+    FECHADA = 'FECHADA'
+    SEM_RESPOSTA = 'SEM_RESPOSTA'
+    
+    def __init__(self, hosts=None, nomes=None):
+        """
+        Args:
+            hosts (dict): {(ip, porta): estado}
+            nomes (dict): {nome: [ip, ...]} na ordem devolvida pelo DNS
+        """
+        self.hosts = dict(hosts or {})
+        self.nomes = dict(nomes or {})
+        self.sockets = []
+        self.conexoes = []
+        self._patches = [
+            mock.patch('socket.socket', lambda *args, **kwargs: SocketFalso(self, *args, **kwargs)),
+            mock.patch('socket.getaddrinfo', self.getaddrinfo)
+        ]
+    
+    def getaddrinfo(self, host, porta, *args, **kwargs):
+        enderecos = self.nomes.get(host, [host])
+        resultado = []
+        for endereco in enderecos:
+            if ':' in endereco:
+                socket.inet_pton(socket.AF_INET6, endereco)
+                resultado.append((socket.AF_INET6, socket.SOCK_STREAM, 6, '', (endereco, porta, 0, 0)))
+                continue
+            try:
+                socket.inet_aton(endereco)
+            except OSError:
+                raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+            resultado.append((socket.AF_INET, socket.SOCK_STREAM, 6, '', (endereco, porta)))
+        return resultado
+    
+    def __enter__(self):
+        for patch in self._patches:
+            patch.start()
+        return self
+    
+    def __exit__(self, *excecao):
+        for patch in reversed(self._patches):
+            patch.stop()
+
+
 class TestVerificarPorta(unittest.TestCase):
     """
-    Testes para a função de verificação de conectividade de porta.
+    Testes para a função de verificação de conectividade de porta
+    (na rede simulada, sem acesso à rede real).
     """
     
-    def test_verificar_porta_localhost_80(self):
+    def setUp(self):
         """
-        Testa conexão com localhost na porta 80.
-        Pode retornar False (porta fechada) ou None (erro DNS).
+        Prepara uma rede com portas abertas e fechadas em IPv4 e IPv6 e um
+        nome com as duas famílias.
         """
-        resultado = verificar_porta('127.0.0.1', 80, timeout=1)
-        
-        # Resultado deve ser bool ou None
-        self.assertIn(type(resultado), [bool, type(None)])
+        self.rede = RedeFalsa({
+            ('192.168.1.1', 80): RedeFalsa.ABERTA,
+            ('192.168.1.1', 22): RedeFalsa.FECHADA,
+            ('2001:db8::1', 443): RedeFalsa.ABERTA
+        }, nomes={'duplo.local': ['2001:db8::1', '192.168.1.1']})
     
-    def test_verificar_porta_google_dns(self):
+    def test_verificar_porta_aberta(self):
         """
-        Testa conexão com Google DNS (8.8.8.8:53).
-        Este é um servidor público e geralmente responde.
+        Testa se uma porta que aceita a conexão retorna True.
         """
-        resultado = verificar_porta('8.8.8.8', 53, timeout=2)
-        
-        # Pode ser True (aberta), False (fechada) ou None (erro DNS)
-        self.assertIn(type(resultado), [bool, type(None)])
+        with self.rede:
+            self.assertIs(verificar_porta('192.168.1.1', 80, timeout=1), True)
+        self.assertEqual(self.rede.conexoes, [('192.168.1.1', 80)])
+        self.assertTrue(self.rede.sockets[0].fechado)
+    
+    def test_verificar_porta_fechada(self):
+        """
+        Testa se uma conexão recusada retorna False.
+        """
+        with self.rede:
+            self.assertIs(verificar_porta('192.168.1.1', 22, timeout=1), False)
     
     def test_verificar_porta_timeout(self):
         """
-        Testa se a função respeita o timeout.
-        Usa um IP que não responde (10.255.255.1).
+        Testa se o timeout é repassado ao socket e um host mudo retorna False.
         """
-        resultado = verificar_porta('10.255.255.1', 80, timeout=1)
+        with self.rede:
+            resultado = verificar_porta('10.255.255.1', 80, timeout=3)
         
-        # Deve retornar False (timeout) ou None
-        self.assertIn(resultado, [False, None])
+        self.assertIs(resultado, False)
+        self.assertEqual(self.rede.sockets[0].timeout, 3)
+    
+    def test_verificar_porta_host_desconhecido(self):
+        """
+        Testa se um erro de DNS retorna None.
+        """
+        with self.rede:
+            self.assertIsNone(verificar_porta('host.invalido', 80, timeout=1))
+    
+    def test_verificar_porta_ipv6_e_pilha_dupla(self):
+        """
+        Testa um IPv6 literal e um nome com IPv6 e IPv4: o endereço IPv6 que
+        não responde não impede a conexão pelo IPv4.
+        """
+        with self.rede:
+            self.assertIs(verificar_porta('2001:db8::1', 443, timeout=1), True)
+            self.assertEqual(self.rede.sockets[-1].familia, socket.AF_INET6)
+            
+            self.assertIs(verificar_porta('duplo.local', 80, timeout=1), True)
+        self.assertEqual(self.rede.conexoes[-2:], [('2001:db8::1', 80, 0, 0), ('192.168.1.1', 80)])
+        self.assertTrue(all(s.fechado for s in self.rede.sockets))
+    
+    def test_verificar_porta_terminal(self):
+        """
+        Testa se a versão do terminal responde igual à da interface web.
+        """
+        with self.rede:
+            for endereco in (('192.168.1.1', 80), ('192.168.1.1', 22), ('10.255.255.1', 80),
+                             ('host.invalido', 80), ('duplo.local', 80)):
+                self.assertIs(firewall.verificar_porta(*endereco), verificar_porta(*endereco))
 
 
 class TestFiltrarPacote(unittest.TestCase):
@@ -310,6 +465,1569 @@ class TestCalcularEstatisticas(unittest.TestCase):
         self.assertEqual(stats['bloqueados'], 0)
 
 
+class TestPoliticaCompilada(unittest.TestCase):
+    """
+    Testes para o formato binário de regras compiladas.
+    """
+    
+    def setUp(self):
+        """
+        Cria um diretório temporário com um regras.json de teste.
+        """
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.arquivo_json = os.path.join(self.diretorio.name, 'regras.json')
+        self.arquivo_bin = os.path.join(self.diretorio.name, 'regras.fwc')
+        self.regras_teste = [
+            {"ip": "192.168.1.1", "porta": 80, "acao": "PERMITIDO"},
+            {"ip": "192.168.1.2", "porta": 22, "acao": "BLOQUEADO"},
+            {"ip": "192.168.1.1", "porta": 80, "acao": "BLOQUEADO"},
+            {"ip": "exemplo.com", "porta": 443, "acao": "PERMITIDO"}
+        ]
+        with open(self.arquivo_json, 'w', encoding='utf-8') as f:
+            json.dump(self.regras_teste, f)
+    
+    def tearDown(self):
+        """
+        Remove o diretório temporário.
+        """
+        self.diretorio.cleanup()
+    
+    def test_decisoes_iguais_a_filtrar_pacote(self):
+        """
+        Testa se a política compilada decide igual à busca linear.
+        """
+        compilar_regras(self.arquivo_json, self.arquivo_bin)
+        politica = PoliticaCompilada(self.arquivo_bin)
+        
+        pacotes = [
+            ("192.168.1.1", 80), ("192.168.1.2", 22), ("exemplo.com", 443),
+            ("192.168.1.1", 22), ("10.0.0.1", 80)
+        ]
+        for ip, porta in pacotes:
+            self.assertEqual(politica.decidir(ip, porta),
+                             filtrar_pacote(ip, porta, self.regras_teste))
+        politica.fechar()
+    
+    def test_carregar_usa_binario_atualizado(self):
+        """
+        Testa se o binário é usado quando está em dia com o JSON.
+        """
+        compilar_regras(self.arquivo_json, self.arquivo_bin)
+        politica = carregar_politica(self.arquivo_json, self.arquivo_bin)
+        
+        self.assertIsInstance(politica, PoliticaCompilada)
+        politica.fechar()
+    
+    def test_carregar_binario_desatualizado_usa_json(self):
+        """
+        Testa se o JSON é usado quando mudou depois da compilação.
+        """
+        compilar_regras(self.arquivo_json, self.arquivo_bin)
+        with open(self.arquivo_json, 'w', encoding='utf-8') as f:
+            json.dump([{"ip": "10.0.0.1", "porta": 80, "acao": "PERMITIDO"}], f)
+        
+        politica = carregar_politica(self.arquivo_json, self.arquivo_bin)
+        
+        self.assertIsInstance(politica, IndiceRegras)
+        self.assertEqual(politica.decidir("10.0.0.1", 80), "PERMITIDO")
+    
+    def test_binario_invalido_usa_json(self):
+        """
+        Testa se um arquivo binário corrompido é ignorado.
+        """
+        with open(self.arquivo_bin, 'wb') as f:
+            f.write(b'lixo')
+        
+        politica = carregar_politica(self.arquivo_json, self.arquivo_bin)
+        self.assertIsInstance(politica, IndiceRegras)
+
+
+class TestConjuntoRegras(unittest.TestCase):
+    """
+    Testes para a publicação de versões das regras (troca atômica).
+    """
+    
+    def setUp(self):
+        """
+        Aponta a aplicação para um regras.json temporário.
+        """
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.diretorio.name, 'regras.json')
+        self.escrever([{"ip": "10.0.0.1", "porta": 80, "acao": "PERMITIDO"}])
+        
+        self.patches = [
+            mock.patch.object(firewall_web, 'REGRAS_FILE', self.arquivo),
+            mock.patch.object(firewall_web, 'REGRAS_COMPILADO',
+                              os.path.join(self.diretorio.name, 'regras.fwc')),
+            mock.patch.object(firewall_web, '_conjunto_ativo', None),
+            mock.patch.object(firewall_web, 'verificar_porta', return_value=False)
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.cliente = firewall_web.app.test_client()
+    
+    def tearDown(self):
+        """
+        Desfaz os patches e remove o diretório temporário.
+        """
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.diretorio.cleanup()
+    
+    def escrever(self, regras):
+        """
+        Substitui o conteúdo do arquivo de regras (com mtime diferente).
+        """
+        with open(self.arquivo, 'w', encoding='utf-8') as f:
+            json.dump(regras, f)
+        info = os.stat(self.arquivo)
+        os.utime(self.arquivo, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+    
+    def test_versao_antiga_nao_muda_apos_recarga(self):
+        """
+        Testa se uma versão em uso continua decidindo com as regras antigas.
+        """
+        antigo = firewall_web.obter_conjunto()
+        self.escrever([{"ip": "10.0.0.1", "porta": 80, "acao": "BLOQUEADO"}])
+        novo = firewall_web.recarregar_regras()
+        
+        self.assertGreater(novo.versao, antigo.versao)
+        self.assertEqual(antigo.politica.decidir("10.0.0.1", 80), "PERMITIDO")
+        self.assertEqual(novo.politica.decidir("10.0.0.1", 80), "BLOQUEADO")
+        self.assertIs(firewall_web.obter_conjunto(), novo)
+    
+    def test_json_invalido_mantem_versao_ativa(self):
+        """
+        Testa se um arquivo inválido não substitui a versão ativa.
+        """
+        antigo = firewall_web.obter_conjunto()
+        with open(self.arquivo, 'w', encoding='utf-8') as f:
+            f.write('{ invalido')
+        
+        self.assertIs(firewall_web.recarregar_regras(), antigo)
+    
+    def test_observador_inicia_com_a_primeira_requisicao(self):
+        """
+        Testa se edições externas do arquivo são aplicadas sem executar o
+        módulo como script (ex.: flask run ou servidor WSGI).
+        """
+        antigo = firewall_web.obter_conjunto()
+        self.assertIsNotNone(firewall_web._observador)
+        self.escrever([{"ip": "10.0.0.1", "porta": 80, "acao": "BLOQUEADO"}])
+        
+        limite = time.monotonic() + 5
+        while (firewall_web.obter_conjunto() is antigo
+               and time.monotonic() < limite):
+            time.sleep(0.05)
+        self.assertEqual(firewall_web.obter_conjunto().politica.decidir("10.0.0.1", 80),
+                         "BLOQUEADO")
+    
+    def test_avaliar_lote(self):
+        """
+        Testa a avaliação em lote (sem teste de conectividade).
+        """
+        resposta = self.cliente.post('/api/avaliar', json={'pacotes': [
+            {'ip': '10.0.0.1', 'porta': 80},
+            {'ip': '10.0.0.1', 'porta': 81}
+        ]})
+        
+        self.assertEqual(resposta.status_code, 200)
+        decisoes = [r['decisao'] for r in resposta.json['resultados']]
+        self.assertEqual(decisoes, ['PERMITIDO', 'BLOQUEADO'])
+        self.assertEqual(resposta.json['versao_regras'], firewall_web.obter_conjunto().versao)
+    
+    def test_avaliar_pacote_invalido(self):
+        """
+        Testa se um pacote sem porta é rejeitado na avaliação.
+        """
+        resposta = self.cliente.post('/api/avaliar', json={'pacotes': [{'ip': '10.0.0.1'}]})
+        self.assertEqual(resposta.status_code, 400)
+    
+    def test_decisao_informa_versao(self):
+        """
+        Testa se a decisão traz a versão publicada pela edição de regras.
+        """
+        resposta = self.cliente.post('/api/regras', json={
+            'ip': '10.0.0.2', 'porta': 22, 'acao': 'PERMITIDO'
+        })
+        self.assertEqual(resposta.status_code, 201)
+        versao = firewall_web.obter_conjunto().versao
+        
+        resposta = self.cliente.post('/api/testar-pacote', json={
+            'ip': '10.0.0.2', 'porta': 22
+        })
+        self.assertEqual(resposta.json['decisao'], 'PERMITIDO')
+        self.assertEqual(resposta.json['versao_regras'], versao)
+    
+    def test_etag_acompanha_versao(self):
+        """
+        Testa o 304 para regras e histórico inalterados e a nova ETag após
+        uma mudança.
+        """
+        resposta = self.cliente.get('/api/regras')
+        etag = resposta.headers['ETag']
+        resposta = self.cliente.get('/api/regras', headers={'If-None-Match': etag})
+        self.assertEqual((resposta.status_code, resposta.data), (304, b''))
+        
+        self.cliente.post('/api/regras', json={'ip': '10.0.0.2', 'porta': 22, 'acao': 'PERMITIDO'})
+        resposta = self.cliente.get('/api/regras', headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta.headers['ETag'], etag)
+        
+        etag = self.cliente.get('/api/testes').headers['ETag']
+        self.cliente.post('/api/testar-pacote', json={'ip': '10.0.0.1', 'porta': 80})
+        resposta = self.cliente.get('/api/testes', headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 200)
+    
+    def test_compressao_e_estaticos(self):
+        """
+        Testa a resposta gzip (com ETag própria) e o cache longo dos
+        estáticos com impressão digital.
+        """
+        simples = self.cliente.get('/')
+        resposta = self.cliente.get('/', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(resposta.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', resposta.headers['Vary'])
+        self.assertEqual(resposta.headers['ETag'], simples.headers['ETag'][:-1] + '-gzip"')
+        pagina = gzip.decompress(resposta.data).decode('utf-8')
+        
+        url = re.search(r'href="(/static/css/style\.css\?v=\w+)"', pagina).group(1)
+        estatico = self.cliente.get(url)
+        self.assertIn('immutable', estatico.headers['Cache-Control'])
+        estatico.close()
+        estatico = self.cliente.get('/static/css/style.css?v=antiga')
+        self.assertNotIn('immutable', estatico.headers['Cache-Control'])
+        estatico.close()
+    
+    def test_observador_sobrevive_a_erro(self):
+        """
+        Testa se um erro ao recarregar não encerra o observador: a versão
+        ativa continua valendo e a próxima mudança é aplicada.
+        """
+        antigo = firewall_web.obter_conjunto()
+        recarregar = firewall_web.recarregar_regras
+        saida = io.StringIO()
+        with mock.patch.object(firewall_web, 'recarregar_regras',
+                               side_effect=PermissionError("ocupado")) as falho, \
+                contextlib.redirect_stdout(saida):
+            self.escrever([{"ip": "10.0.0.1", "porta": 80, "acao": "BLOQUEADO"}])
+            limite = time.monotonic() + 5
+            while not falho.called and time.monotonic() < limite:
+                time.sleep(0.05)
+            self.assertIs(firewall_web._conjunto_ativo, antigo)
+            
+            falho.side_effect = recarregar
+            while (firewall_web._conjunto_ativo is antigo
+                   and time.monotonic() < limite):
+                time.sleep(0.05)
+        
+        self.assertTrue(firewall_web._observador.is_alive())
+        self.assertIn("ocupado", saida.getvalue())
+        self.assertEqual(firewall_web.obter_conjunto().politica.decidir("10.0.0.1", 80),
+                         "BLOQUEADO")
+    
+    @unittest.skipUnless(hasattr(signal, 'SIGHUP'), "SIGHUP indisponível")
+    def test_sighup_recarrega_regras(self):
+        """
+        Testa se o tratador de SIGHUP é instalado na importação (antes de
+        qualquer requisição iniciar o observador) e força uma recarga.
+        """
+        instalado = subprocess.run(
+            [sys.executable, '-c', 'import signal, firewall_web; '
+             'print(signal.getsignal(signal.SIGHUP) is not signal.SIG_DFL)'],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(instalado.stdout.strip(), 'True')
+        
+        antigo = firewall_web.obter_conjunto()
+        os.kill(os.getpid(), signal.SIGHUP)
+        limite = time.monotonic() + 5
+        while (firewall_web.obter_conjunto() is antigo
+               and time.monotonic() < limite):
+            time.sleep(0.05)
+        self.assertGreater(firewall_web.obter_conjunto().versao, antigo.versao)
+    
+    def test_varredura_corpo_nao_objeto(self):
+        """
+        Testa se um corpo JSON que não é objeto recebe 400 na varredura.
+        """
+        for corpo in ([], "x"):
+            resposta = self.cliente.post('/api/varredura', json=corpo)
+            self.assertEqual(resposta.status_code, 400)
+            self.assertIn('erro', resposta.json)
+    
+    def test_etag_comprimida_exige_mesma_codificacao(self):
+        """
+        Testa se a ETag da versão gzip só gera 304 quando a requisição
+        também aceita gzip.
+        """
+        etag = self.cliente.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        
+        resposta = self.cliente.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('Content-Encoding', resposta.headers)
+        self.assertIn('Simulador de Firewall', resposta.get_data(as_text=True))
+        
+        resposta = self.cliente.get('/', headers={'If-None-Match': etag,
+                                                  'Accept-Encoding': 'gzip'})
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(resposta.headers['ETag'], etag)
+    
+    def test_estatico_gzip_revalidado(self):
+        """
+        Testa se um estático servido com gzip é revalidado (304) pela sua
+        ETag "-gzip" e se sem gzip essa ETag não vale.
+        """
+        estatico = self.cliente.get('/static/css/style.css',
+                                    headers={'Accept-Encoding': 'gzip'})
+        etag = estatico.headers['ETag']
+        estatico.close()
+        self.assertTrue(etag.endswith('-gzip"'))
+        
+        resposta = self.cliente.get('/static/css/style.css', headers={
+            'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+        self.assertEqual((resposta.status_code, resposta.data), (304, b''))
+        self.assertEqual(resposta.headers['ETag'], etag)
+        resposta.close()
+        
+        resposta = self.cliente.get('/static/css/style.css', headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('Content-Encoding', resposta.headers)
+        resposta.close()
+    
+    def test_regra_ipv6_duplicada_em_outra_grafia(self):
+        """
+        Testa se a API decide pacotes IPv6 e reconhece o mesmo endereço
+        escrito de outra forma como regra duplicada.
+        """
+        resposta = self.cliente.post('/api/regras', json={
+            'ip': '2001:db8::10', 'porta': 443, 'acao': 'PERMITIDO'})
+        self.assertEqual(resposta.status_code, 201)
+        
+        resposta = self.cliente.post('/api/regras', json={
+            'ip': '2001:DB8:0:0:0:0:0:10', 'porta': 443, 'acao': 'BLOQUEADO'})
+        self.assertEqual(resposta.status_code, 400)
+        
+        resposta = self.cliente.post('/api/avaliar', json={'ip': '2001:0db8::0010', 'porta': 443})
+        self.assertEqual(resposta.json['resultados'][0]['decisao'], 'PERMITIDO')
+    
+    def test_explicar_api(self):
+        """
+        Testa se /api/explicar informa a regra que casou sem entrar no histórico.
+        """
+        historico = len(firewall_web.testes_realizados)
+        resposta = self.cliente.post('/api/explicar', json={'ip': '10.0.0.1', 'porta': 80})
+        
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual((resposta.json['decisao'], resposta.json['regra']), ('PERMITIDO', 0))
+        self.assertEqual(resposta.json['regra_json'],
+                         {"ip": "10.0.0.1", "porta": 80, "acao": "PERMITIDO"})
+        self.assertEqual(len(firewall_web.testes_realizados), historico)
+        
+        resposta = self.cliente.post('/api/explicar', json={'porta': 80})
+        self.assertEqual(resposta.status_code, 400)
+    
+    def test_impacto_usa_historico(self):
+        """
+        Testa a previsão de impacto sobre o histórico de testes.
+        """
+        historico = [{'ip': '10.0.0.1', 'porta': 80}, {'ip': '10.0.0.1', 'porta': 80},
+                     {'ip': '10.0.0.9', 'porta': 80}]
+        candidatas = [{"ip": "10.0.0.0/24", "porta": 80, "acao": "BLOQUEADO"}]
+        with mock.patch.object(firewall_web, 'testes_realizados', historico):
+            resposta = self.cliente.post('/api/impacto', json={'regras': candidatas})
+        
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual((resposta.json['pacotes'], resposta.json['fluxos']), (3, 2))
+        mudanca, = resposta.json['mudancas']
+        self.assertEqual((mudanca['antes'], mudanca['depois'], mudanca['pacotes']),
+                         ('PERMITIDO', 'BLOQUEADO', 2))
+        
+        resposta = self.cliente.post('/api/impacto', json={'regras': [{"ip": "*"}]})
+        self.assertEqual(resposta.status_code, 400)
+
+
+class TestVarredura(unittest.TestCase):
+    """
+    Testes para a varredura de faixas de hosts e portas.
+    """
+    
+    def test_expandir_hosts_cidr(self):
+        """
+        Testa se uma rede CIDR é expandida nos seus hosts utilizáveis.
+        """
+        hosts = expandir_hosts("10.0.0.0/30, 192.168.0.1")
+        self.assertEqual(hosts, ["10.0.0.1", "10.0.0.2", "192.168.0.1"])
+    
+    def test_expandir_hosts_rede_invalida(self):
+        """
+        Testa se uma rede inválida gera erro.
+        """
+        with self.assertRaises(ValueError):
+            expandir_hosts("10.0.0.0/33")
+    
+    def test_expandir_portas_faixas(self):
+        """
+        Testa se faixas de portas são expandidas sem repetição.
+        """
+        self.assertEqual(expandir_portas("22,80-82,81"), [22, 80, 81, 82])
+    
+    def test_expandir_portas_fora_do_limite(self):
+        """
+        Testa se portas fora de 1-65535 geram erro.
+        """
+        with self.assertRaises(ValueError):
+            expandir_portas("0-10")
+    
+    def test_tempo_limite_recua_ao_expirar(self):
+        """
+        Testa se sondagens expiradas dobram o tempo limite adaptativo até o
+        máximo e se a próxima resposta volta ao valor estimado.
+        """
+        tempo_limite = TempoLimiteAdaptativo(2.0)
+        for _ in range(20):
+            tempo_limite.registrar(0.001)
+        self.assertEqual(tempo_limite.atual, tempo_limite.minimo)
+        
+        tempo_limite.expirou()
+        self.assertAlmostEqual(tempo_limite.atual, 2 * tempo_limite.minimo)
+        tempo_limite.expirou()
+        self.assertAlmostEqual(tempo_limite.atual, 4 * tempo_limite.minimo)
+        for _ in range(20):
+            tempo_limite.expirou()
+        self.assertEqual(tempo_limite.atual, 2.0)
+        
+        tempo_limite.registrar(0.001)
+        self.assertEqual(tempo_limite.atual, tempo_limite.minimo)
+    
+    def test_varrer_porta_local(self):
+        """
+        Testa a varredura contra uma porta aberta e uma fechada em localhost.
+        """
+        servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        servidor.bind(('127.0.0.1', 0))
+        servidor.listen(8)
+        aberta = servidor.getsockname()[1]
+        
+        # Porta fechada: abre e fecha um socket para obter uma porta livre
+        temporario = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        temporario.bind(('127.0.0.1', 0))
+        fechada = temporario.getsockname()[1]
+        temporario.close()
+        
+        regras = [{"ip": "127.0.0.1", "porta": aberta, "acao": "PERMITIDO"}]
+        resultados = list(varrer(
+            ["127.0.0.1"], [aberta, fechada],
+            lambda ip, porta: filtrar_pacote(ip, porta, regras),
+            timeout=2
+        ))
+        servidor.close()
+        
+        por_porta = {r['porta']: r for r in resultados}
+        self.assertTrue(por_porta[aberta]['conectividade'])
+        self.assertEqual(por_porta[aberta]['decisao'], 'PERMITIDO')
+        self.assertFalse(por_porta[fechada]['conectividade'])
+        self.assertEqual(por_porta[fechada]['decisao'], 'BLOQUEADO')
+    
+    def test_varrer_nome_invalido_nao_trava(self):
+        """
+        Testa se um nome com rótulo de mais de 63 caracteres (rejeitado pelo
+        codec idna) é dado como host não encontrado sem travar a varredura.
+        """
+        temporario = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        temporario.bind(('127.0.0.1', 0))
+        fechada = temporario.getsockname()[1]
+        temporario.close()
+        
+        nome = 'a' * 70
+        resultados = list(varrer(
+            [nome, "127.0.0.1"], [fechada],
+            lambda ip, porta: filtrar_pacote(ip, porta, []),
+            timeout=2
+        ))
+        
+        por_host = {r['ip']: r for r in resultados}
+        self.assertEqual(set(por_host), {nome, "127.0.0.1"})
+        self.assertIsNone(por_host[nome]['conectividade'])
+        self.assertFalse(por_host["127.0.0.1"]['conectividade'])
+
+
+class TestGeradorCarga(unittest.TestCase):
+    """
+    Testes para o gerador de tráfego sintético do teste de carga.
+    """
+    
+    def test_mesma_semente_mesmo_trafego(self):
+        """
+        Testa se a mesma semente reproduz a mesma sequência de pacotes.
+        """
+        a = GeradorPacotes('zipf', fluxos=50, semente=7)
+        b = GeradorPacotes('zipf', fluxos=50, semente=7)
+        self.assertEqual([a.proximo() for _ in range(100)],
+                         [b.proximo() for _ in range(100)])
+    
+    def test_zipf_concentra_trafego(self):
+        """
+        Testa se o fluxo mais frequente da Zipf domina o tráfego.
+        """
+        gerador = GeradorPacotes('zipf', fluxos=100, expoente=1.5, semente=1)
+        contagem = {}
+        for _ in range(2000):
+            pacote = gerador.proximo()
+            chave = (pacote['ip'], pacote['porta'])
+            contagem[chave] = contagem.get(chave, 0) + 1
+        self.assertGreater(max(contagem.values()), 2000 * 0.2)
+    
+    def test_percentil(self):
+        """
+        Testa o percentil pelo posto mais próximo.
+        """
+        valores = list(range(1, 101))
+        self.assertEqual(percentil(valores, 50), 50)
+        self.assertEqual(percentil(valores, 99), 99)
+        self.assertEqual(percentil([], 99), 0.0)
+
+
+class TestPerfil(unittest.TestCase):
+    """
+    Testes para o perfil de requisições (tempos por etapa).
+    """
+    
+    def test_trechos_aninhados_e_pilhas(self):
+        """
+        Testa se trechos aninhados viram pilhas com tempo próprio.
+        """
+        perfilador = Perfilador(usar_cprofile=False)
+        rastro = perfilador.iniciar('/teste', 'GET', forcar=True)
+        with trecho('externo'):
+            with trecho('interno'):
+                pass
+        perfilador.finalizar(rastro)
+        
+        caminhos = [caminho for caminho, _ in rastro.trechos]
+        self.assertIn(('requisicao', 'externo', 'interno'), caminhos)
+        linhas = rastro.pilhas_colapsadas().splitlines()
+        self.assertIn('requisicao;externo;interno', [linha.rsplit(' ', 1)[0] for linha in linhas])
+    
+    def test_sem_rastro_trecho_nao_registra(self):
+        """
+        Testa se trecho() não registra nada fora de uma requisição perfilada.
+        """
+        perfilador = Perfilador()
+        self.assertIsNone(perfilador.iniciar('/teste', 'GET'))
+        with trecho('qualquer'):
+            pass
+        self.assertEqual(perfilador.listar(), [])
+    
+    def test_guarda_apenas_os_mais_lentos(self):
+        """
+        Testa se só os N rastros mais lentos ficam guardados.
+        """
+        perfilador = Perfilador(max_rastros=2, usar_cprofile=False)
+        for _ in range(5):
+            perfilador.finalizar(perfilador.iniciar('/teste', 'GET', forcar=True))
+        
+        rastros = perfilador.listar()
+        self.assertEqual(len(rastros), 2)
+        self.assertGreaterEqual(rastros[0].duracao, rastros[1].duracao)
+    
+    def test_cabecalho_ativa_perfil(self):
+        """
+        Testa se o cabeçalho X-Perfil gera um rastro consultável pela API.
+        """
+        cliente = firewall_web.app.test_client()
+        resposta = cliente.get('/api/testes', headers={'X-Perfil': '1'})
+        identificador = resposta.headers.get('X-Perfil-Id')
+        
+        self.assertIsNotNone(identificador)
+        self.assertIn('requisicao;dur=', resposta.headers['Server-Timing'])
+        detalhes = cliente.get(f'/api/admin/perfis/{identificador}')
+        self.assertEqual(detalhes.json['rota'], '/api/testes')
+        self.assertIsNone(cliente.get('/api/testes').headers.get('X-Perfil-Id'))
+
+
+class TestClassificadorRegras(unittest.TestCase):
+    """
+    Testes para as regras de 5 campos e o classificador indexado.
+    """
+    
+    def test_campos_da_regra(self):
+        """
+        Testa rede CIDR, faixa de portas, origem, protocolo e direção.
+        """
+        indice = IndiceRegras([
+            {"ip": "10.0.0.0/8", "porta": 22, "origem": "192.168.1.0/24", "acao": "PERMITIDO"},
+            {"ip": "10.1.0.0/16", "porta": 8000, "porta_fim": 8100, "protocolo": "UDP",
+             "acao": "PERMITIDO"},
+            {"ip": "10.2.0.1", "protocolo": "ICMP", "acao": "PERMITIDO"},
+            {"ip": "*", "porta": 53, "direcao": "SAIDA", "acao": "PERMITIDO"}
+        ])
+        
+        self.assertEqual(indice.decidir("10.9.9.9", 22, origem="192.168.1.7"), "PERMITIDO")
+        self.assertEqual(indice.decidir("10.9.9.9", 22, origem="192.168.2.7"), "BLOQUEADO")
+        self.assertEqual(indice.decidir("10.9.9.9", 22), "BLOQUEADO")
+        self.assertEqual(indice.decidir("10.1.2.3", 8050, protocolo="UDP"), "PERMITIDO")
+        self.assertEqual(indice.decidir("10.1.2.3", 8050, protocolo="TCP"), "BLOQUEADO")
+        self.assertEqual(indice.decidir("10.1.2.3", 8101, protocolo="UDP"), "BLOQUEADO")
+        self.assertEqual(indice.decidir("10.2.0.1", protocolo="ICMP"), "PERMITIDO")
+        self.assertEqual(indice.decidir("8.8.8.8", 53, direcao="SAIDA"), "PERMITIDO")
+        self.assertEqual(indice.decidir("8.8.8.8", 53), "BLOQUEADO")
+    
+    def test_prioridade_entre_tuplas(self):
+        """
+        Testa se a primeira regra casada vence mesmo em tuplas diferentes.
+        """
+        indice = IndiceRegras([
+            {"ip": "10.0.0.0/8", "acao": "BLOQUEADO"},
+            {"ip": "10.0.0.1", "porta": 80, "acao": "PERMITIDO"}
+        ])
+        self.assertEqual(indice.decidir("10.0.0.1", 80), "BLOQUEADO")
+    
+    def test_regra_invalida(self):
+        """
+        Testa se regras inválidas são rejeitadas.
+        """
+        for regra in ({"ip": "10.0.0.1", "porta": 70000, "acao": "PERMITIDO"},
+                      {"ip": "10.0.0.1", "porta": 80, "protocolo": "ICMP", "acao": "PERMITIDO"},
+                      {"ip": "10.0.0.0/33", "acao": "PERMITIDO"},
+                      {"ip": "10.0.0.1", "porta": 80, "acao": "TALVEZ"}):
+            with self.assertRaises(ValueError):
+                IndiceRegras([regra])
+    
+    def test_equivalente_a_busca_linear(self):
+        """
+        Testa se o índice e a política compilada decidem igual à busca
+        linear de referência em regras e pacotes aleatórios.
+        """
+        aleatorio = random.Random(31)
+        ips = ["10.0.0.1", "10.0.0.2", "10.0.1.5", "10.0.0.0/24", "10.0.0.0/16", "*"]
+        
+        with tempfile.TemporaryDirectory() as diretorio:
+            for rodada in range(10):
+                regras = []
+                for _ in range(20):
+                    regra = {"ip": aleatorio.choice(ips), "acao": aleatorio.choice(["PERMITIDO", "BLOQUEADO"])}
+                    protocolo = aleatorio.choice(["TCP", "UDP", "ICMP", "QUALQUER"])
+                    regra["protocolo"] = protocolo
+                    if protocolo != "ICMP" and aleatorio.random() < 0.8:
+                        regra["porta"] = aleatorio.choice([22, 80, 443])
+                        if aleatorio.random() < 0.3:
+                            regra["porta_fim"] = regra["porta"] + 100
+                    if aleatorio.random() < 0.3:
+                        regra["origem"] = aleatorio.choice(["192.168.0.0/16", "192.168.1.1"])
+                    if aleatorio.random() < 0.3:
+                        regra["direcao"] = aleatorio.choice(["ENTRADA", "SAIDA"])
+                    regras.append(regra)
+                
+                arquivo_json = os.path.join(diretorio, f'regras{rodada}.json')
+                arquivo_bin = os.path.join(diretorio, f'regras{rodada}.fwc')
+                with open(arquivo_json, 'w', encoding='utf-8') as f:
+                    json.dump(regras, f)
+                compilar_regras(arquivo_json, arquivo_bin)
+                indice = IndiceRegras(regras)
+                compilada = PoliticaCompilada(arquivo_bin)
+                
+                for _ in range(100):
+                    protocolo = aleatorio.choice(["TCP", "UDP", "ICMP"])
+                    pacote = {
+                        "ip": aleatorio.choice(["10.0.0.1", "10.0.0.2", "10.0.1.5", "10.5.0.1"]),
+                        "porta": None if protocolo == "ICMP" else aleatorio.choice([22, 80, 150, 443]),
+                        "origem": aleatorio.choice([None, "192.168.1.1", "192.168.9.9"]),
+                        "protocolo": protocolo,
+                        "direcao": aleatorio.choice(["ENTRADA", "SAIDA"])
+                    }
+                    esperado = filtrar_referencia(pacote, regras)
+                    self.assertEqual(indice.decidir(**pacote), esperado, (pacote, regras))
+                    self.assertEqual(compilada.decidir(**pacote), esperado, (pacote, regras))
+                    explicacao = indice.explicar(**pacote)
+                    self.assertEqual(explicacao, compilada.explicar(**pacote))
+                    self.assertEqual(explicacao['decisao'], esperado)
+                compilada.fechar()
+    
+    def test_explicar_decisao(self):
+        """
+        Testa a regra, o motivo e as contagens informadas pelo explicar.
+        """
+        indice = IndiceRegras([
+            {"ip": "10.0.0.0/8", "porta": 22, "acao": "BLOQUEADO"},
+            {"ip": "10.0.0.1", "porta": 22, "origem": "192.168.0.0/16", "acao": "PERMITIDO"},
+            {"ip": "*", "porta": 80, "acao": "PERMITIDO"}
+        ])
+        
+        explicacao = indice.explicar("10.0.0.1", 22, origem="192.168.0.5")
+        self.assertEqual((explicacao['regra'], explicacao['decisao'], explicacao['padrao']),
+                         (0, 'BLOQUEADO', False))
+        self.assertIn("destino 10.0.0.0/8, porta 22", explicacao['motivo'])
+        self.assertGreaterEqual(explicacao['candidatos'], 1)
+        self.assertLessEqual(explicacao['tabelas_consultadas'], explicacao['tabelas'])
+        
+        explicacao = indice.explicar("8.8.8.8", 22)
+        self.assertEqual((explicacao['regra'], explicacao['padrao'], explicacao['candidatos']),
+                         (None, True, 0))
+        self.assertIn("política padrão", explicacao['motivo'])
+    
+    def test_ipv6_e_enderecos_canonicos(self):
+        """
+        Testa regras IPv6, grafias diferentes do mesmo endereço e o IPv4
+        mapeado no mesmo índice que o IPv4.
+        """
+        regras = [
+            {"ip": "2001:DB8:0:0::1", "porta": 443, "acao": "PERMITIDO"},
+            {"ip": "2001:db8::/32", "porta": 22, "origem": "fd00::/8", "acao": "PERMITIDO"},
+            {"ip": "::ffff:10.0.0.0/104", "porta": 80, "acao": "PERMITIDO"},
+            {"ip": "0.0.0.0/0", "porta": 53, "acao": "PERMITIDO"},
+            {"ip": "*", "porta": 8080, "acao": "PERMITIDO"}
+        ]
+        indice = IndiceRegras(regras)
+        
+        self.assertEqual(indice.decidir("2001:db8::1", 443), "PERMITIDO")
+        self.assertEqual(indice.decidir("2001:0db8:0000::0001", 443), "PERMITIDO")
+        self.assertEqual(indice.decidir("2001:db8::2", 443), "BLOQUEADO")
+        self.assertEqual(indice.decidir("2001:db8:ffff::9", 22, origem="fd12::5"), "PERMITIDO")
+        self.assertEqual(indice.decidir("2001:db8:ffff::9", 22, origem="10.0.0.1"), "BLOQUEADO")
+        self.assertEqual(indice.decidir("10.9.9.9", 80), "PERMITIDO")
+        self.assertEqual(indice.decidir("::ffff:10.9.9.9", 80), "PERMITIDO")
+        self.assertEqual(indice.decidir("fe80::1%eth0", 8080), "PERMITIDO")
+        self.assertEqual(indice.decidir("8.8.8.8", 53), "PERMITIDO")
+        self.assertEqual(indice.decidir("2001:4860::8888", 53), "BLOQUEADO")
+        
+        self.assertEqual([regra['ip'] for regra in TabelaRegras(regras).para_json()],
+                         ["2001:db8::1", "2001:db8::/32", "10.0.0.0/8", "0.0.0.0/0", "*"])
+        self.assertEqual(Pacote.de_json({"ip": "2001:0DB8::0001", "porta": 80,
+                                         "origem": "::ffff:192.168.0.1"}).para_json(),
+                         {"ip": "2001:db8::1", "porta": 80, "origem": "192.168.0.1"})
+        
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo_json = os.path.join(diretorio, 'regras.json')
+            arquivo_bin = os.path.join(diretorio, 'regras.fwc')
+            with open(arquivo_json, 'w', encoding='utf-8') as f:
+                json.dump(regras, f)
+            compilar_regras(arquivo_json, arquivo_bin)
+            compilada = PoliticaCompilada(arquivo_bin)
+            self.assertEqual(compilada.decidir("2001:0db8::1", 443), "PERMITIDO")
+            self.assertEqual(compilada.decidir("::ffff:10.9.9.9", 80), "PERMITIDO")
+            self.assertEqual(compilada.explicar("2001:db8:1::9", 22, origem="fd00::1")['regra'], 1)
+            compilada.fechar()
+    
+    def test_tabela_converte_json_sem_perda(self):
+        """
+        Testa se a representação compacta volta ao mesmo JSON.
+        """
+        regras = [
+            {"ip": "8.8.8.8", "porta": 53, "acao": "BLOQUEADO"},
+            {"ip": "exemplo.com", "porta": 8000, "porta_fim": 8100, "origem": "10.0.0.0/8",
+             "protocolo": "UDP", "direcao": "SAIDA", "acao": "PERMITIDO", "descricao": "teste"},
+            {"ip": "*", "protocolo": "ICMP", "acao": "PERMITIDO"}
+        ]
+        tabela = TabelaRegras(regras)
+        
+        self.assertEqual(len(tabela), 3)
+        self.assertEqual(tabela.para_json(), regras)
+        self.assertEqual(tabela.acao(0), Acao.BLOQUEADO)
+        self.assertEqual(tabela[1].destino, "exemplo.com")
+    
+    def test_pacote_e_acao(self):
+        """
+        Testa o pacote compacto e a compatibilidade da ação com strings.
+        """
+        pacote = {"ip": "10.0.0.1", "porta": 80, "origem": "192.168.0.1", "protocolo": "UDP"}
+        normalizado = Pacote.de_json(pacote)
+        
+        self.assertEqual(normalizado.destino, 0xFFFF0A000001)
+        self.assertEqual(normalizado.para_json(), pacote)
+        self.assertEqual(Acao.PERMITIDO, "PERMITIDO")
+        self.assertEqual(json.dumps(Acao.PERMITIDO), '"PERMITIDO"')
+    
+    def test_api_aceita_campos_novos(self):
+        """
+        Testa se a API de regras aceita faixa de portas e protocolo.
+        """
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = os.path.join(diretorio, 'regras.json')
+            with open(arquivo, 'w', encoding='utf-8') as f:
+                json.dump([], f)
+            with mock.patch.object(firewall_web, 'REGRAS_FILE', arquivo), \
+                 mock.patch.object(firewall_web, 'REGRAS_COMPILADO',
+                                   os.path.join(diretorio, 'regras.fwc')), \
+                 mock.patch.object(firewall_web, '_conjunto_ativo', None):
+                cliente = firewall_web.app.test_client()
+                resposta = cliente.post('/api/regras', json={
+                    'ip': '10.0.0.0/24', 'porta': 8000, 'porta_fim': 8080,
+                    'protocolo': 'UDP', 'acao': 'PERMITIDO'
+                })
+                self.assertEqual(resposta.status_code, 201)
+                
+                resposta = cliente.post('/api/avaliar', json={
+                    'ip': '10.0.0.9', 'porta': 8040, 'protocolo': 'UDP'
+                })
+                self.assertEqual(resposta.json['resultados'][0]['decisao'], 'PERMITIDO')
+
+
+class TestLimitacao(unittest.TestCase):
+    """
+    Testes para a ação LIMITADO e a tabela de baldes de fichas.
+    """
+    
+    def setUp(self):
+        """
+        Prepara uma regra LIMITADO por origem e outra por regra.
+        """
+        self.regras = [
+            {"ip": "10.0.0.1", "porta": 80, "acao": "LIMITADO", "taxa": 2, "rajada": 3},
+            {"ip": "10.0.0.2", "porta": 80, "acao": "LIMITADO", "taxa": 1,
+             "limitar_por": "REGRA"},
+            {"ip": "*", "acao": "PERMITIDO"}
+        ]
+        self.indice = IndiceRegras(self.regras)
+    
+    def decisoes(self, decidir, ip, origem, instantes):
+        """
+        Retorna as decisões para pacotes chegando nos instantes dados.
+        """
+        baldes = TabelaBaldes()
+        return [str(decidir(ip, 80, origem, baldes=baldes, agora=agora))
+                for agora in instantes]
+    
+    def test_rajada_e_reposicao(self):
+        """
+        Testa a rajada inicial e a reposição de fichas ao longo do tempo.
+        """
+        decisoes = self.decisoes(self.indice.decidir, "10.0.0.1", "192.168.0.1",
+                                 [0, 0, 0, 0, 0.5, 0.5, 2.0])
+        self.assertEqual(decisoes, ['PERMITIDO'] * 3 + ['LIMITADO', 'PERMITIDO',
+                                                         'LIMITADO', 'PERMITIDO'])
+    
+    def test_baldes_por_origem_e_por_regra(self):
+        """
+        Testa se cada origem tem seu balde, exceto com limitar_por REGRA.
+        """
+        baldes = TabelaBaldes()
+        por_origem = [str(self.indice.decidir("10.0.0.1", 80, f"192.168.0.{i}",
+                                              baldes=baldes, agora=0))
+                      for i in range(5)]
+        por_regra = [str(self.indice.decidir("10.0.0.2", 80, f"192.168.0.{i}",
+                                             baldes=baldes, agora=0))
+                     for i in range(5)]
+        
+        self.assertEqual(por_origem, ['PERMITIDO'] * 5)
+        self.assertEqual(por_regra, ['PERMITIDO'] + ['LIMITADO'] * 4)
+    
+    def test_sem_baldes_limitado_permite(self):
+        """
+        Testa se caminhos sem estado tratam LIMITADO como PERMITIDO.
+        """
+        self.assertEqual(self.indice.decidir("10.0.0.1", 80, "192.168.0.1"), 'PERMITIDO')
+        self.assertEqual(filtrar_referencia({"ip": "10.0.0.1", "porta": 80}, self.regras),
+                         'PERMITIDO')
+    
+    def test_tabela_limitada(self):
+        """
+        Testa se muitas origens distintas não ultrapassam a capacidade.
+        """
+        baldes = TabelaBaldes(capacidade=100)
+        for i in range(10000):
+            self.indice.decidir("10.0.0.1", 80, f"172.16.{i // 256}.{i % 256}",
+                                baldes=baldes, agora=i / 1000000)
+        
+        estatisticas = baldes.estatisticas()
+        self.assertLessEqual(len(baldes), 100)
+        self.assertEqual(estatisticas['despejados'] + estatisticas['expirados'] + len(baldes), 10000)
+    
+    def test_baldes_cheios_expiram(self):
+        """
+        Testa se baldes já cheios são removidos com o passar do tempo.
+        """
+        baldes = TabelaBaldes()
+        for i in range(50):
+            self.indice.decidir("10.0.0.1", 80, f"172.16.0.{i}", baldes=baldes, agora=0)
+        for i in range(50):
+            self.indice.decidir("10.0.0.1", 80, "192.168.0.1", baldes=baldes, agora=10 + i)
+        
+        self.assertLessEqual(len(baldes), 2)
+        self.assertGreaterEqual(baldes.estatisticas()['expirados'], 50)
+    
+    def test_compilada_igual_ao_indice(self):
+        """
+        Testa se a política compilada limita exatamente como o índice.
+        """
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo_json = os.path.join(diretorio, 'regras.json')
+            with open(arquivo_json, 'w', encoding='utf-8') as f:
+                json.dump(self.regras, f)
+            arquivo_bin = os.path.join(diretorio, 'regras.fwc')
+            compilar_regras(arquivo_json, arquivo_bin)
+            politica = carregar_politica(arquivo_json, arquivo_bin)
+            self.assertIsInstance(politica, PoliticaCompilada)
+            instantes = [i * 0.2 for i in range(30)]
+            for ip in ("10.0.0.1", "10.0.0.2"):
+                self.assertEqual(
+                    self.decisoes(politica.decidir, ip, "192.168.0.1", instantes),
+                    self.decisoes(self.indice.decidir, ip, "192.168.0.1", instantes)
+                )
+            politica.fechar()
+    
+    def test_taxa_invalida(self):
+        """
+        Testa a validação de taxa, rajada e limitar_por.
+        """
+        for regra in ({"ip": "*", "acao": "LIMITADO"},
+                      {"ip": "*", "acao": "LIMITADO", "taxa": 0},
+                      {"ip": "*", "acao": "LIMITADO", "taxa": 1, "rajada": 0.5},
+                      {"ip": "*", "acao": "LIMITADO", "taxa": 1, "limitar_por": "IP"},
+                      {"ip": "*", "acao": "BLOQUEADO", "taxa": 1}):
+            with self.assertRaises(ValueError):
+                IndiceRegras([regra])
+    
+    def test_regra_limitado_ida_e_volta(self):
+        """
+        Testa se uma regra LIMITADO sobrevive à conversão para JSON e de volta.
+        """
+        tabela = TabelaRegras(self.regras)
+        self.assertEqual(TabelaRegras(tabela.para_json()).para_json(), tabela.para_json())
+        self.assertEqual(tabela.para_json()[1]['limitar_por'], 'REGRA')
+
+
+class TestImpacto(unittest.TestCase):
+    """
+    Testes para a comparação de políticas sobre tráfego gravado.
+    """
+    
+    def test_conta_mudancas_e_exemplos(self):
+        """
+        Testa as contagens por mudança e a ordem dos exemplos.
+        """
+        atuais = [{"ip": "10.0.0.0/8", "acao": "PERMITIDO"}]
+        candidatas = [{"ip": "10.0.0.5", "porta": 22, "acao": "BLOQUEADO"},
+                      {"ip": "10.0.0.0/8", "acao": "PERMITIDO"},
+                      {"ip": "*", "porta": 53, "acao": "PERMITIDO"}]
+        pacotes = ([{"ip": "10.0.0.5", "porta": 22, "origem": "1.1.1.1"}] * 3
+                   + [{"ip": "10.0.0.5", "porta": 22}] * 5
+                   + [{"ip": "8.8.8.8", "porta": 53}, {"ip": "10.0.0.5", "porta": 80}, None])
+        
+        resultado = comparar_politicas(atuais, candidatas, pacotes, max_exemplos=1)
+        
+        self.assertEqual((resultado['pacotes'], resultado['fluxos'], resultado['invalidos']),
+                         (10, 4, 1))
+        self.assertEqual([(m['antes'], m['depois'], m['pacotes'], m['fluxos'])
+                          for m in resultado['mudancas']],
+                         [('PERMITIDO', 'BLOQUEADO', 8, 2), ('BLOQUEADO', 'PERMITIDO', 1, 1)])
+        self.assertEqual(resultado['mudancas'][0]['exemplos'],
+                         [{"ip": "10.0.0.5", "porta": 22, "pacotes": 5,
+                           "regra_atual": 0, "regra_candidata": 0}])
+    
+    def test_igual_a_comparacao_pacote_a_pacote(self):
+        """
+        Testa, com edições aleatórias, se o filtro pelas regras alteradas
+        não esconde nenhuma mudança.
+        """
+        aleatorio = random.Random(7)
+        
+        def regra():
+            return {"ip": aleatorio.choice(["10.0.0.1", "10.0.0.0/30", "10.0.1.0/24", "*"]),
+                    "porta": aleatorio.choice([22, 80, "*"]),
+                    "acao": aleatorio.choice(["PERMITIDO", "BLOQUEADO"])}
+        
+        pacotes = [{"ip": f"10.0.{aleatorio.randint(0, 1)}.{aleatorio.randint(0, 3)}",
+                    "porta": aleatorio.choice([22, 80, 443])} for _ in range(200)]
+        for _ in range(30):
+            atuais = [regra() for _ in range(aleatorio.randint(0, 8))]
+            candidatas = list(atuais)
+            posicao = aleatorio.randint(0, len(candidatas))
+            if candidatas and aleatorio.random() < 0.5:
+                del candidatas[min(posicao, len(candidatas) - 1)]
+            else:
+                candidatas.insert(posicao, regra())
+            
+            esperado = sum(filtrar_referencia(p, atuais) != filtrar_referencia(p, candidatas)
+                           for p in pacotes)
+            resultado = comparar_politicas(atuais, candidatas, pacotes)
+            self.assertEqual(resultado['pacotes_alterados'], esperado, (atuais, candidatas))
+
+
+class TestAuditoria(unittest.TestCase):
+    """
+    Testes para o registro assíncrono de auditoria.
+    """
+    
+    def setUp(self):
+        """
+        Cria o diretório temporário dos arquivos de auditoria.
+        """
+        self.diretorio = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        """
+        Remove o diretório temporário.
+        """
+        self.diretorio.cleanup()
+    
+    def ler_registros(self):
+        """
+        Lê os registros de todos os arquivos gravados, em ordem.
+        """
+        registros = []
+        for nome in sorted(os.listdir(self.diretorio.name)):
+            with gzip.open(os.path.join(self.diretorio.name, nome), 'rt', encoding='utf-8') as f:
+                registros.extend(json.loads(linha) for linha in f)
+        return registros
+    
+    def test_grava_lotes_comprimidos(self):
+        """
+        Testa se a thread grava todos os registros em NDJSON gzip.
+        """
+        registro = RegistroAuditoria(self.diretorio.name, tamanho_lote=3, intervalo=0.01)
+        registro.iniciar()
+        for i in range(10):
+            self.assertTrue(registro.registrar({'ip': '10.0.0.1', 'porta': i}))
+        registro.fechar()
+        
+        self.assertEqual([r['porta'] for r in self.ler_registros()], list(range(10)))
+        estatisticas = registro.estatisticas()
+        self.assertEqual((estatisticas['escritos'], estatisticas['profundidade']), (10, 0))
+        self.assertGreaterEqual(estatisticas['lotes'], 4)
+    
+    def test_fechar_nao_fecha_arquivo_da_thread_ativa(self):
+        """
+        Testa se fechar() com a thread ainda gravando deixa o arquivo com
+        ela, que termina o lote e o fecha ao sair.
+        """
+        registro = RegistroAuditoria(self.diretorio.name, intervalo=0.01)
+        gravar = registro._gravar
+        gravando, liberar = threading.Event(), threading.Event()
+        
+        def gravar_devagar(lote):
+            gravando.set()
+            liberar.wait(5)
+            gravar(lote)
+        
+        with mock.patch.object(registro, '_gravar', side_effect=gravar_devagar), \
+                contextlib.redirect_stdout(io.StringIO()):
+            registro.iniciar()
+            registro.registrar({'porta': 1})
+            gravando.wait(5)
+            self.assertFalse(registro.fechar(timeout=0.05))
+            liberar.set()
+            registro._thread.join(5)
+        
+        self.assertIsNone(registro._arquivo)
+        self.assertEqual([r['porta'] for r in self.ler_registros()], [1])
+    
+    def test_rotacao_e_retencao(self):
+        """
+        Testa a rotação por tamanho e a remoção dos arquivos mais antigos.
+        """
+        registro = RegistroAuditoria(self.diretorio.name, tamanho_lote=1, max_bytes=1,
+                                     max_arquivos=2)
+        for i in range(5):
+            registro.registrar({'porta': i})
+        registro.fechar()
+        
+        self.assertEqual(registro.estatisticas()['arquivos'], 5)
+        self.assertEqual([r['porta'] for r in self.ler_registros()], [3, 4])
+    
+    def test_contrapressao(self):
+        """
+        Testa as políticas de fila cheia: descartar, amostrar e bloquear.
+        """
+        registro = RegistroAuditoria(self.diretorio.name, capacidade=4)
+        aceitos = sum(registro.registrar({'porta': i}) for i in range(10))
+        self.assertEqual((aceitos, registro.estatisticas()['descartados']), (4, 6))
+        
+        registro = RegistroAuditoria(self.diretorio.name, politica=AMOSTRAR, capacidade=10,
+                                     passo_amostragem=3)
+        aceitos = sum(registro.registrar({'porta': i}) for i in range(20))
+        estatisticas = registro.estatisticas()
+        self.assertEqual((aceitos, estatisticas['nao_amostrados']), (10, 10))
+        
+        registro = RegistroAuditoria(self.diretorio.name, politica=BLOQUEAR, capacidade=2,
+                                     intervalo=0.01)
+        registro.iniciar()
+        aceitos = sum(registro.registrar({'porta': i}) for i in range(50))
+        registro.fechar()
+        self.assertEqual((aceitos, registro.estatisticas()['descartados']), (50, 0))
+    
+    def test_decisoes_da_api_sao_registradas(self):
+        """
+        Testa se cada pacote avaliado pela API gera um registro.
+        """
+        registro = RegistroAuditoria(self.diretorio.name)
+        with mock.patch.object(firewall_web, 'auditoria', registro):
+            resposta = firewall_web.app.test_client().post('/api/avaliar', json={
+                'pacotes': [{'ip': '10.0.0.1', 'porta': 80}, {'ip': '10.0.0.2', 'porta': 22}]
+            })
+        registro.fechar()
+        
+        self.assertEqual(resposta.status_code, 200)
+        registros = self.ler_registros()
+        self.assertEqual([(r['ip'], r['rota']) for r in registros],
+                         [('10.0.0.1', '/api/avaliar'), ('10.0.0.2', '/api/avaliar')])
+        self.assertEqual(registros[0]['decisao'], resposta.json['resultados'][0]['decisao'])
+
+
+class TestEquivalenciaAleatoria(unittest.TestCase):
+    """
+    Testes gerativos: regras e fluxos de pacotes aleatórios decididos pela
+    busca linear de referência e por cada caminho otimizado (índice,
+    política compilada, explicação, limites, comparação de políticas).
+    Cada rodada usa a semente FIREWALL_SEMENTE + rodada; numa divergência
+    as regras são reduzidas ao menor conjunto que ainda diverge.
+    """
+    
+    SEMENTE = int(os.environ.get('FIREWALL_SEMENTE', 2024))
+    RODADAS = int(os.environ.get('FIREWALL_RODADAS', 20))
+    
+    HOSTS = ["10.0.0.1", "10.0.0.2", "10.0.0.255", "10.0.1.0", "10.1.0.1",
+             "192.168.1.1", "0.0.0.0", "255.255.255.255",
+             "2001:db8::1", "2001:DB8:0:0::ff", "::ffff:10.0.0.1", "fe80::1"]
+    NOMES = ["servidor.local", "exemplo.com"]
+    PORTAS = [1, 22, 80, 443, 8080, 65535]
+    # Portas que nenhum caminho pode aceitar (70000 = 4464 + 65536 invadiria
+    # os bits de endereço da chave de busca)
+    PORTAS_INVALIDAS = [-1, 65536, 70000, "443", 80.0, True]
+    
+    def _rede_aleatoria(self, aleatorio):
+        """
+        Sorteia um IP ou rede CIDR em torno dos hosts conhecidos.
+        """
+        host = aleatorio.choice(self.HOSTS)
+        if aleatorio.random() < 0.5:
+            return host
+        return f"{host}/{aleatorio.randint(0, 128 if ':' in host else 32)}"
+    
+    def _regra_aleatoria(self, aleatorio):
+        """
+        Sorteia uma regra válida com qualquer combinação de campos.
+        """
+        sorteio = aleatorio.random()
+        if sorteio < 0.15:
+            destino = "*"
+        elif sorteio < 0.25:
+            destino = aleatorio.choice(self.NOMES).upper() if aleatorio.random() < 0.3 \
+                else aleatorio.choice(self.NOMES)
+        else:
+            destino = self._rede_aleatoria(aleatorio)
+        regra = {"ip": destino, "acao": aleatorio.choice(["PERMITIDO", "BLOQUEADO", "LIMITADO"])}
+        
+        if regra["acao"] == "LIMITADO":
+            regra["taxa"] = aleatorio.choice([0.5, 1, 5])
+            if aleatorio.random() < 0.5:
+                regra["limitar_por"] = aleatorio.choice(["REGRA", "ORIGEM"])
+        if aleatorio.random() < 0.7:
+            regra["protocolo"] = aleatorio.choice(["TCP", "UDP", "ICMP", "QUALQUER"])
+        if regra.get("protocolo") != "ICMP" and aleatorio.random() < 0.8:
+            regra["porta"] = aleatorio.choice(self.PORTAS)
+            if aleatorio.random() < 0.3:
+                regra["porta_fim"] = aleatorio.randint(regra["porta"], 65535)
+        if aleatorio.random() < 0.3:
+            regra["origem"] = self._rede_aleatoria(aleatorio)
+        if aleatorio.random() < 0.3:
+            regra["direcao"] = aleatorio.choice(["ENTRADA", "SAIDA", "QUALQUER"])
+        return regra
+    
+    def _pacote_aleatorio(self, aleatorio):
+        """
+        Sorteia um pacote perto das bordas das redes e faixas das regras.
+        """
+        if aleatorio.random() < 0.1:
+            destino = aleatorio.choice(self.NOMES)
+        else:
+            # Vizinhos dos hosts conhecidos: trocar um bit atravessa as máscaras
+            endereco = ipaddress.ip_address(aleatorio.choice(self.HOSTS))
+            if aleatorio.random() < 0.5:
+                endereco = type(endereco)(int(endereco) ^ 1 << aleatorio.randrange(endereco.max_prefixlen))
+            destino = str(endereco)
+        protocolo = aleatorio.choice(["TCP", "UDP", "ICMP"])
+        porta = None
+        if aleatorio.random() < 0.05:
+            porta = aleatorio.choice(self.PORTAS_INVALIDAS)
+        elif protocolo != "ICMP":
+            porta = min(max(aleatorio.choice(self.PORTAS) + aleatorio.choice([-1, 0, 0, 1]), 1), 65535)
+        return {
+            "ip": destino,
+            "porta": porta,
+            "origem": aleatorio.choice([None, self.HOSTS[aleatorio.randrange(len(self.HOSTS))],
+                                        "192.168.1.200"]),
+            "protocolo": protocolo,
+            "direcao": aleatorio.choice(["ENTRADA", "SAIDA"])
+        }
+    
+    @staticmethod
+    def _porta_valida(pacote):
+        """
+        Verifica se a porta do pacote é aceita por normalizar_pacote.
+        """
+        porta = pacote['porta']
+        return porta is None or (type(porta) is int and 0 <= porta <= 65535)
+    
+    @staticmethod
+    def _primeira_regra(normalizadas, pacote):
+        """
+        Índice da primeira regra que casa, percorrendo a lista (referência).
+        """
+        normalizado = normalizar_pacote(pacote['ip'], pacote['porta'], pacote['origem'],
+                                        pacote['protocolo'], pacote['direcao'])
+        for i, regra in enumerate(normalizadas):
+            if regra_casa(regra, normalizado):
+                return i
+        return None
+    
+    def _decisoes(self, regras, pacote, diretorio):
+        """
+        Decide o pacote por todos os caminhos e retorna {caminho: resultado}.
+        """
+        arquivo_json = os.path.join(diretorio, 'regras.json')
+        arquivo_bin = os.path.join(diretorio, 'regras.fwc')
+        with open(arquivo_json, 'w', encoding='utf-8') as f:
+            json.dump(regras, f)
+        compilar_regras(arquivo_json, arquivo_bin)
+        indice = IndiceRegras(regras)
+        compilada = PoliticaCompilada(arquivo_bin)
+        try:
+            normalizadas = [normalizar_regra(regra, i) for i, regra in enumerate(regras)]
+            return self._comparar(regras, normalizadas, pacote, indice, compilada)
+        finally:
+            compilada.fechar()
+    
+    def _comparar(self, regras, normalizadas, pacote, indice, compilada):
+        """
+        Retorna (regra escolhida, decisão) de cada caminho, ou ValueError
+        se o caminho rejeitou o pacote. Sem baldes, LIMITADO passa como
+        PERMITIDO, igual à referência.
+        """
+        def sem_estado(acao):
+            return Acao.PERMITIDO if acao == Acao.LIMITADO else acao
+        
+        def referencia():
+            return (self._primeira_regra(normalizadas, pacote),
+                    filtrar_pacote(**pacote, regras=regras))
+        
+        def pelo_indice():
+            classificada = indice.classificar(**pacote)
+            return (classificada.prioridade if classificada else None,
+                    sem_estado(indice.decidir(**pacote)))
+        
+        def pela_compilada():
+            return (compilada.explicar(**pacote)['regra'], sem_estado(compilada.decidir(**pacote)))
+        
+        def pela_explicacao(motor):
+            explicacao = motor.explicar(**pacote)
+            return explicacao['regra'], sem_estado(explicacao['decisao'])
+        
+        caminhos = {
+            'referencia': referencia,
+            'indice': pelo_indice,
+            'compilada': pela_compilada,
+            'explicar': lambda: pela_explicacao(indice),
+            'explicar_compilada': lambda: pela_explicacao(compilada)
+        }
+        resultados = {}
+        for nome, caminho in caminhos.items():
+            try:
+                resultados[nome] = caminho()
+            except ValueError:
+                resultados[nome] = ValueError
+        return resultados
+    
+    def _reduzir(self, regras, pacote, diretorio):
+        """
+        Remove regras, uma a uma, enquanto os caminhos continuarem divergindo.
+        """
+        reduzidas = list(regras)
+        i = 0
+        while i < len(reduzidas):
+            tentativa = reduzidas[:i] + reduzidas[i + 1:]
+            if len(set(self._decisoes(tentativa, pacote, diretorio).values())) > 1:
+                reduzidas = tentativa
+            else:
+                i += 1
+        return reduzidas
+    
+    def test_caminhos_equivalentes_a_referencia(self):
+        """
+        Testa se todos os caminhos escolhem a mesma regra e decisão que a
+        busca linear.
+        """
+        with tempfile.TemporaryDirectory() as diretorio:
+            for rodada in range(self.RODADAS):
+                semente = self.SEMENTE + rodada
+                aleatorio = random.Random(semente)
+                regras = [self._regra_aleatoria(aleatorio)
+                          for _ in range(aleatorio.randint(0, 40))]
+                
+                arquivo_json = os.path.join(diretorio, f'regras{rodada}.json')
+                arquivo_bin = os.path.join(diretorio, f'regras{rodada}.fwc')
+                with open(arquivo_json, 'w', encoding='utf-8') as f:
+                    json.dump(regras, f)
+                compilar_regras(arquivo_json, arquivo_bin)
+                normalizadas = [normalizar_regra(regra, i) for i, regra in enumerate(regras)]
+                indice = IndiceRegras(regras)
+                compilada = PoliticaCompilada(arquivo_bin)
+                try:
+                    for _ in range(150):
+                        pacote = self._pacote_aleatorio(aleatorio)
+                        resultados = self._comparar(regras, normalizadas, pacote, indice, compilada)
+                        if len(set(resultados.values())) > 1:
+                            minimas = self._reduzir(regras, pacote, diretorio)
+                            self.fail(f"semente {semente}: pacote {pacote} com regras {minimas}: "
+                                      f"{self._decisoes(minimas, pacote, diretorio)}")
+                finally:
+                    compilada.fechar()
+    
+    def test_limites_equivalentes(self):
+        """
+        Testa se o índice e a política compilada limitam a mesma sequência
+        de pacotes, cada um com a sua tabela de baldes.
+        """
+        with tempfile.TemporaryDirectory() as diretorio:
+            for rodada in range(self.RODADAS):
+                semente = self.SEMENTE + rodada
+                aleatorio = random.Random(semente)
+                regras = [self._regra_aleatoria(aleatorio) for _ in range(20)]
+                
+                arquivo_json = os.path.join(diretorio, 'regras.json')
+                arquivo_bin = os.path.join(diretorio, 'regras.fwc')
+                with open(arquivo_json, 'w', encoding='utf-8') as f:
+                    json.dump(regras, f)
+                compilar_regras(arquivo_json, arquivo_bin)
+                indice = IndiceRegras(regras)
+                compilada = PoliticaCompilada(arquivo_bin)
+                normalizadas = [normalizar_regra(regra, i) for i, regra in enumerate(regras)]
+                baldes_indice, baldes_compilada = TabelaBaldes(), TabelaBaldes()
+                
+                agora = 0.0
+                for _ in range(300):
+                    pacote = self._pacote_aleatorio(aleatorio)
+                    agora += aleatorio.choice([0.0, 0.01, 0.1, 1.0])
+                    if not self._porta_valida(pacote):
+                        with self.assertRaises(ValueError):
+                            indice.decidir(**pacote, baldes=baldes_indice, agora=agora)
+                        with self.assertRaises(ValueError):
+                            compilada.decidir(**pacote, baldes=baldes_compilada, agora=agora)
+                        continue
+                    primeira = self._primeira_regra(normalizadas, pacote)
+                    esperado = "BLOQUEADO" if primeira is None else regras[primeira]["acao"]
+                    decisao = indice.decidir(**pacote, baldes=baldes_indice, agora=agora)
+                    self.assertEqual(decisao, compilada.decidir(**pacote, baldes=baldes_compilada,
+                                                               agora=agora), (semente, pacote))
+                    # Uma regra LIMITADO decide PERMITIDO (dentro do limite) ou LIMITADO
+                    if esperado == "LIMITADO":
+                        self.assertIn(decisao, (Acao.PERMITIDO, Acao.LIMITADO), (semente, pacote))
+                    else:
+                        self.assertEqual(decisao, esperado, (semente, pacote))
+                compilada.fechar()
+                self.assertEqual(baldes_indice.estatisticas(), baldes_compilada.estatisticas())
+    
+    def test_impacto_equivalente_a_comparacao_direta(self):
+        """
+        Testa se o impacto (com o pré-filtro das regras alteradas) conta as
+        mesmas mudanças que decidir cada pacote com as duas listas.
+        """
+        for rodada in range(self.RODADAS):
+            semente = self.SEMENTE + rodada
+            aleatorio = random.Random(semente)
+            atuais = [self._regra_aleatoria(aleatorio) for _ in range(25)]
+            candidatas = list(atuais)
+            for _ in range(aleatorio.randint(1, 3)):
+                posicao = aleatorio.randrange(len(candidatas) + 1)
+                operacao = aleatorio.choice(["inserir", "remover", "trocar"])
+                if operacao == "inserir" or not candidatas:
+                    candidatas.insert(posicao, self._regra_aleatoria(aleatorio))
+                elif operacao == "remover":
+                    candidatas.pop(posicao % len(candidatas))
+                else:
+                    candidatas[posicao % len(candidatas)] = self._regra_aleatoria(aleatorio)
+            pacotes = [self._pacote_aleatorio(aleatorio) for _ in range(400)]
+            
+            normalizadas_atuais = [normalizar_regra(regra, i) for i, regra in enumerate(atuais)]
+            normalizadas_candidatas = [normalizar_regra(regra, i) for i, regra in enumerate(candidatas)]
+            esperado = {}
+            invalidos = 0
+            for pacote in pacotes:
+                if not self._porta_valida(pacote):
+                    invalidos += 1
+                    continue
+                antes = self._primeira_regra(normalizadas_atuais, pacote)
+                depois = self._primeira_regra(normalizadas_candidatas, pacote)
+                antes = atuais[antes]["acao"] if antes is not None else "BLOQUEADO"
+                depois = candidatas[depois]["acao"] if depois is not None else "BLOQUEADO"
+                if antes != depois:
+                    esperado[(antes, depois)] = esperado.get((antes, depois), 0) + 1
+            
+            resultado = comparar_politicas(atuais, candidatas, pacotes)
+            obtido = {(m['antes'], m['depois']): m['pacotes'] for m in resultado['mudancas']}
+            self.assertEqual(obtido, esperado, semente)
+            self.assertEqual((resultado['pacotes'], resultado['invalidos']),
+                             (len(pacotes) - invalidos, invalidos), semente)
+    
+    def test_regras_originais_casam_literalmente(self):
+        """
+        Testa se regras no formato original (ip, porta, acao) decidem como
+        a comparação literal de IP e porta do simulador original.
+        """
+        for rodada in range(self.RODADAS):
+            semente = self.SEMENTE + rodada
+            aleatorio = random.Random(semente)
+            regras = [{"ip": aleatorio.choice(self.HOSTS[:4]), "porta": aleatorio.choice(self.PORTAS[:4]),
+                       "acao": aleatorio.choice(["PERMITIDO", "BLOQUEADO"])} for _ in range(10)]
+            indice = IndiceRegras(regras)
+            for ip in self.HOSTS[:5]:
+                for porta in self.PORTAS[:5]:
+                    esperado = next((regra["acao"] for regra in regras
+                                     if regra["ip"] == ip and regra["porta"] == porta), "BLOQUEADO")
+                    self.assertEqual(filtrar_pacote(ip, porta, regras), esperado, semente)
+                    self.assertEqual(indice.decidir(ip, porta), esperado, semente)
+
+
+class TestLinhaComando(unittest.TestCase):
+    """
+    Testes para os subcomandos não interativos do firewall.py.
+    """
+    
+    def setUp(self):
+        """
+        Cria um regras.json temporário.
+        """
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.diretorio.name, 'regras.json')
+        with open(self.arquivo, 'w', encoding='utf-8') as f:
+            json.dump([{"ip": "10.0.0.1", "porta": 80, "acao": "PERMITIDO"}], f)
+        self.opcoes = ['--regras', self.arquivo,
+                       '--compilado', os.path.join(self.diretorio.name, 'regras.fwc')]
+    
+    def tearDown(self):
+        """
+        Remove o diretório temporário.
+        """
+        self.diretorio.cleanup()
+    
+    def executar(self, *argumentos):
+        """
+        Executa firewall.main e retorna (código de saída, saída padrão).
+        """
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            codigo = firewall.main(list(argumentos))
+        return codigo, saida.getvalue()
+    
+    def test_avaliar_codigo_de_saida(self):
+        """
+        Testa o código de saída e a saída JSON/silenciosa do avaliar.
+        """
+        codigo, saida = self.executar('avaliar', '10.0.0.1', '80', '--json', *self.opcoes)
+        self.assertEqual(codigo, 0)
+        self.assertEqual(json.loads(saida)['decisao'], 'PERMITIDO')
+        
+        codigo, saida = self.executar('evaluate', '10.0.0.1', '81', '-q', *self.opcoes)
+        self.assertEqual(codigo, 1)
+        self.assertEqual(saida, '')
+    
+    def test_erro_de_entrada_sai_com_2(self):
+        """
+        Testa se regras com formato errado e argumentos inválidos saem com
+        código 2 (e mensagem de erro) em todos os subcomandos.
+        """
+        compilado = os.path.join(self.diretorio.name, 'saida.fwc')
+        for conteudo in ('[1]', '{"ip": "10.0.0.1"}', '"x"', '[[1]]'):
+            with open(self.arquivo, 'w', encoding='utf-8') as f:
+                f.write(conteudo)
+            with contextlib.redirect_stderr(io.StringIO()) as erros:
+                self.assertEqual(self.executar('avaliar', '10.0.0.1', '80', *self.opcoes)[0], 2)
+                self.assertEqual(self.executar('compilar', self.arquivo, '-o', compilado)[0], 2)
+                self.assertEqual(self.executar('varrer', '127.0.0.1', '-p', '80',
+                                               *self.opcoes)[0], 2)
+            self.assertIn('ERRO', erros.getvalue())
+        
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(self.executar('varrer', '127.0.0.1', '-p', '0-10', *self.opcoes)[0], 2)
+            self.assertEqual(self.executar('compilar', os.path.join(self.diretorio.name, 'nao.json'),
+                                           '-o', compilado)[0], 2)
+    
+    def test_varrer_porta_local(self):
+        """
+        Testa o subcomando varrer contra uma porta fechada em localhost.
+        """
+        temporario = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        temporario.bind(('127.0.0.1', 0))
+        fechada = temporario.getsockname()[1]
+        temporario.close()
+        
+        codigo, saida = self.executar('varrer', '127.0.0.1', '-p', str(fechada), '--timeout', '0.5',
+                                      '--json', *self.opcoes)
+        resultados = [json.loads(linha) for linha in saida.splitlines()]
+        
+        self.assertEqual(codigo, 0)
+        self.assertEqual(len(resultados), 1)
+        self.assertEqual((resultados[0]['porta'], resultados[0]['conectividade'],
+                          resultados[0]['decisao']), (fechada, False, 'BLOQUEADO'))
+    
+    def test_reproduzir_conta_decisoes(self):
+        """
+        Testa a reavaliação de pacotes gravados em NDJSON.
+        """
+        gravados = os.path.join(self.diretorio.name, 'pacotes.ndjson')
+        with open(gravados, 'w', encoding='utf-8') as f:
+            f.write('{"ip": "10.0.0.1", "porta": 80, "decisao": "BLOQUEADO"}\n')
+            f.write('{"ip": "10.0.0.1", "porta": 22}\n')
+            f.write('invalido\n')
+            f.write('{"ip": "1.1.1.1", "porta": "443"}\n')
+            f.write('{"ip": "1.1.1.1", "porta": 70000}\n')
+            f.write('{"ip": "1.1.1.1", "porta": 443, "protocolo": 6}\n')
+        
+        codigo, saida = self.executar('replay', gravados, '--json', '-q', *self.opcoes)
+        resumo = json.loads(saida)['resumo']
+        
+        self.assertEqual(codigo, 0)
+        self.assertEqual((resumo['permitidos'], resumo['bloqueados']), (1, 1))
+        self.assertEqual((resumo['alterados'], resumo['invalidos']), (1, 4))
+    
+    def test_reproduzir_limitado(self):
+        """
+        Testa se o replay usa o campo tempo para aplicar regras LIMITADO.
+        """
+        with open(self.arquivo, 'w', encoding='utf-8') as f:
+            json.dump([{"ip": "10.0.0.1", "porta": 80, "acao": "LIMITADO", "taxa": 1}], f)
+        gravados = os.path.join(self.diretorio.name, 'pacotes.ndjson')
+        with open(gravados, 'w', encoding='utf-8') as f:
+            for tempo in (0, 0.1, 0.2, 1.5):
+                f.write(json.dumps({"ip": "10.0.0.1", "porta": 80, "tempo": tempo}) + '\n')
+        
+        codigo, saida = self.executar('replay', gravados, '--json', '-q', *self.opcoes)
+        resumo = json.loads(saida)['resumo']
+        
+        self.assertEqual(codigo, 0)
+        self.assertEqual((resumo['permitidos'], resumo['limitados']), (2, 2))
+    
+    def test_impacto_codigo_de_saida(self):
+        """
+        Testa o subcomando impacto: 1 se algum fluxo muda, 0 se nenhum.
+        """
+        gravados = os.path.join(self.diretorio.name, 'pacotes.ndjson')
+        with open(gravados, 'w', encoding='utf-8') as f:
+            f.write('{"ip": "10.0.0.1", "porta": 80}\n')
+        candidatas = os.path.join(self.diretorio.name, 'candidatas.json')
+        with open(candidatas, 'w', encoding='utf-8') as f:
+            json.dump([], f)
+        
+        codigo, saida = self.executar('diff', candidatas, gravados, '--json',
+                                      '--regras', self.arquivo)
+        self.assertEqual(codigo, 1)
+        self.assertEqual(json.loads(saida)['pacotes_alterados'], 1)
+        
+        codigo, _ = self.executar('impacto', self.arquivo, gravados, '-q', '--regras', self.arquivo)
+        self.assertEqual(codigo, 0)
+    
+    def test_importacao_adiada(self):
+        """
+        Testa se importar o firewall.py não carrega o motor de regras.
+        """
+        resultado = subprocess.run(
+            [sys.executable, '-c', 'import sys, firewall; print("motor_regras" in sys.modules)'],
+            cwd=os.path.dirname(os.path.abspath(firewall.__file__)),
+            capture_output=True, text=True
+        )
+        self.assertEqual(resultado.stdout.strip(), 'False')
+
+
 class TestIntegracao(unittest.TestCase):
     """
     Testes de integração do sistema completo.
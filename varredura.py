@@ -0,0 +1,358 @@
+"""
+Varredura - Sondagem de faixas de hosts e portas
+Expande faixas CIDR e listas de portas em alvos, testa a conectividade de
+cada um com conexões não bloqueantes (asyncio) e devolve, conforme ficam
+prontos, o resultado da sondagem ao lado da decisão do firewall.
+"""
+
+import asyncio
+import ipaddress
+import itertools
+import queue
+import socket
+import threading
+import time
+
+# Quantidade máxima de alvos (hosts x portas) aceita em uma varredura
+LIMITE_ALVOS = 65536
+
+# Valores padrão do motor de sondagem
+CONCORRENCIA_PADRAO = 256
+TAXA_PADRAO = 1000
+TIMEOUT_PADRAO = 1.0
+TIMEOUT_MINIMO = 0.05
+
+# Hosts com IPv4 e IPv6: espera antes de tentar o próximo endereço em
+# paralelo (Happy Eyeballs, RFC 8305)
+ATRASO_HAPPY_EYEBALLS = 0.25
+
+
+def expandir_hosts(especificacao):
+    """
+    Expande uma especificação de hosts em uma lista de endereços.
+
+    Aceita itens separados por vírgula: IPs, redes CIDR ou nomes de host.
+
+    Args:
+        especificacao (str): Ex.: "10.0.0.0/30,192.168.0.1,exemplo.com"
+
+    Retorna:
+        list: Lista de hosts (str)
+
+    Lança:
+        ValueError: Se uma rede for inválida ou passar do LIMITE_ALVOS
+    """
+    hosts = []
+    for item in especificacao.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if '/' not in item:
+            hosts.append(item)
+            continue
+
+        try:
+            rede = ipaddress.ip_network(item, strict=False)
+        except ValueError:
+            raise ValueError(f"Rede inválida: {item}")
+        if rede.num_addresses > LIMITE_ALVOS:
+            raise ValueError(f"Rede {item} tem mais de {LIMITE_ALVOS} endereços")
+        hosts.extend(str(endereco) for endereco in rede.hosts())
+
+    if not hosts:
+        raise ValueError("Nenhum host informado")
+    return hosts
+
+
+def expandir_portas(especificacao):
+    """
+    Expande uma especificação de portas em uma lista de números.
+
+    Args:
+        especificacao (str): Ex.: "22,80,8000-8010"
+
+    Retorna:
+        list: Lista de portas (int), sem repetição e na ordem informada
+
+    Lança:
+        ValueError: Se alguma porta for inválida ou fora de 1-65535
+    """
+    portas = []
+    for item in str(especificacao).split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            if '-' in item:
+                inicio, fim = (int(parte) for parte in item.split('-', 1))
+            else:
+                inicio = fim = int(item)
+        except ValueError:
+            raise ValueError(f"Porta inválida: {item}")
+        if inicio < 1 or fim > 65535 or inicio > fim:
+            raise ValueError(f"Faixa de portas inválida: {item}")
+        portas.extend(range(inicio, fim + 1))
+
+    if not portas:
+        raise ValueError("Nenhuma porta informada")
+    return list(dict.fromkeys(portas))
+
+
+class LimitadorTaxa:
+    """
+    Balde de fichas (token bucket) que limita o início de novas sondagens.
+    """
+
+    def __init__(self, taxa, rajada=None):
+        """
+        Args:
+            taxa (float): Sondagens por segundo (0 ou None = sem limite)
+            rajada (float, opcional): Capacidade do balde (padrão: taxa/10)
+        """
+        self.taxa = taxa
+        self.capacidade = rajada or max(1.0, (taxa or 0) / 10)
+        self._fichas = self.capacidade
+        self._ultimo = time.monotonic()
+
+    async def aguardar(self):
+        """
+        Espera até haver uma ficha disponível e a consome.
+        """
+        if not self.taxa:
+            return
+        while True:
+            agora = time.monotonic()
+            self._fichas = min(self.capacidade,
+                               self._fichas + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            if self._fichas >= 1:
+                self._fichas -= 1
+                return
+            await asyncio.sleep((1 - self._fichas) / self.taxa)
+
+
+class TempoLimiteAdaptativo:
+    """
+    Estima o tempo limite das sondagens a partir dos tempos de resposta
+    observados (mesmo cálculo do RTO do TCP, RFC 6298), limitado entre um
+    mínimo e o tempo limite máximo configurado.
+
+    Como no TCP, cada sondagem que expira dobra o tempo limite (recuo
+    exponencial) até o máximo; a próxima resposta volta ao valor estimado.
+    Assim respostas rápidas no início não fazem hosts mais lentos serem
+    dados como fechados.
+    """
+
+    def __init__(self, maximo, minimo=TIMEOUT_MINIMO):
+        self.maximo = maximo
+        self.minimo = min(minimo, maximo)
+        self._srtt = None
+        self._rttvar = None
+        self._recuo = 1
+
+    @property
+    def atual(self):
+        """
+        Tempo limite a usar na próxima sondagem (segundos).
+        """
+        if self._srtt is None:
+            return self.maximo
+        rto = max(self.minimo, self._srtt + 4 * self._rttvar)
+        return min(self.maximo, rto * self._recuo)
+
+    def registrar(self, rtt):
+        """
+        Registra o tempo de uma sondagem que obteve resposta.
+        """
+        if self._srtt is None:
+            self._srtt = rtt
+            self._rttvar = rtt / 2
+        else:
+            self._rttvar = 0.75 * self._rttvar + 0.25 * abs(self._srtt - rtt)
+            self._srtt = 0.875 * self._srtt + 0.125 * rtt
+        self._recuo = 1
+
+    def expirou(self):
+        """
+        Registra uma sondagem que esgotou o tempo limite sem resposta,
+        dobrando o tempo limite das próximas (até o máximo).
+        """
+        if self._srtt is not None and self.atual < self.maximo:
+            self._recuo *= 2
+
+
+async def sondar(ip, porta, timeout):
+    """
+    Tenta abrir uma conexão TCP sem bloquear o laço de eventos.
+
+    Aceita IPv4 e IPv6. Um nome com endereços das duas famílias é sondado
+    com Happy Eyeballs: se o primeiro endereço não responder em
+    ATRASO_HAPPY_EYEBALLS, o seguinte é tentado em paralelo e vale a
+    primeira conexão aceita.
+
+    Args:
+        ip (str): Endereço ou nome do host
+        porta (int): Porta a testar
+        timeout (float): Tempo máximo de espera em segundos
+
+    Retorna:
+        tuple: (conectividade, rtt) onde conectividade é True (aberta),
+            False (fechada/sem resposta) ou None (host não encontrado), e
+            rtt é o tempo até a resposta em segundos (None se não houve)
+    """
+    inicio = time.monotonic()
+    try:
+        _, escritor = await asyncio.wait_for(asyncio.open_connection(
+            ip, porta, happy_eyeballs_delay=ATRASO_HAPPY_EYEBALLS), timeout)
+    except asyncio.TimeoutError:
+        return False, None
+    except (socket.gaierror, ValueError):
+        # Nome que não resolve ou que nem é um nome válido (o codec idna
+        # lança UnicodeError, subclasse de ValueError, para rótulos com
+        # mais de 63 caracteres): host não encontrado
+        return None, None
+    except OSError:
+        # Conexão recusada: a porta está fechada, mas o host respondeu
+        return False, time.monotonic() - inicio
+
+    rtt = time.monotonic() - inicio
+    escritor.close()
+    try:
+        await escritor.wait_closed()
+    except OSError:
+        pass
+    return True, rtt
+
+
+async def varrer_async(hosts, portas, decidir, concorrencia=CONCORRENCIA_PADRAO,
+                       taxa=TAXA_PADRAO, timeout=TIMEOUT_PADRAO, parar=None):
+    """
+    Varre todos os pares host x porta e produz os resultados conforme
+    ficam prontos (não na ordem dos alvos).
+
+    Args:
+        hosts (list): Hosts a sondar
+        portas (list): Portas a sondar em cada host
+        decidir (callable): Função decidir(ip, porta) da política de regras
+        concorrencia (int): Máximo de conexões simultâneas
+        taxa (float): Máximo de sondagens iniciadas por segundo (0 = sem limite)
+        timeout (float): Tempo limite máximo de cada sondagem
+        parar (threading.Event, opcional): Interrompe a varredura quando marcado
+
+    Produz:
+        dict: ip, porta, conectividade, decisao e tempo_ms
+    """
+    alvos = itertools.product(hosts, portas)
+    limitador = LimitadorTaxa(taxa)
+    tempo_limite = TempoLimiteAdaptativo(timeout)
+    resultados = asyncio.Queue(maxsize=concorrencia * 4)
+
+    async def trabalhador():
+        # Todos os trabalhadores consomem o mesmo iterador de alvos. O
+        # marcador de fim é enviado mesmo se o trabalhador falhar, senão o
+        # consumidor esperaria por ele para sempre; só quando o próprio
+        # consumidor cancela a varredura ninguém mais o espera
+        cancelado = False
+        try:
+            for ip, porta in alvos:
+                if parar is not None and parar.is_set():
+                    break
+                await limitador.aguardar()
+                conectividade, rtt = await sondar(ip, porta, tempo_limite.atual)
+                if rtt is not None:
+                    tempo_limite.registrar(rtt)
+                elif conectividade is False:
+                    tempo_limite.expirou()
+                await resultados.put({
+                    'ip': ip,
+                    'porta': porta,
+                    'conectividade': conectividade,
+                    'decisao': decidir(ip, porta),
+                    'tempo_ms': round(rtt * 1000, 2) if rtt is not None else None
+                })
+        except asyncio.CancelledError:
+            cancelado = True
+            raise
+        finally:
+            if not cancelado:
+                await resultados.put(None)
+
+    total_trabalhadores = max(1, min(concorrencia, len(hosts) * len(portas)))
+    tarefas = [asyncio.create_task(trabalhador()) for _ in range(total_trabalhadores)]
+
+    try:
+        ativos = total_trabalhadores
+        while ativos:
+            resultado = await resultados.get()
+            if resultado is None:
+                ativos -= 1
+            else:
+                yield resultado
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+
+
+def varrer(hosts, portas, decidir, **opcoes):
+    """
+    Versão síncrona de varrer_async, para uso no terminal e no Flask.
+
+    O laço de eventos roda em uma thread separada e os resultados chegam
+    por uma fila à medida que ficam prontos. Se o consumidor parar de ler
+    (ex.: cliente HTTP desconectou), a varredura é interrompida.
+
+    Args:
+        hosts, portas, decidir: Iguais aos de varrer_async
+        **opcoes: concorrencia, taxa e timeout (ver varrer_async)
+
+    Produz:
+        dict: Um resultado por alvo (ver varrer_async)
+    """
+    if len(hosts) * len(portas) > LIMITE_ALVOS:
+        raise ValueError(f"A varredura passa do limite de {LIMITE_ALVOS} alvos")
+
+    fila = queue.Queue(maxsize=1024)
+    parar = threading.Event()
+    fim = object()
+
+    async def produzir():
+        async for resultado in varrer_async(hosts, portas, decidir, parar=parar, **opcoes):
+            # Espera espaço na fila sem travar o laço de eventos
+            while not parar.is_set():
+                try:
+                    fila.put_nowait(resultado)
+                    break
+                except queue.Full:
+                    await asyncio.sleep(0.01)
+            if parar.is_set():
+                break
+
+    def entregar(item):
+        # Desiste da entrega se o consumidor já foi embora
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def executar():
+        try:
+            asyncio.run(produzir())
+        except Exception as e:
+            entregar(e)
+        finally:
+            entregar(fim)
+
+    threading.Thread(target=executar, name='varredura', daemon=True).start()
+
+    try:
+        while True:
+            item = fila.get()
+            if item is fim:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        parar.set()